@@ -0,0 +1 @@
+"""ZiGate component benchmarks."""
@@ -0,0 +1,82 @@
+"""
+Benchmark fixtures.
+
+A Home Assistant instance running the zigate component on the
+zigate library fake coordinator, with simulated devices.
+"""
+import asyncio
+import shutil
+import tempfile
+
+import pytest
+
+try:
+    import pytest_benchmark  # noqa
+except ImportError:
+    # pytest-benchmark is not installed, do not collect the benchmarks
+    collect_ignore_glob = ['test_*.py']
+
+DEVICES = 10
+
+
+class HassRunner(object):
+    '''
+    Home Assistant with its own event loop, run(coro) runs coro to completion
+    '''
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.hass = None
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def close(self):
+        self.loop.close()
+
+
+async def _async_start(config_dir, devices):
+    from homeassistant import config_entries, core, setup
+    from homeassistant.helpers import area_registry, device_registry, entity_registry
+    from custom_components.zigate import DATA_ZIGATE_DISCOVERY
+    from .simulator import create_devices
+
+    hass = core.HomeAssistant()
+    hass.config.config_dir = config_dir
+    hass.config.skip_pip = True
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    await area_registry.async_load(hass)
+    await device_registry.async_load(hass)
+    await entity_registry.async_load(hass)
+    hass.data['entity_info'] = {}
+    # admin panel dependencies are not needed
+    hass.config.components.update({'http', 'websocket_api'})
+    config = {'zigate': {'port': 'fake',
+                         'admin_panel': False,
+                         'coalesce_window': 0,
+                         'polling': False,
+                         }}
+    assert await setup.async_setup_component(hass, 'zigate', config)
+    await hass.async_start()
+    await hass.async_block_till_done()
+    discovery = hass.data[DATA_ZIGATE_DISCOVERY]
+    for device in create_devices(hass.data['zigate'], devices):
+        discovery.discover(device)
+    await hass.async_block_till_done()
+    return hass
+
+
+@pytest.fixture(scope='session')
+def zigate_hass():
+    '''
+    return HassRunner with zigate started and DEVICES simulated weather sensors
+    shared by all the benchmarks, the zigate library signal handlers
+    are never disconnected
+    '''
+    config_dir = tempfile.mkdtemp()
+    runner = HassRunner()
+    runner.hass = runner.run(_async_start(config_dir, DEVICES))
+    yield runner
+    runner.run(runner.hass.async_stop())
+    runner.close()
+    shutil.rmtree(config_dir, ignore_errors=True)
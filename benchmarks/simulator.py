@@ -0,0 +1,155 @@
+"""
+Simulated ZiGate coordinator for benchmarks.
+
+Replay attribute report frames into the zigate library fake transport
+at a given rate, the frames then follow the same path as frames
+received from a real ZiGate.
+"""
+import os
+import struct
+import threading
+import time
+from binascii import hexlify, unhexlify
+
+from zigate.core import Device
+
+FRAMES_FILE = os.path.join(os.path.dirname(__file__), 'frames.txt')
+
+WEATHER_SENSOR = {'type': 'lumi.weather',
+                  'attributes': ((1, 0x0402, 0x0000, 0x29, 'h', 2345),  # temperature
+                                 (1, 0x0405, 0x0000, 0x21, 'H', 5500),  # humidity
+                                 (1, 0x0403, 0x0000, 0x29, 'h', 1013),  # pressure
+                                 ),
+                  }
+
+THERMOMETER = {'type': 'TH01',
+               'attributes': ((1, 0x0402, 0x0000, 0x29, 'h', 2345),  # temperature
+                              ),
+               }
+
+LIGHT = {'type': 'LCT015',
+         'device': 0x0102,  # color light
+         'attributes': ((1, 0x0006, 0x0000, 0x10, '?', True),  # onoff
+                        (1, 0x0008, 0x0000, 0x20, 'B', 200),  # level
+                        (1, 0x0300, 0x0000, 0x20, 'B', 120),  # hue
+                        (1, 0x0300, 0x0001, 0x20, 'B', 200),  # saturation
+                        (1, 0x0300, 0x0007, 0x21, 'H', 370),  # color temperature
+                        ),
+         }
+
+COVER = {'type': 'E1757',
+         'device': 0x0202,  # window covering
+         'attributes': ((1, 0x0102, 0x0008, 0x20, 'B', 40),  # lift percentage
+                        ),
+         }
+
+
+def report_frame(transport, addr, endpoint, cluster, attribute, data_type, fmt, value, sequence=0):
+    '''
+    return encoded attribute report (0x8102) frame
+    '''
+    data = struct.pack('!' + fmt, value)
+    msg = struct.pack('!BHBHHBBH', sequence, int(addr, 16), endpoint, cluster, attribute,
+                      0, data_type, len(data)) + data
+    return transport.create_fake_response(0x8102, msg, 200)
+
+
+def generate_frames(transport, count, devices, template=WEATHER_SENSOR, first_addr=0x1000):
+    '''
+    return count report frames spread over devices and template attributes
+    '''
+    frames = []
+    attributes = template['attributes']
+    for i in range(count):
+        addr = '{:04x}'.format(first_addr + i % devices)
+        endpoint, cluster, attribute, data_type, fmt, value = attributes[(i // devices) % len(attributes)]
+        frames.append(report_frame(transport, addr, endpoint, cluster, attribute, data_type, fmt,
+                                   value + i % 100, sequence=i % 256))
+    return frames
+
+
+def load_frames(path=FRAMES_FILE):
+    '''
+    return recorded frames, one hex encoded frame per line
+    '''
+    with open(path) as fp:
+        return [unhexlify(line.strip()) for line in fp if line.strip() and not line.startswith('#')]
+
+
+def save_frames(frames, path=FRAMES_FILE, comment='encoded ZiGate frames, one per line'):
+    with open(path, 'w') as fp:
+        fp.write('# {}\n'.format(comment))
+        for frame in frames:
+            fp.write(hexlify(frame).decode() + '\n')
+
+
+def device_json(addr, ieee, template=WEATHER_SENSOR):
+    '''
+    return device json as stored in zigate.json
+    '''
+    clusters = {0: [{'attribute': 5, 'data': template['type']}]}
+    for endpoint, cluster, attribute, data_type, fmt, value in template['attributes']:
+        clusters.setdefault(cluster, []).append({'attribute': attribute, 'data': value})
+    return {'addr': addr,
+            'info': {'addr': addr, 'ieee': ieee},
+            'endpoints': [{'endpoint': 1,
+                           'clusters': [{'cluster': c, 'attributes': a} for c, a in clusters.items()],
+                           'profile': 0x0104,
+                           'device': template.get('device', 0x5f01),
+                           'in_clusters': list(clusters),
+                           'out_clusters': []}],
+            }
+
+
+def create_devices(myzigate, count, template=WEATHER_SENSOR, first_addr=0x1000):
+    '''
+    Add count devices built from template to myzigate,
+    loaded like zigate.json devices, so no signal is sent
+    return list of devices
+    '''
+    devices = []
+    for i in range(count):
+        addr = '{:04x}'.format(first_addr + i)
+        device = Device.from_json(device_json(addr, '00158d00{:08x}'.format(first_addr + i), template),
+                                  myzigate)
+        myzigate._devices[addr] = device
+        devices.append(device)
+    return devices
+
+
+class ZiGateSimulator(object):
+    '''
+    Push frames into myzigate connection as the ZiGate would.
+    '''
+    def __init__(self, myzigate):
+        self._zigate = myzigate
+        self.transport = myzigate.connection
+
+    def push(self, frame):
+        self.transport.received.put(frame)
+
+    def replay(self, frames, rate):
+        '''
+        Push frames at rate frames per second, blocking
+        return the time spent
+        '''
+        start = time.monotonic()
+        interval = 1 / rate
+        for i, frame in enumerate(frames):
+            delay = start + i * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.transport.received.put(frame)
+        return time.monotonic() - start
+
+    def replay_in_thread(self, frames, rate):
+        t = threading.Thread(target=self.replay, args=(frames, rate), daemon=True)
+        t.start()
+        return t
+
+
+if __name__ == '__main__':
+    # python -m benchmarks.simulator, record the sample frames
+    from zigate.transport import FakeTransport
+    save_frames(generate_frames(FakeTransport(), 300, 10),
+                comment='weather sensor reports of 10 devices, generated by benchmarks/simulator.py')
@@ -0,0 +1,58 @@
+"""Benchmark entity discovery and entity memory."""
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+from .simulator import THERMOMETER, WEATHER_SENSOR, create_devices
+
+
+def _discover_all(devices):
+    '''
+    Discover devices entities with the sensor platform
+    return created entities
+    '''
+    from custom_components.zigate import DATA_ZIGATE_ROUTER, ZiGateRouter
+    from custom_components.zigate.discovery import ZiGateDiscovery
+    from custom_components.zigate.sensor import ZiGateSensor
+    hass = SimpleNamespace(data={DATA_ZIGATE_ROUTER: ZiGateRouter(None)})
+    entities = {}
+    discovery = ZiGateDiscovery(hass, entities)
+    discovery.register_platform('sensor', ZiGateSensor, lambda new_entities: None)
+    for device in devices:
+        discovery.discover(device)
+    return entities
+
+
+@pytest.mark.parametrize('count', [10, 100, 1000])
+def test_discovery(benchmark, count):
+    '''
+    Time to discover and create the entities of count devices
+    '''
+    devices = create_devices(SimpleNamespace(_devices={}), count)
+    entities = benchmark(_discover_all, devices)
+    assert len(entities) == count * len(WEATHER_SENSOR['attributes'])
+    benchmark.extra_info['entities'] = len(entities)
+
+
+@pytest.mark.parametrize('count', [1000, 5000])
+def test_entity_memory(benchmark, count):
+    '''
+    Memory allocated per entity, for count single sensor devices,
+    the devices are excluded
+    '''
+    devices = create_devices(SimpleNamespace(_devices={}), count, THERMOMETER)
+    # warm up with other devices, imports and the growth of shared tables are not counted
+    _discover_all(create_devices(SimpleNamespace(_devices={}), count, THERMOMETER, first_addr=0x10000))
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        entities = _discover_all(devices)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    assert len(entities) == count
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    benchmark.extra_info['entities'] = len(entities)
+    benchmark.extra_info['bytes_per_entity'] = round(allocated / len(entities))
+    benchmark.pedantic(_discover_all, args=(devices,), rounds=1, iterations=1)
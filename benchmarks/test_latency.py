@@ -0,0 +1,37 @@
+"""Benchmark attribute report to entity state latency."""
+import asyncio
+import itertools
+
+from .simulator import WEATHER_SENSOR, ZiGateSimulator, report_frame
+
+HUMIDITY = WEATHER_SENSOR['attributes'][1]
+ENTITY_ID = 'sensor.zigate_00158d0000001000_humidity'
+
+
+def test_report_to_state(benchmark, zigate_hass):
+    '''
+    Time from a report frame received by the transport
+    to the entity state written.
+    Includes the zigate library receive polling (0.1s).
+    '''
+    hass = zigate_hass.hass
+    assert hass.states.get(ENTITY_ID)
+    simulator = ZiGateSimulator(hass.data['zigate'])
+    endpoint, cluster, attribute, data_type, fmt, value = HUMIDITY
+    values = itertools.cycle(range(4000, 6000))
+
+    async def report():
+        changed = asyncio.Event()
+
+        def state_changed(event):
+            if event.data['entity_id'] == ENTITY_ID:
+                changed.set()
+        remove = hass.bus.async_listen('state_changed', state_changed)
+        try:
+            simulator.push(report_frame(simulator.transport, '1000', endpoint, cluster, attribute,
+                                        data_type, fmt, next(values)))
+            await asyncio.wait_for(changed.wait(), 5)
+        finally:
+            remove()
+
+    benchmark.pedantic(lambda: zigate_hass.run(report()), rounds=20)
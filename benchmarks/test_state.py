@@ -0,0 +1,48 @@
+"""Benchmark the entity properties read by a state write."""
+from types import SimpleNamespace
+
+import pytest
+
+from .simulator import COVER, LIGHT, THERMOMETER, create_devices
+
+ENTITIES = 100
+
+
+def _render(entity):
+    '''
+    Read what a state write reads from the entity
+    '''
+    return (entity.state, entity.state_attributes, entity.device_state_attributes,
+            entity.name, entity.unique_id, entity.supported_features, entity.available,
+            entity.unit_of_measurement, entity.device_class)
+
+
+def _entities(platform, template):
+    from custom_components.zigate import DATA_ZIGATE_ROUTER, ZiGateRouter
+    from custom_components.zigate.discovery import ZiGateDiscovery
+    module = __import__('custom_components.zigate.' + platform, fromlist=['async_setup_platform'])
+    cls = {'sensor': 'ZiGateSensor', 'light': 'ZiGateLight', 'cover': 'ZiGateCover'}[platform]
+    hass = SimpleNamespace(data={DATA_ZIGATE_ROUTER: ZiGateRouter(None)})
+    entities = {}
+    discovery = ZiGateDiscovery(hass, entities)
+    discovery.register_platform(platform, getattr(module, cls), lambda new_entities: None)
+    for device in create_devices(SimpleNamespace(_devices={}), ENTITIES, template):
+        discovery.discover(device)
+    return [entity for entity in entities.values() if entity.__class__.__name__ == cls]
+
+
+@pytest.mark.parametrize('platform,template', [('sensor', THERMOMETER),
+                                               ('light', LIGHT),
+                                               ('cover', COVER)])
+def test_state_write(benchmark, platform, template):
+    '''
+    Time to read the state of ENTITIES entities, as a state write does
+    '''
+    entities = _entities(platform, template)
+    assert len(entities) == ENTITIES
+
+    def render_all():
+        for entity in entities:
+            _render(entity)
+    benchmark(render_all)
+    benchmark.extra_info['entities'] = len(entities)
@@ -0,0 +1,56 @@
+"""Benchmark attribute report throughput."""
+import asyncio
+import time
+
+import pytest
+
+from .simulator import ZiGateSimulator, load_frames
+
+DURATION = 2  # seconds of reports per round
+DRAIN_TIMEOUT = 30
+
+
+@pytest.mark.parametrize('rate', [100, 1000, 5000])
+def test_report_throughput(benchmark, zigate_hass, rate):
+    '''
+    Replay the recorded frames at rate reports per second
+    and count the zigate.attribute_updated events fired.
+    The round time includes draining the backlog.
+    '''
+    hass = zigate_hass.hass
+    simulator = ZiGateSimulator(hass.data['zigate'])
+    recorded = load_frames()
+    count = rate * DURATION
+    frames = [recorded[i % len(recorded)] for i in range(count)]
+    results = {}
+
+    async def replay():
+        delivered = 0
+        done = asyncio.Event()
+
+        def attribute_updated(event):
+            nonlocal delivered
+            if event.data['ieee'].startswith('00158d00'):
+                delivered += 1
+                if delivered >= count:
+                    done.set()
+        remove = hass.bus.async_listen('zigate.attribute_updated', attribute_updated)
+        start = time.monotonic()
+        thread = simulator.replay_in_thread(frames, rate)
+        try:
+            await asyncio.wait_for(done.wait(), DURATION + DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            remove()
+        elapsed = time.monotonic() - start
+        await hass.async_add_executor_job(thread.join)
+        results.update(delivered=delivered, elapsed=elapsed)
+
+    benchmark.pedantic(lambda: zigate_hass.run(replay()), rounds=1, iterations=1)
+    benchmark.extra_info['rate'] = rate
+    benchmark.extra_info['sent'] = count
+    benchmark.extra_info['delivered'] = results['delivered']
+    benchmark.extra_info['achieved_rate'] = round(results['delivered'] / results['elapsed'])
+    benchmark.extra_info['drain_s'] = round(max(0, results['elapsed'] - DURATION), 3)
+    assert results['delivered'] > 0
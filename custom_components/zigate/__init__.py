@@ -7,31 +7,60 @@ https://home-assistant.io/components/zigate/
 import logging
 import voluptuous as vol
 import os
+import asyncio
 import datetime
+import functools
+from time import monotonic
 import zigate
 
-from homeassistant.exceptions import PlatformNotReady
 # from homeassistant import config_entries
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.entity_component import EntityComponent
 from homeassistant.components.group import \
     ENTITY_ID_FORMAT as GROUP_ENTITY_ID_FORMAT
-from homeassistant.helpers.discovery import load_platform
-from homeassistant.helpers.event import track_time_change
+from homeassistant.helpers.discovery import async_load_platform
+from homeassistant.helpers.event import async_track_time_change
 from homeassistant.const import (ATTR_BATTERY_LEVEL, CONF_PORT,
                                  CONF_HOST, CONF_SCAN_INTERVAL,
                                  ATTR_ENTITY_ID,
                                  EVENT_HOMEASSISTANT_START,
                                  EVENT_HOMEASSISTANT_STOP)
 import homeassistant.helpers.config_validation as cv
-from .const import DOMAIN, SCAN_INTERVAL
-from .adminpanel import adminpanel_setup
+from .const import DOMAIN, SCAN_INTERVAL, COALESCE_WINDOW, MAX_IN_FLIGHT
+from .discovery import ZiGateDiscovery, classify
+from .command import ZiGateCommandQueue
+from .polling import ZiGateRefresher, ZiGatePoller, REFRESH_CONCURRENCY, POLL_INTERVAL
+from .reporting import ZiGateReporting, REPORTING_PROFILES, apply_profile, configure_reporting
+from .batch import (EVENT_READ_RESPONSE, EVENT_WRITE_RESPONSE, MAX_READ_ATTRIBUTES, MAX_WRITE_SIZE,
+                    async_batch_request, split_requests)
+from .transaction import (EVENT_READ_ATTRIBUTE_RESPONSE, REQUEST_TIMEOUT, ZiGateRequestError,
+                          ZiGateTransactions)
+from .profile import StartupProfile
+from .snapshot import load_snapshot, save_snapshot
+from .storage import STORAGE_MODES, STORAGE_SQLITE, ZiGateStore
+from .network import DATA_ZIGATE_NETWORK, ZiGateNetwork, async_register_websocket
+from .index import DATA_ZIGATE_INDEX, ZiGateDeviceIndex, get_entity_registry
+from .metrics import (DATA_ZIGATE_METRICS, STAGE_ENTITY, STAGE_EVENT, STAGE_HANDLER, STAGE_QUEUE,
+                      STAGE_STATE_WRITE, STAGE_TOTAL, ZiGateMetrics,
+                      async_register_websocket as async_register_metrics_websocket)
+from .events import (EVENT_ATTRIBUTE_UPDATED, EVENTS_MODES, EVENTS_COMPACT, EVENTS_FULL,
+                     compact_event, full_event)
 
 
 _LOGGER = logging.getLogger(__name__)
 
 DATA_ZIGATE_DEVICES = 'zigate_devices'
 DATA_ZIGATE_ATTRS = 'zigate_attributes'
+DATA_ZIGATE_ROUTER = 'zigate_router'
+DATA_ZIGATE_COALESCER = 'zigate_coalescer'
+DATA_ZIGATE_QUEUE = 'zigate_queue'
+DATA_ZIGATE_DISCOVERY = 'zigate_discovery'
+DATA_ZIGATE_FIRMWARE = 'zigate_firmware'
+DATA_ZIGATE_REFRESHER = 'zigate_refresher'
+DATA_ZIGATE_POLLER = 'zigate_poller'
+DATA_ZIGATE_TRANSACTIONS = 'zigate_transactions'
+DATA_ZIGATE_STORE = 'zigate_store'
+DATA_ZIGATE_PROFILE = 'zigate_profile'
 ADDR = 'addr'
 IEEE = 'ieee'
 
@@ -55,6 +84,14 @@ CONFIG_SCHEMA = vol.Schema({
         vol.Optional('polling'): cv.boolean,
         vol.Optional(CONF_SCAN_INTERVAL): cv.positive_int,
         vol.Optional('admin_panel'): cv.boolean,
+        vol.Optional('coalesce_window'): cv.positive_int,
+        vol.Optional('max_in_flight'): cv.positive_int,
+        vol.Optional('multicast'): cv.boolean,
+        vol.Optional('events'): vol.In(EVENTS_MODES),
+        vol.Optional('refresh_concurrency'): cv.positive_int,
+        vol.Optional('poll_interval'): cv.positive_int,
+        vol.Optional('storage'): vol.In(STORAGE_MODES),
+        vol.Optional('metrics'): cv.boolean,
     })
 }, extra=vol.ALLOW_EXTRA)
 
@@ -97,6 +134,26 @@ READ_ATTRIBUTE_SCHEMA = vol.Schema({
     vol.Required('cluster'): cv.string,
     vol.Required('attribute_id'): cv.string,
     vol.Optional('manufacturer_code'): cv.string,
+    vol.Optional('request_id'): cv.string,
+    vol.Optional('timeout', default=REQUEST_TIMEOUT): cv.positive_int,
+})
+
+REPORTING_ATTRIBUTE_SCHEMA = vol.Schema({
+    vol.Required('attribute_id'): cv.string,
+    vol.Required('attribute_type'): cv.string,
+    vol.Optional('min_interval', default=1): cv.positive_int,
+    vol.Optional('max_interval', default=3600): cv.positive_int,
+    vol.Optional('change', default=0): vol.All(vol.Coerce(int), vol.Range(min=0, max=255)),
+})
+
+CONFIGURE_REPORTING_SCHEMA = vol.Schema({
+    vol.Optional(ADDR): cv.string,
+    vol.Optional(IEEE): cv.string,
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_id,
+    vol.Optional('endpoint'): cv.string,
+    vol.Optional('cluster'): cv.string,
+    vol.Optional('attributes'): vol.All(cv.ensure_list, [REPORTING_ATTRIBUTE_SCHEMA]),
+    vol.Optional('manufacturer_code'): cv.string,
 })
 
 WRITE_ATTRIBUTE_SCHEMA = vol.Schema({
@@ -111,6 +168,32 @@ WRITE_ATTRIBUTE_SCHEMA = vol.Schema({
     vol.Optional('manufacturer_code'): cv.string,
 })
 
+READ_ATTRIBUTES_ITEM_SCHEMA = vol.Schema({
+    vol.Optional('endpoint'): cv.string,
+    vol.Optional('cluster'): cv.string,
+    vol.Required('attribute_id'): cv.string,
+})
+
+READ_ATTRIBUTES_SCHEMA = vol.Schema({
+    vol.Optional(ADDR): cv.string,
+    vol.Optional(IEEE): cv.string,
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_id,
+    vol.Optional('endpoint', default='1'): cv.string,
+    vol.Optional('cluster', default='0'): cv.string,
+    vol.Required('attributes'): vol.All(cv.ensure_list, [READ_ATTRIBUTES_ITEM_SCHEMA]),
+    vol.Optional('manufacturer_code'): cv.string,
+    vol.Optional('request_id'): cv.string,
+})
+
+WRITE_ATTRIBUTES_ITEM_SCHEMA = READ_ATTRIBUTES_ITEM_SCHEMA.extend({
+    vol.Required('attribute_type'): cv.string,
+    vol.Required('value'): cv.string,
+})
+
+WRITE_ATTRIBUTES_SCHEMA = READ_ATTRIBUTES_SCHEMA.extend({
+    vol.Required('attributes'): vol.All(cv.ensure_list, [WRITE_ATTRIBUTES_ITEM_SCHEMA]),
+})
+
 ADD_GROUP_SCHEMA = vol.Schema({
     vol.Optional(ADDR): cv.string,
     vol.Optional(IEEE): cv.string,
@@ -127,6 +210,16 @@ REMOVE_GROUP_SCHEMA = vol.Schema({
     vol.Optional('group_addr'): cv.string,
 })
 
+UPGRADE_FIRMWARE_SCHEMA = vol.Schema({
+    vol.Optional('path'): cv.isfile,
+    vol.Optional('cached'): cv.boolean,
+})
+
+CREATE_GROUP_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Optional('group_addr'): cv.string,
+})
+
 GET_GROUP_MEMBERSHIP_SCHEMA = vol.Schema({
     vol.Optional(ADDR): cv.string,
     vol.Optional(IEEE): cv.string,
@@ -252,8 +345,27 @@ ACTION_IAS_SQUAWK_SCHEMA = vol.Schema({
 })
 
 
-def setup(hass, config):
+def skip_next_load_state(myzigate, loaded):
+    '''
+    The state was just loaded, the next myzigate.load_state call
+    (from autoStart) returns loaded without reloading it,
+    the following ones load the state again
+    '''
+    load_state = myzigate.load_state
+    overridden = 'load_state' in vars(myzigate)  # replaced by the store
+
+    def load_once(path=None):
+        if overridden:
+            myzigate.load_state = load_state
+        else:
+            del myzigate.load_state
+        return loaded
+    myzigate.load_state = load_once
+
+
+async def async_setup(hass, config):
     """Setup zigate platform."""
+    setup_start = monotonic()
     port = config[DOMAIN].get(CONF_PORT)
     host = config[DOMAIN].get(CONF_HOST)
     gpio = config[DOMAIN].get('gpio', False)
@@ -261,10 +373,21 @@ def setup(hass, config):
     polling = config[DOMAIN].get('polling', True)
     channel = config[DOMAIN].get('channel')
     scan_interval = datetime.timedelta(seconds=config[DOMAIN].get(CONF_SCAN_INTERVAL, SCAN_INTERVAL))
-    admin_panel = config[DOMAIN].get('admin_panel', True)
+    admin_panel = config[DOMAIN].get('admin_panel', False)
+    coalesce_window = config[DOMAIN].get('coalesce_window', COALESCE_WINDOW)
+    if coalesce_window is not None:
+        coalesce_window /= 1000
+    max_in_flight = config[DOMAIN].get('max_in_flight', MAX_IN_FLIGHT)
+    multicast = config[DOMAIN].get('multicast', True)
+    events = config[DOMAIN].get('events', EVENTS_COMPACT)
+    refresh_concurrency = config[DOMAIN].get('refresh_concurrency', REFRESH_CONCURRENCY)
+    poll_interval = config[DOMAIN].get('poll_interval', POLL_INTERVAL)
+    storage = config[DOMAIN].get('storage', STORAGE_SQLITE)
+    enable_metrics = config[DOMAIN].get('metrics', True)
 
     persistent_file = os.path.join(hass.config.config_dir,
                                    'zigate.json')
+    snapshot_file = os.path.join(hass.config.config_dir, 'zigate_entities.json')
 
     _LOGGER.debug('Port : %s', port)
     _LOGGER.debug('Host : %s', host)
@@ -272,35 +395,99 @@ def setup(hass, config):
     _LOGGER.debug('Led : %s', enable_led)
     _LOGGER.debug('Channel : %s', channel)
     _LOGGER.debug('Scan interval : %s', scan_interval)
-
-    myzigate = zigate.connect(port=port, host=host,
-                              path=persistent_file,
-                              auto_start=False,
-                              gpio=gpio
-                              )
+    _LOGGER.debug('Coalesce window : %s', coalesce_window)
+    _LOGGER.debug('Max in flight : %s', max_in_flight)
+    _LOGGER.debug('Multicast : %s', multicast)
+    _LOGGER.debug('Events : %s', events)
+    _LOGGER.debug('Refresh concurrency : %s', refresh_concurrency)
+    _LOGGER.debug('Poll interval : %s', poll_interval)
+    _LOGGER.debug('Storage : %s', storage)
+    _LOGGER.debug('Metrics : %s', enable_metrics)
+    _LOGGER.debug('Admin panel : %s', admin_panel)
+
+    profile = StartupProfile()
+    with profile.phase('connect'):
+        myzigate = await hass.async_add_executor_job(functools.partial(zigate.connect,
+                                                                       port=port, host=host,
+                                                                       path=persistent_file,
+                                                                       auto_start=False,
+                                                                       gpio=gpio
+                                                                       ))
     _LOGGER.debug('ZiGate object created %s', myzigate)
 
     hass.data[DOMAIN] = myzigate
+    hass.data[DATA_ZIGATE_PROFILE] = profile
+    store = None
+    if storage == STORAGE_SQLITE:
+        store = hass.data[DATA_ZIGATE_STORE] = ZiGateStore(os.path.join(hass.config.config_dir, 'zigate.db'),
+                                                           persistent_file)
+        store.attach(myzigate)
     hass.data[DATA_ZIGATE_DEVICES] = {}
     hass.data[DATA_ZIGATE_ATTRS] = {}
+    metrics = None
+    if enable_metrics:
+        metrics = hass.data[DATA_ZIGATE_METRICS] = ZiGateMetrics()
+        metrics.attach(myzigate)
+        zigate.dispatcher.connect(metrics.packet_received, zigate.ZIGATE_PACKET_RECEIVED, weak=False)
+        async_register_metrics_websocket(hass)
+    coalescer = hass.data[DATA_ZIGATE_COALESCER] = ZiGateCoalescer(hass, coalesce_window, metrics)
+    router = hass.data[DATA_ZIGATE_ROUTER] = ZiGateRouter(coalescer, metrics)
+    reporting = ZiGateReporting(hass, myzigate)
+    index = hass.data[DATA_ZIGATE_INDEX] = ZiGateDeviceIndex()
+
+    def entity_created(platform, device, arg, entity):
+        endpoint = arg['endpoint'] if isinstance(arg, dict) else arg
+        index.add_entity(device, endpoint, entity.entity_id, entity.unique_id)
+        reporting.entity_created(platform, device, arg)
+
+    discovery = ZiGateDiscovery(hass, hass.data[DATA_ZIGATE_ATTRS], entity_created)
+    hass.data[DATA_ZIGATE_DISCOVERY] = discovery
+    refresher = hass.data[DATA_ZIGATE_REFRESHER] = ZiGateRefresher(hass, refresh_concurrency)
+    poller = hass.data[DATA_ZIGATE_POLLER] = ZiGatePoller(hass, poll_interval)
+    network = hass.data[DATA_ZIGATE_NETWORK] = ZiGateNetwork(myzigate)
+    transactions = hass.data[DATA_ZIGATE_TRANSACTIONS] = ZiGateTransactions(hass, myzigate)
+    async_register_websocket(hass)
+    queue = hass.data[DATA_ZIGATE_QUEUE] = ZiGateCommandQueue(hass, myzigate, max_in_flight, multicast)
+    if metrics and getattr(hass, 'http', None):
+        from .adminpanel import metrics_setup
+        metrics_setup(hass, myzigate, metrics, queue)
 
     component = EntityComponent(_LOGGER, DOMAIN, hass, scan_interval)
 #     component.setup(config)
     entity = ZiGateComponentEntity(myzigate)
     hass.data[DATA_ZIGATE_DEVICES]['zigate'] = entity
-    component.add_entities([entity])
+    await component.async_add_entities([entity])
+
+    def _threadsafe(func, timed=False):
+        '''
+        Move zigate dispatcher signal, sent from zigate threads,
+        onto the event loop
+        if timed is set, the time the signal was sent is given as received
+        '''
+        def wrapper(**kwargs):
+            if timed:
+                kwargs['received'] = monotonic()
+            hass.loop.call_soon_threadsafe(functools.partial(func, **kwargs))
+        return wrapper
 
     def device_added(**kwargs):
         device = kwargs['device']
         _LOGGER.debug('Add device {}'.format(device))
         ieee = device.ieee
+        if store:
+            store.mark(ieee)
+        index.add_device(device)
         if ieee not in hass.data[DATA_ZIGATE_DEVICES]:
             hass.data[DATA_ZIGATE_DEVICES][ieee] = None  # reserve
-            entity = ZiGateDeviceEntity(hass, device, polling)
+            entity = ZiGateDeviceEntity(hass, device)
             hass.data[DATA_ZIGATE_DEVICES][ieee] = entity
-            component.add_entities([entity])
+            index.add_entity(device, None, entity.entity_id, ieee)
+            hass.async_create_task(component.async_add_entities([entity]))
+            if polling:
+                poller.add(device)
             if 'signal' in kwargs:
-                hass.components.persistent_notification.create(
+                reporting.device_joined(device)
+                hass.components.persistent_notification.async_create(
                     ('A new ZiGate device "{}"'
                      ' has been added !'
                      ).format(device),
@@ -310,53 +497,85 @@ def setup(hass, config):
         # component.async_remove_entity
         device = kwargs['device']
         ieee = device.ieee
-        hass.components.persistent_notification.create(
+        hass.components.persistent_notification.async_create(
             'The ZiGate device {}({}) is gone.'.format(device.ieee,
                                                        device.addr),
             title='ZiGate')
         entity = hass.data[DATA_ZIGATE_DEVICES][ieee]
-        component.async_remove_entity(entity.entity_id)
+        hass.async_create_task(component.async_remove_entity(entity.entity_id))
         del hass.data[DATA_ZIGATE_DEVICES][ieee]
+        index.remove_device(device)
+        poller.remove(ieee)
 
     def device_need_discovery(**kwargs):
         device = kwargs['device']
-        hass.components.persistent_notification.create(
+        hass.components.persistent_notification.async_create(
             ('The ZiGate device {}({}) needs to be discovered'
              ' (missing important'
              ' information)').format(device.ieee, device.addr),
             title='ZiGate')
 
-    zigate.dispatcher.connect(device_added,
+    zigate.dispatcher.connect(_threadsafe(device_added),
                               zigate.ZIGATE_DEVICE_ADDED, weak=False)
-    zigate.dispatcher.connect(device_removed,
+    zigate.dispatcher.connect(_threadsafe(device_removed),
                               zigate.ZIGATE_DEVICE_REMOVED, weak=False)
-    zigate.dispatcher.connect(device_need_discovery,
+    zigate.dispatcher.connect(_threadsafe(device_need_discovery),
                               zigate.ZIGATE_DEVICE_NEED_DISCOVERY, weak=False)
 
-    def attribute_updated(**kwargs):
+    def attribute_updated(received=None, **kwargs):
         device = kwargs['device']
         ieee = device.ieee
         attribute = kwargs['attribute']
-        _LOGGER.debug('Update attribute for device {} {}'.format(device,
-                                                                 attribute))
-        entity = hass.data[DATA_ZIGATE_DEVICES].get(ieee)
-        event_data = attribute.copy()
-        if type(event_data.get('type')) == type:
-            event_data['type'] = event_data['type'].__name__
-        event_data['ieee'] = device.ieee
-        event_data['addr'] = device.addr
-        event_data['device_type'] = device.get_property_value('type')
-        if entity:
-            event_data['entity_id'] = entity.entity_id
-        hass.bus.fire('zigate.attribute_updated', event_data)
-
-    zigate.dispatcher.connect(attribute_updated,
+        _LOGGER.debug('Update attribute for device %s %s', device, attribute)
+        if metrics:
+            start = metrics.add(STAGE_QUEUE, received)
+            metrics.report(ieee, attribute['cluster'])
+        router.dispatch(ieee, attribute)
+        if store:
+            store.mark(ieee)
+        discovery.attribute_updated(device, attribute)
+        refresher.device_seen(device)
+        poller.reported(device)
+        if metrics:
+            event_start = metrics.start()
+        if events == EVENTS_COMPACT:
+            hass.bus.async_fire(EVENT_ATTRIBUTE_UPDATED, compact_event(device, attribute))
+        elif events == EVENTS_FULL:
+            entity = hass.data[DATA_ZIGATE_DEVICES].get(ieee)
+            hass.bus.async_fire(EVENT_ATTRIBUTE_UPDATED, full_event(device, attribute, entity))
+        if metrics:
+            metrics.add(STAGE_EVENT, event_start)
+            metrics.add(STAGE_HANDLER, start)
+            metrics.add(STAGE_TOTAL, received)
+
+    zigate.dispatcher.connect(_threadsafe(attribute_updated, metrics is not None),
                               zigate.ZIGATE_ATTRIBUTE_UPDATED, weak=False)
 
+    def response_received(**kwargs):
+        transactions.response_received(kwargs['response'])
+
+    zigate.dispatcher.connect(_threadsafe(response_received),
+                              zigate.ZIGATE_RESPONSE_RECEIVED, weak=False)
+
+    def device_discovery(**kwargs):
+        device = kwargs['device']
+        attribute = kwargs.get('attribute')
+        discovery.discover(device, attribute)
+        if attribute:
+            # first report of an attribute, also route it
+            router.dispatch(device.ieee, attribute)
+
+    zigate.dispatcher.connect(_threadsafe(device_discovery),
+                              zigate.ZIGATE_ATTRIBUTE_ADDED, weak=False)
+    zigate.dispatcher.connect(_threadsafe(device_discovery),
+                              zigate.ZIGATE_DEVICE_UPDATED, weak=False)
+
     def device_updated(**kwargs):
         device = kwargs['device']
         _LOGGER.debug('Update device {}'.format(device))
         ieee = device.ieee
+        if store:
+            store.mark(ieee)
         entity = hass.data[DATA_ZIGATE_DEVICES].get(ieee)
         if not entity:
             _LOGGER.debug('Device not found {}, adding it'.format(device))
@@ -367,13 +586,20 @@ def setup(hass, config):
         event_data['device_type'] = device.get_property_value('type')
         if entity:
             event_data['entity_id'] = entity.entity_id
-        hass.bus.fire('zigate.device_updated', event_data)
+        router.dispatch_device(ieee, event_data)
+        hass.bus.async_fire('zigate.device_updated', event_data)
 
-    zigate.dispatcher.connect(device_updated,
+    zigate.dispatcher.connect(_threadsafe(device_updated),
                               zigate.ZIGATE_DEVICE_UPDATED, weak=False)
-    zigate.dispatcher.connect(device_updated,
+    zigate.dispatcher.connect(_threadsafe(device_updated),
                               zigate.ZIGATE_ATTRIBUTE_ADDED, weak=False)
-    zigate.dispatcher.connect(device_updated,
+    zigate.dispatcher.connect(_threadsafe(device_updated),
+                              zigate.ZIGATE_DEVICE_ADDRESS_CHANGED, weak=False)
+
+    def device_address_changed(**kwargs):
+        index.address_changed(kwargs['device'], kwargs['old_addr'])
+
+    zigate.dispatcher.connect(_threadsafe(device_address_changed),
                               zigate.ZIGATE_DEVICE_ADDRESS_CHANGED, weak=False)
 
     def zigate_reset(service):
@@ -388,30 +614,75 @@ def setup(hass, config):
         '''
         myzigate.cleanup_devices()
 
-    def start_zigate(service_event=None):
-        myzigate.autoStart(channel)
-        myzigate.start_auto_save()
-        myzigate.set_led(enable_led)
-        version = myzigate.get_version_text()
+    state_loaded = False
+    loaded_platforms = set()
+
+    def load_platforms():
+        for platform in SUPPORTED_PLATFORMS:
+            if platform not in loaded_platforms:
+                loaded_platforms.add(platform)
+                hass.async_create_task(async_load_platform(hass, platform, DOMAIN, {}, config))
+
+    async def start_zigate(service_event=None):
+        nonlocal state_loaded
+        if not state_loaded:
+            # load devices before the ZiGate is up, startup must not reload them
+            with profile.phase('load_state'):
+                loaded = await hass.async_add_executor_job(myzigate.load_state)
+            skip_next_load_state(myzigate, loaded)
+            state_loaded = True
+            with profile.phase('restore'):
+                snapshot = await hass.async_add_executor_job(load_snapshot, snapshot_file)
+                if snapshot:
+                    # warm start, entities are unavailable until the ZiGate is up
+                    for device in myzigate.devices:
+                        device_added(device=device)
+                    discovery.restore(myzigate.devices, snapshot)
+                    load_platforms()
+        with profile.phase('zigate_start'):
+            await hass.async_add_executor_job(myzigate.autoStart, channel)
+            await hass.async_add_executor_job(myzigate.start_auto_save)
+            await hass.async_add_executor_job(myzigate.set_led, enable_led)
+            version = await hass.async_add_executor_job(myzigate.get_version_text)
         if version < '3.1a':
-            hass.components.persistent_notification.create(
+            hass.components.persistent_notification.async_create(
                 ('Your zigate firmware is outdated, '
                  'Please upgrade to 3.1a or later !'),
                 title='ZiGate')
-        # first load
-        for device in myzigate.devices:
-            device_added(device=device)
+        with profile.phase('discovery'):
+            # first load, or reconcile the restored entities
+            for device in myzigate.devices:
+                device_added(device=device)
+                discovery.discover(device)
 
-        for platform in SUPPORTED_PLATFORMS:
-            load_platform(hass, platform, DOMAIN, {}, config)
+            load_platforms()
+            discovery.ready()
 
-        hass.bus.fire('zigate.started')
+        if polling:
+            poller.start()
+        if admin_panel and not getattr(myzigate, 'adminpanel', None):
+            # started once the ZiGate is up, it isn't needed before
+            hass.async_create_task(start_adminpanel())
+        hass.bus.async_fire('zigate.started')
 
-    def stop_zigate(service=None):
-        myzigate.save_state()
-        myzigate.close()
+    async def start_adminpanel():
+        _LOGGER.debug('Start ZiGate Admin Panel on port 9998')
+        with profile.phase('admin_panel'):
+            await hass.async_add_executor_job(myzigate.start_adminpanel)
+
+    async def stop_zigate(service=None):
+        poller.stop()
+        snapshot = discovery.snapshot()
+        if snapshot:
+            await hass.async_add_executor_job(save_snapshot, snapshot_file, snapshot)
+        if store:
+            await hass.async_add_executor_job(store.save, myzigate, True)
+            await hass.async_add_executor_job(store.close)
+        else:
+            await hass.async_add_executor_job(myzigate.save_state)
+        await hass.async_add_executor_job(myzigate.close)
 
-        hass.bus.fire('zigate.stopped')
+        hass.bus.async_fire('zigate.stopped')
 
     def refresh_devices_list(service):
         myzigate.get_devices_list()
@@ -419,19 +690,25 @@ def setup(hass, config):
     def generate_templates(service):
         myzigate.generate_templates(hass.config.config_dir)
 
+    def dump_metrics(service):
+        if not metrics:
+            _LOGGER.error('Metrics are disabled')
+            return
+        metrics.save(os.path.join(hass.config.config_dir, 'zigate_metrics.json'))
+
+    def _get_device_from_service_request(service):
+        '''
+        return (device, endpoint) targeted by service entity_id or ieee
+        must be called from the event loop, the service handlers are async
+        '''
+        return index.resolve(get_entity_registry(hass),
+                             service.data.get(ATTR_ENTITY_ID), service.data.get(IEEE))
+
     def _get_addr_from_service_request(service):
-        entity_id = service.data.get(ATTR_ENTITY_ID)
-        ieee = service.data.get(IEEE)
-        addr = service.data.get(ADDR)
-        if entity_id:
-            entity = component.get_entity(entity_id)
-            if entity:
-                addr = entity._device.addr
-        elif ieee:
-            device = myzigate.get_device_from_ieee(ieee)
-            if device:
-                addr = device.addr
-        return addr
+        device, endpoint = _get_device_from_service_request(service)
+        if device:
+            return device.addr
+        return service.data.get(ADDR)
 
     def _to_int(value):
         '''
@@ -441,19 +718,18 @@ def setup(hass, config):
             return int(value, 16)
         return int(value)
 
-    def refresh_device(service):
+    async def refresh_device(service):
         full = service.data.get('full', False)
         addr = _get_addr_from_service_request(service)
         if addr:
-            myzigate.refresh_device(addr, full=full)
+            await hass.async_add_executor_job(functools.partial(myzigate.refresh_device, addr, full=full))
         else:
-            for device in myzigate.devices:
-                device.refresh_device(full=full)
+            hass.async_create_task(refresher.async_refresh_all(list(myzigate.devices), full))
 
-    def discover_device(service):
+    async def discover_device(service):
         addr = _get_addr_from_service_request(service)
         if addr:
-            myzigate.discover_device(addr, True)
+            await hass.async_add_executor_job(myzigate.discover_device, addr, True)
 
     def network_scan(service):
         myzigate.start_network_scan()
@@ -463,13 +739,13 @@ def setup(hass, config):
         data = service.data.get('data', '')
         myzigate.send_data(cmd, data)
 
-    def identify_device(service):
+    async def identify_device(service):
         addr = _get_addr_from_service_request(service)
-        myzigate.identify_device(addr)
+        await hass.async_add_executor_job(myzigate.identify_device, addr)
 
-    def remove_device(service):
+    async def remove_device(service):
         addr = _get_addr_from_service_request(service)
-        myzigate.remove_device(addr)
+        await hass.async_add_executor_job(myzigate.remove_device, addr)
 
     def initiate_touchlink(service):
         myzigate.initiate_touchlink()
@@ -477,16 +753,62 @@ def setup(hass, config):
     def touchlink_factory_reset(service):
         myzigate.touchlink_factory_reset()
 
-    def read_attribute(service):
+    async def read_attribute(service):
         addr = _get_addr_from_service_request(service)
+        if not addr:
+            _LOGGER.error('Device not found')
+            return
         endpoint = _to_int(service.data.get('endpoint'))
         cluster = _to_int(service.data.get('cluster'))
         attribute_id = _to_int(service.data.get('attribute_id'))
         manufacturer_code = _to_int(service.data.get('manufacturer_code', '0'))
-        myzigate.read_attribute_request(addr, endpoint, cluster, attribute_id,
-                                        manufacturer_code=manufacturer_code)
+        event_data = {'addr': addr,
+                      'endpoint': endpoint,
+                      'cluster': cluster,
+                      'attribute': attribute_id,
+                      'request_id': service.data.get('request_id'),
+                      }
+        start = monotonic()
+        try:
+            responses = await transactions.async_read_attributes(addr, endpoint, cluster, [attribute_id],
+                                                                 manufacturer_code, service.data['timeout'])
+        except (ZiGateRequestError, asyncio.TimeoutError):
+            _LOGGER.error('No response reading attribute 0x%04x of %s', attribute_id, addr)
+            event_data['status'] = 'timeout'
+        else:
+            status = responses[attribute_id]['status']
+            event_data['status'] = status
+            event_data['latency_ms'] = round(1000 * (monotonic() - start))
+            device = myzigate.get_device_from_addr(addr)
+            attribute = device and device.get_attribute(endpoint, cluster, attribute_id)
+            if status == 0 and attribute:
+                event_data['ieee'] = device.ieee
+                event_data['name'] = attribute.get('name')
+                event_data['value'] = attribute.get('value')
+        hass.bus.async_fire(EVENT_READ_ATTRIBUTE_RESPONSE, event_data)
+
+    async def configure_reporting_service(service):
+        addr = _get_addr_from_service_request(service)
+        attributes = service.data.get('attributes')
+        if attributes:
+            endpoint = _to_int(service.data.get('endpoint', '1'))
+            cluster = _to_int(service.data.get('cluster', '0'))
+            attributes = [(_to_int(a['attribute_id']), _to_int(a['attribute_type']),
+                           a['min_interval'], a['max_interval'], a['change'])
+                          for a in attributes]
+            manufacturer_code = _to_int(service.data.get('manufacturer_code', '0'))
+            await hass.async_add_executor_job(configure_reporting, myzigate, addr, endpoint, cluster, attributes,
+                                              manufacturer_code)
+            return
+        # no attributes, apply default profiles
+        device = myzigate.get_device_from_addr(addr)
+        if not device:
+            return
+        for platform, key, endpoint in classify(device):
+            if platform in REPORTING_PROFILES:
+                await hass.async_add_executor_job(apply_profile, myzigate, device, platform, endpoint)
 
-    def write_attribute(service):
+    async def write_attribute(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint'))
         cluster = _to_int(service.data.get('cluster'))
@@ -495,27 +817,89 @@ def setup(hass, config):
         value = _to_int(service.data.get('value'))
         attributes = [(attribute_id, attribute_type, value)]
         manufacturer_code = _to_int(service.data.get('manufacturer_code', '0'))
-        myzigate.write_attribute_request(addr, endpoint, cluster, attributes,
-                                         manufacturer_code=manufacturer_code)
+        await hass.async_add_executor_job(functools.partial(myzigate.write_attribute_request,
+                                                            addr, endpoint, cluster, attributes,
+                                                            manufacturer_code=manufacturer_code))
+
+    def _service_attributes(service):
+        '''
+        return service attributes list with int values
+        endpoint and cluster default to the service ones
+        '''
+        endpoint = service.data['endpoint']
+        cluster = service.data['cluster']
+        attributes = []
+        for a in service.data['attributes']:
+            attribute = {'endpoint': _to_int(a.get('endpoint', endpoint)),
+                         'cluster': _to_int(a.get('cluster', cluster)),
+                         'attribute_id': _to_int(a['attribute_id'])}
+            if 'attribute_type' in a:
+                attribute['attribute_type'] = _to_int(a['attribute_type'])
+                attribute['value'] = _to_int(a['value'])
+            attributes.append(attribute)
+        return attributes
+
+    async def read_attributes(service):
+        addr = _get_addr_from_service_request(service)
+        device = myzigate.get_device_from_addr(addr)
+        if not device:
+            _LOGGER.error('Device not found %s', addr)
+            return
+        manufacturer_code = _to_int(service.data.get('manufacturer_code', '0'))
+        frames = split_requests(_service_attributes(service), MAX_READ_ATTRIBUTES)
+
+        def send(endpoint, cluster, attributes):
+            myzigate.read_attribute_request(device.addr, endpoint, cluster,
+                                            [a['attribute_id'] for a in attributes],
+                                            manufacturer_code=manufacturer_code)
+        hass.async_create_task(async_batch_request(hass, router, EVENT_READ_RESPONSE, device, frames, send,
+                                                   service.data.get('request_id')))
+
+    async def write_attributes(service):
+        addr = _get_addr_from_service_request(service)
+        device = myzigate.get_device_from_addr(addr)
+        if not device:
+            _LOGGER.error('Device not found %s', addr)
+            return
+        manufacturer_code = _to_int(service.data.get('manufacturer_code', '0'))
+        frames = split_requests(_service_attributes(service), max_size=MAX_WRITE_SIZE)
 
-    def add_group(service):
+        def send(endpoint, cluster, attributes):
+            myzigate.write_attribute_request(device.addr, endpoint, cluster,
+                                             [(a['attribute_id'], a['attribute_type'], a['value'])
+                                              for a in attributes],
+                                             manufacturer_code=manufacturer_code)
+        hass.async_create_task(async_batch_request(hass, router, EVENT_WRITE_RESPONSE, device, frames, send,
+                                                   service.data.get('request_id')))
+
+    async def add_group(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint'))
         groupaddr = service.data.get('group_addr')
-        myzigate.add_group(addr, endpoint, groupaddr)
+        await hass.async_add_executor_job(myzigate.add_group, addr, endpoint, groupaddr)
 
-    def remove_group(service):
+    async def remove_group(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint'))
         groupaddr = service.data.get('group_addr')
-        myzigate.remove_group(addr, endpoint, groupaddr)
+        await hass.async_add_executor_job(myzigate.remove_group, addr, endpoint, groupaddr)
 
-    def get_group_membership(service):
+    async def create_group(service):
+        entity_ids = service.data.get(ATTR_ENTITY_ID)
+        groupaddr = service.data.get('group_addr')
+        members = [entity for entity in list(hass.data[DATA_ZIGATE_ATTRS].values())
+                   if entity.entity_id in entity_ids and hasattr(entity, '_endpoint')]
+        for entity in members:
+            groupaddr = await hass.async_add_executor_job(myzigate.add_group,
+                                                          entity._device.addr, entity._endpoint, groupaddr)
+        _LOGGER.info('Group %s created for %s', groupaddr, [entity.entity_id for entity in members])
+
+    async def get_group_membership(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint'))
-        myzigate.get_group_membership(addr, endpoint)
+        await hass.async_add_executor_job(myzigate.get_group_membership, addr, endpoint)
 
-    def action_onoff(service):
+    async def action_onoff(service):
         addr = _get_addr_from_service_request(service)
         onoff = _to_int(service.data.get('onoff'))
         endpoint = _to_int(service.data.get('endpoint', '0'))
@@ -523,80 +907,79 @@ def setup(hass, config):
         offtime = _to_int(service.data.get('off_time', '0'))
         effect = _to_int(service.data.get('effect', '0'))
         gradient = _to_int(service.data.get('gradient', '0'))
-        myzigate.action_onoff(addr, endpoint, onoff, ontime, offtime, effect, gradient)
+        await hass.async_add_executor_job(myzigate.action_onoff, addr, endpoint, onoff, ontime, offtime, effect, gradient)
 
     def build_network_table(service):
-        table = myzigate.build_neighbours_table(service.data.get('force', False))
-        _LOGGER.debug('Neighbours table {}'.format(table))
+        network.scan(service.data.get('force', False))
 
     def ota_load_image(service):
         ota_image_path = service.data.get('imagepath')
         myzigate.ota_load_image(ota_image_path)
 
-    def ota_image_notify(service):
+    async def ota_image_notify(service):
         addr = _get_addr_from_service_request(service)
         destination_endpoint = _to_int(service.data.get('destination_endpoint', '1'))
         payload_type = _to_int(service.data.get('payload_type', '0'))
-        myzigate.ota_image_notify(addr, destination_endpoint, payload_type)
+        await hass.async_add_executor_job(myzigate.ota_image_notify, addr, destination_endpoint, payload_type)
 
     def get_ota_status(service):
         myzigate.get_ota_status()
 
-    def view_scene(service):
+    async def view_scene(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         groupaddr = service.data.get('group_addr')
         scene = _to_int(service.data.get('scene'))
-        myzigate.view_scene(addr, endpoint, groupaddr, scene)
+        await hass.async_add_executor_job(myzigate.view_scene, addr, endpoint, groupaddr, scene)
 
-    def add_scene(service):
+    async def add_scene(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         groupaddr = service.data.get('group_addr')
         scene = _to_int(service.data.get('scene'))
         name = service.data.get('scene_name')
         transition = _to_int(service.data.get('transition', '0'))
-        myzigate.add_scene(addr, endpoint, groupaddr, scene, name, transition)
+        await hass.async_add_executor_job(myzigate.add_scene, addr, endpoint, groupaddr, scene, name, transition)
 
-    def remove_scene(service):
+    async def remove_scene(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         groupaddr = service.data.get('group_addr')
         scene = _to_int(service.data.get('scene', -1))
         if scene == -1:
             scene = None
-        myzigate.remove_scene(addr, endpoint, groupaddr, scene)
+        await hass.async_add_executor_job(myzigate.remove_scene, addr, endpoint, groupaddr, scene)
 
-    def store_scene(service):
+    async def store_scene(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         groupaddr = service.data.get('group_addr')
         scene = _to_int(service.data.get('scene'))
-        myzigate.store_scene(addr, endpoint, groupaddr, scene)
+        await hass.async_add_executor_job(myzigate.store_scene, addr, endpoint, groupaddr, scene)
 
-    def recall_scene(service):
+    async def recall_scene(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         groupaddr = service.data.get('group_addr')
         scene = _to_int(service.data.get('scene'))
-        myzigate.recall_scene(addr, endpoint, groupaddr, scene)
+        await hass.async_add_executor_job(myzigate.recall_scene, addr, endpoint, groupaddr, scene)
 
-    def scene_membership_request(service):
+    async def scene_membership_request(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         groupaddr = service.data.get('group_addr')
-        myzigate.scene_membership_request(addr, endpoint, groupaddr)
+        await hass.async_add_executor_job(myzigate.scene_membership_request, addr, endpoint, groupaddr)
 
-    def copy_scene(service):
+    async def copy_scene(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         fromgroupaddr = service.data.get('from_group_addr')
         fromscene = _to_int(service.data.get('from_scene'))
         togroupaddr = service.data.get('to_group_addr')
         toscene = _to_int(service.data.get('to_scene'))
-        myzigate.copy_scene(addr, endpoint, fromgroupaddr, fromscene, togroupaddr, toscene)
+        await hass.async_add_executor_job(myzigate.copy_scene, addr, endpoint, fromgroupaddr, fromscene, togroupaddr, toscene)
 
-    def ias_warning(service):
+    async def ias_warning(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         mode = service.data.get('mode', 'burglar')
@@ -605,124 +988,144 @@ def setup(hass, config):
         duration = service.data.get('duration', 60)
         strobe_cycle = service.data.get('strobe_cycle', 10)
         strobe_level = service.data.get('strobe_level', 'low')
-        myzigate.action_ias_warning(addr, endpoint, mode, strobe, level, duration, strobe_cycle, strobe_level)
+        await hass.async_add_executor_job(myzigate.action_ias_warning, addr, endpoint, mode, strobe, level,
+                                          duration, strobe_cycle, strobe_level)
 
-    def ias_squawk(service):
+    async def ias_squawk(service):
         addr = _get_addr_from_service_request(service)
         endpoint = _to_int(service.data.get('endpoint', '1'))
         mode = service.data.get('mode', 'armed')
         strobe = service.data.get('strobe', True)
         level = service.data.get('level', 'low')
-        myzigate.action_ias_squawk(addr, endpoint, mode, strobe, level)
+        await hass.async_add_executor_job(myzigate.action_ias_squawk, addr, endpoint, mode, strobe, level)
 
-    def upgrade_firmware(service):
-        from zigate.flasher import flash
-        from zigate.firmware import download_latest
+    async def upgrade_firmware(service):
+        from .firmware import ZiGateFirmwareUpgrade
         port = myzigate._port
         pizigate = False
         if isinstance(myzigate, zigate.ZiGateGPIO):
             pizigate = True
         if myzigate._started and not pizigate:
             msg = 'You should stop zigate first using service zigate.stop_zigate and put zigate in download mode.'
-            hass.components.persistent_notification.create(msg, title='ZiGate')
+            hass.components.persistent_notification.async_create(msg, title='ZiGate')
             return
+        job = hass.data.get(DATA_ZIGATE_FIRMWARE)
+        if job and job.running:
+            _LOGGER.warning('Firmware upgrade already running')
+            return
+        entity = hass.data[DATA_ZIGATE_DEVICES]['zigate']
+        job = hass.data[DATA_ZIGATE_FIRMWARE] = ZiGateFirmwareUpgrade(
+            port, hass.config.config_dir, hass.config.path('zigate_firmware'),
+            on_progress=lambda: hass.loop.call_soon_threadsafe(entity.async_write_ha_state))
+        done = hass.loop.create_future()
         if pizigate:
-            stop_zigate()
-            myzigate.set_bootloader_mode()
-        backup_filename = 'zigate_backup_{:%Y%m%d%H%M%S}.bin'.format(datetime.datetime.now())
-        backup_filename = os.path.join(hass.config.config_dir, backup_filename)
-        flash(port, save=backup_filename)
-        msg = 'ZiGate backup created {}'.format(backup_filename)
-        hass.components.persistent_notification.create(msg, title='ZiGate')
-        firmware_path = service.data.get('path')
-        if not firmware_path:
-            firmware_path = download_latest()
-        flash(port, write=firmware_path)
-        msg = 'ZiGate flashed with {}'.format(firmware_path)
-        hass.components.persistent_notification.create(msg, title='ZiGate')
-        myzigate._version = None
+            await stop_zigate()
+            await hass.async_add_executor_job(myzigate.set_bootloader_mode)
+        job.start(service.data.get('path'), service.data.get('cached', False),
+                  lambda success: hass.loop.call_soon_threadsafe(done.set_result, success))
+        # the service returns while the upgrade runs in its own thread
+        hass.async_create_task(_async_upgrade_done(job, done, pizigate))
+
+    async def _async_upgrade_done(job, done, pizigate):
+        if await done:
+            msg = 'ZiGate flashed with {}, backup created {}'.format(job.firmware, job.backup)
+            myzigate._version = None
+        else:
+            msg = 'ZiGate firmware upgrade failed during {}: {}'.format(job.phase, job.error)
+            if job.backup:
+                msg += '. Backup created {}'.format(job.backup)
+        hass.components.persistent_notification.async_create(msg, title='ZiGate')
         if pizigate:
-            myzigate.set_running_mode()
-            start_zigate()
+            await hass.async_add_executor_job(myzigate.set_running_mode)
+            await start_zigate()
         else:
             msg = 'Now you have to unplug/replug the ZiGate USB key and then call service zigate.start_zigate'
-            hass.components.persistent_notification.create(msg, title='ZiGate')
-
-    hass.bus.listen_once(EVENT_HOMEASSISTANT_START, start_zigate)
-    hass.bus.listen_once(EVENT_HOMEASSISTANT_STOP, stop_zigate)
-
-    hass.services.register(DOMAIN, 'refresh_devices_list',
-                           refresh_devices_list)
-    hass.services.register(DOMAIN, 'generate_templates',
-                           generate_templates)
-    hass.services.register(DOMAIN, 'reset', zigate_reset)
-    hass.services.register(DOMAIN, 'permit_join', permit_join)
-    hass.services.register(DOMAIN, 'start_zigate', start_zigate)
-    hass.services.register(DOMAIN, 'stop_zigate', stop_zigate)
-    hass.services.register(DOMAIN, 'cleanup_devices', zigate_cleanup)
-    hass.services.register(DOMAIN, 'refresh_device',
-                           refresh_device,
-                           schema=REFRESH_DEVICE_SCHEMA)
-    hass.services.register(DOMAIN, 'discover_device',
-                           discover_device,
-                           schema=DISCOVER_DEVICE_SCHEMA)
-    hass.services.register(DOMAIN, 'network_scan', network_scan)
-    hass.services.register(DOMAIN, 'raw_command', raw_command,
-                           schema=RAW_COMMAND_SCHEMA)
-    hass.services.register(DOMAIN, 'identify_device', identify_device,
-                           schema=IDENTIFY_SCHEMA)
-    hass.services.register(DOMAIN, 'remove_device', remove_device,
-                           schema=REMOVE_SCHEMA)
-    hass.services.register(DOMAIN, 'initiate_touchlink', initiate_touchlink)
-    hass.services.register(DOMAIN, 'touchlink_factory_reset',
-                           touchlink_factory_reset)
-    hass.services.register(DOMAIN, 'read_attribute', read_attribute,
-                           schema=READ_ATTRIBUTE_SCHEMA)
-    hass.services.register(DOMAIN, 'write_attribute', write_attribute,
-                           schema=WRITE_ATTRIBUTE_SCHEMA)
-    hass.services.register(DOMAIN, 'add_group', add_group,
-                           schema=ADD_GROUP_SCHEMA)
-    hass.services.register(DOMAIN, 'get_group_membership', get_group_membership,
-                           schema=GET_GROUP_MEMBERSHIP_SCHEMA)
-    hass.services.register(DOMAIN, 'remove_group', remove_group,
-                           schema=REMOVE_GROUP_SCHEMA)
-    hass.services.register(DOMAIN, 'action_onoff', action_onoff,
-                           schema=ACTION_ONOFF_SCHEMA)
-    hass.services.register(DOMAIN, 'build_network_table', build_network_table,
-                           schema=BUILD_NETWORK_TABLE_SCHEMA)
-    hass.services.register(DOMAIN, 'ias_warning', ias_warning,
-                           schema=ACTION_IAS_WARNING_SCHEMA)
-    hass.services.register(DOMAIN, 'ias_squawk', ias_squawk,
-                           schema=ACTION_IAS_SQUAWK_SCHEMA)
-
-    hass.services.register(DOMAIN, 'ota_load_image', ota_load_image,
-                           schema=OTA_LOAD_IMAGE_SCHEMA)
-    hass.services.register(DOMAIN, 'ota_image_notify', ota_image_notify,
-                           schema=OTA_IMAGE_NOTIFY_SCHEMA)
-    hass.services.register(DOMAIN, 'ota_get_status', get_ota_status)
-    hass.services.register(DOMAIN, 'view_scene', view_scene,
-                           schema=VIEW_SCENE_SCHEMA)
-    hass.services.register(DOMAIN, 'add_scene', add_scene,
-                           schema=ADD_SCENE_SCHEMA)
-    hass.services.register(DOMAIN, 'remove_scene', remove_scene,
-                           schema=REMOVE_SCENE_SCHEMA)
-    hass.services.register(DOMAIN, 'store_scene', store_scene,
-                           schema=STORE_SCENE_SCHEMA)
-    hass.services.register(DOMAIN, 'recall_scene', recall_scene,
-                           schema=RECALL_SCENE_SCHEMA)
-    hass.services.register(DOMAIN, 'scene_membership_request', scene_membership_request,
-                           schema=SCENE_MEMBERSHIP_REQUEST_SCHEMA)
-    hass.services.register(DOMAIN, 'copy_scene', copy_scene,
-                           schema=COPY_SCENE_SCHEMA)
-    hass.services.register(DOMAIN, 'upgrade_firmware', upgrade_firmware)
-    track_time_change(hass, refresh_devices_list,
-                      hour=0, minute=0, second=0)
-
-    if admin_panel:
-        _LOGGER.debug('Start ZiGate Admin Panel on port 9998')
-        myzigate.start_adminpanel()
-        # myzigate.start_adminpanel(mount='/zigateproxy')
-        # adminpanel_setup(hass, 'zigateproxy')
+            hass.components.persistent_notification.async_create(msg, title='ZiGate')
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, start_zigate)
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, stop_zigate)
+
+    hass.services.async_register(DOMAIN, 'refresh_devices_list',
+                                 refresh_devices_list)
+    hass.services.async_register(DOMAIN, 'dump_metrics', dump_metrics)
+    hass.services.async_register(DOMAIN, 'generate_templates',
+                                 generate_templates)
+    hass.services.async_register(DOMAIN, 'reset', zigate_reset)
+    hass.services.async_register(DOMAIN, 'permit_join', permit_join)
+    hass.services.async_register(DOMAIN, 'start_zigate', start_zigate)
+    hass.services.async_register(DOMAIN, 'stop_zigate', stop_zigate)
+    hass.services.async_register(DOMAIN, 'cleanup_devices', zigate_cleanup)
+    hass.services.async_register(DOMAIN, 'refresh_device',
+                                 refresh_device,
+                                 schema=REFRESH_DEVICE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'discover_device',
+                                 discover_device,
+                                 schema=DISCOVER_DEVICE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'network_scan', network_scan)
+    hass.services.async_register(DOMAIN, 'raw_command', raw_command,
+                                 schema=RAW_COMMAND_SCHEMA)
+    hass.services.async_register(DOMAIN, 'identify_device', identify_device,
+                                 schema=IDENTIFY_SCHEMA)
+    hass.services.async_register(DOMAIN, 'remove_device', remove_device,
+                                 schema=REMOVE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'initiate_touchlink', initiate_touchlink)
+    hass.services.async_register(DOMAIN, 'touchlink_factory_reset',
+                                 touchlink_factory_reset)
+    hass.services.async_register(DOMAIN, 'read_attribute', read_attribute,
+                                 schema=READ_ATTRIBUTE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'configure_reporting', configure_reporting_service,
+                                 schema=CONFIGURE_REPORTING_SCHEMA)
+    hass.services.async_register(DOMAIN, 'write_attribute', write_attribute,
+                                 schema=WRITE_ATTRIBUTE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'read_attributes', read_attributes,
+                                 schema=READ_ATTRIBUTES_SCHEMA)
+    hass.services.async_register(DOMAIN, 'write_attributes', write_attributes,
+                                 schema=WRITE_ATTRIBUTES_SCHEMA)
+    hass.services.async_register(DOMAIN, 'add_group', add_group,
+                                 schema=ADD_GROUP_SCHEMA)
+    hass.services.async_register(DOMAIN, 'create_group', create_group,
+                                 schema=CREATE_GROUP_SCHEMA)
+    hass.services.async_register(DOMAIN, 'get_group_membership', get_group_membership,
+                                 schema=GET_GROUP_MEMBERSHIP_SCHEMA)
+    hass.services.async_register(DOMAIN, 'remove_group', remove_group,
+                                 schema=REMOVE_GROUP_SCHEMA)
+    hass.services.async_register(DOMAIN, 'action_onoff', action_onoff,
+                                 schema=ACTION_ONOFF_SCHEMA)
+    hass.services.async_register(DOMAIN, 'build_network_table', build_network_table,
+                                 schema=BUILD_NETWORK_TABLE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'ias_warning', ias_warning,
+                                 schema=ACTION_IAS_WARNING_SCHEMA)
+    hass.services.async_register(DOMAIN, 'ias_squawk', ias_squawk,
+                                 schema=ACTION_IAS_SQUAWK_SCHEMA)
+
+    hass.services.async_register(DOMAIN, 'ota_load_image', ota_load_image,
+                                 schema=OTA_LOAD_IMAGE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'ota_image_notify', ota_image_notify,
+                                 schema=OTA_IMAGE_NOTIFY_SCHEMA)
+    hass.services.async_register(DOMAIN, 'ota_get_status', get_ota_status)
+    hass.services.async_register(DOMAIN, 'view_scene', view_scene,
+                                 schema=VIEW_SCENE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'add_scene', add_scene,
+                                 schema=ADD_SCENE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'remove_scene', remove_scene,
+                                 schema=REMOVE_SCENE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'store_scene', store_scene,
+                                 schema=STORE_SCENE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'recall_scene', recall_scene,
+                                 schema=RECALL_SCENE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'scene_membership_request', scene_membership_request,
+                                 schema=SCENE_MEMBERSHIP_REQUEST_SCHEMA)
+    hass.services.async_register(DOMAIN, 'copy_scene', copy_scene,
+                                 schema=COPY_SCENE_SCHEMA)
+    hass.services.async_register(DOMAIN, 'upgrade_firmware', upgrade_firmware,
+                                 schema=UPGRADE_FIRMWARE_SCHEMA)
+    async_track_time_change(hass, refresh_devices_list,
+                            hour=0, minute=0, second=0)
+
+    # admin panel is started with the ZiGate
+    # myzigate.start_adminpanel(mount='/zigateproxy')
+    # from .adminpanel import adminpanel_setup
+    # adminpanel_setup(hass, 'zigateproxy')
 
 #     hass.async_create_task(
 #         hass.config_entries.flow.async_init(
@@ -730,6 +1133,7 @@ def setup(hass, config):
 #         )
 #     )
 
+    profile.record('setup', setup_start)
     return True
 
 
@@ -738,6 +1142,145 @@ def setup(hass, config):
 #     return False
 
 
+class ZiGateCoalescer(object):
+    '''
+    Merge the state writes requested for an entity during a short window
+    into a single one, devices often report several attributes per frame.
+    If window is None the writes requested during the same loop iteration
+    are merged, so that consecutive states (on then off) are all written,
+    if window is 0 each write is done immediately.
+    Must be used from the event loop.
+    '''
+    def __init__(self, hass, window=0, metrics=None):
+        self._hass = hass
+        self._window = window
+        self._metrics = metrics
+        self._pending = set()
+        self.requested = 0
+        self.written = 0
+
+    @property
+    def saved(self):
+        '''
+        number of state writes avoided
+        '''
+        return self.requested - self.written - len(self._pending)
+
+    def schedule(self, entity):
+        '''
+        Schedule a state write for entity
+        '''
+        self.requested += 1
+        if self._window == 0:
+            self._write(entity)
+            return
+        if entity in self._pending:
+            return
+        self._pending.add(entity)
+        if self._window is None:
+            self._hass.loop.call_soon(self._flush, entity)
+        else:
+            self._hass.loop.call_later(self._window, self._flush, entity)
+
+    def _flush(self, entity):
+        self._pending.discard(entity)
+        if entity.hass:  # not removed during the window
+            self._write(entity)
+
+    def _write(self, entity):
+        self.written += 1
+        if not self._metrics:
+            entity.async_write_ha_state()
+            return
+        start = self._metrics.start()
+        entity.async_write_ha_state()
+        self._metrics.add(STAGE_STATE_WRITE, start)
+
+
+class _Registration(object):
+    '''
+    Unregister an entity from the router when called,
+    lighter than a closure for each entity
+    '''
+    __slots__ = ('_router', '_key', '_entity')
+
+    def __init__(self, router, key, entity):
+        self._router = router
+        self._key = key
+        self._entity = entity
+
+    def __call__(self):
+        self._router.unregister(self._key, self._entity)
+
+
+class ZiGateRouter(object):
+    '''
+    Deliver attribute updates only to the entities interested in them.
+
+    Entities register for a (ieee,), (ieee, endpoint) or
+    (ieee, endpoint, cluster, attribute) key, so routing a report costs
+    a few dict lookups whatever the number of entities.
+    The entity state write is then scheduled through the coalescer.
+    Must be used from the event loop.
+    '''
+    def __init__(self, coalescer, metrics=None):
+        self._coalescer = coalescer
+        self._metrics = metrics
+        self._routes = {}
+
+    def register(self, entity, ieee, endpoint=None, cluster=None, attribute=None):
+        '''
+        Register entity for the given key, return a function to unregister it.
+        entity._handle_event(data) will be called for each update.
+        '''
+        if endpoint is None:
+            key = (ieee,)
+        elif cluster is None:
+            key = (ieee, endpoint)
+        else:
+            key = (ieee, endpoint, cluster, attribute)
+        # entities are stored in tuples so that an entity can register
+        # while an update is being dispatched
+        self._routes[key] = self._routes.get(key, ()) + (entity,)
+        return _Registration(self, key, entity)
+
+    def unregister(self, key, entity):
+        entities = tuple(e for e in self._routes.get(key, ()) if e is not entity)
+        if entities:
+            self._routes[key] = entities
+        else:
+            self._routes.pop(key, None)
+
+    def dispatch(self, ieee, attribute):
+        '''
+        Route attribute update to registered entities
+        '''
+        routes = self._routes
+        endpoint = attribute['endpoint']
+        for key in ((ieee, endpoint, attribute['cluster'], attribute['attribute']),
+                    (ieee, endpoint),
+                    (ieee,)):
+            for entity in routes.get(key, ()):
+                self._deliver(entity, attribute)
+
+    def dispatch_device(self, ieee, data):
+        '''
+        Route device update to device level entities
+        '''
+        for entity in self._routes.get((ieee,), ()):
+            self._deliver(entity, data)
+
+    def _deliver(self, entity, data):
+        if self._metrics:
+            start = self._metrics.start()
+            entity._handle_event(data)
+            self._metrics.add(STAGE_ENTITY, start)
+        else:
+            entity._handle_event(data)
+        if entity.hass:
+            self._coalescer.schedule(entity)
+
+
 class ZiGateComponentEntity(Entity):
     '''Representation of ZiGate Key'''
     def __init__(self, myzigate):
@@ -745,10 +1288,6 @@ class ZiGateComponentEntity(Entity):
         self._device = myzigate
         self.entity_id = '{}.{}'.format(DOMAIN, 'zigate')
 
-    @property
-    def network_table(self):
-        return self._device._neighbours_table_cache
-
     @property
     def should_poll(self):
         """No polling."""
@@ -778,11 +1317,39 @@ class ZiGateComponentEntity(Entity):
             return {}
         attrs = {'addr': self._device.addr,
                  'ieee': self._device.ieee,
-                 'groups': self._device.groups,
-                 'network_table': self.network_table,
                  'firmware_version': self._device.get_version_text(),
                  'lib version': zigate.__version__
                  }
+        network = self.hass.data.get(DATA_ZIGATE_NETWORK)
+        if network:
+            attrs.update(network.summary())
+        coalescer = self.hass.data.get(DATA_ZIGATE_COALESCER)
+        if coalescer:
+            attrs.update({'state_writes_requested': coalescer.requested,
+                          'state_writes': coalescer.written,
+                          'state_writes_saved': coalescer.saved,
+                          })
+        queue = self.hass.data.get(DATA_ZIGATE_QUEUE)
+        if queue:
+            attrs.update(queue.stats())
+        poller = self.hass.data.get(DATA_ZIGATE_POLLER)
+        if poller:
+            attrs.update(poller.stats())
+        transactions = self.hass.data.get(DATA_ZIGATE_TRANSACTIONS)
+        if transactions:
+            attrs.update(transactions.stats())
+        store = self.hass.data.get(DATA_ZIGATE_STORE)
+        if store:
+            attrs.update(store.stats())
+        profile = self.hass.data.get(DATA_ZIGATE_PROFILE)
+        if profile:
+            attrs.update(profile.stats())
+        metrics = self.hass.data.get(DATA_ZIGATE_METRICS)
+        if metrics:
+            attrs.update(metrics.stats())
+        firmware = self.hass.data.get(DATA_ZIGATE_FIRMWARE)
+        if firmware:
+            attrs.update(firmware.state())
         return attrs
 
     @property
@@ -793,25 +1360,30 @@ class ZiGateComponentEntity(Entity):
 class ZiGateDeviceEntity(Entity):
     '''Representation of ZiGate device'''
 
-    def __init__(self, hass, device, polling=True):
+    def __init__(self, hass, device):
         """Initialize the sensor."""
-        self._polling = polling
         self._device = device
         ieee = device.ieee or device.addr
         self.entity_id = '{}.{}'.format(DOMAIN, ieee)
-        hass.bus.listen('zigate.attribute_updated', self._handle_event)
-        hass.bus.listen('zigate.device_updated', self._handle_event)
+        self._unregister = hass.data[DATA_ZIGATE_ROUTER].register(self,
+                                                                  device.ieee)
+        self._transactions = hass.data.get(DATA_ZIGATE_TRANSACTIONS)
+        self._static_attrs = None
+        self._last_seen = (None, None)
+
+    def _handle_event(self, data):
+        _LOGGER.debug('Update received for device %s', self._device)
+        # device attributes only depend on basic and power clusters
+        if data.get('cluster') in (None, 0x0000, 0x0001):
+            self._static_attrs = None
 
-    def _handle_event(self, call):
-        if self._device.ieee == call.data['ieee']:
-            if not self.hass:
-                raise PlatformNotReady
-            self.schedule_update_ha_state()
+    async def async_will_remove_from_hass(self):
+        self._unregister()
 
     @property
     def should_poll(self):
-        """No polling."""
-        return self._polling and self._device.receiver_on_when_idle()
+        """No polling, quiet devices are polled by ZiGatePoller."""
+        return False
 
     def update(self):
         self._device.refresh_device()
@@ -830,35 +1402,60 @@ class ZiGateDeviceEntity(Entity):
     def unique_id(self) -> str:
         return self._device.ieee
 
+    def _get_static_attrs(self):
+        '''
+        return device attributes which only change
+        on device update or basic and power cluster update,
+        groups are not cached, they change on the group services
+        '''
+        if self._static_attrs is None:
+            receiver_on_when_idle = self._device.receiver_on_when_idle()
+            attrs = {'type': self._device.get_value('type'),
+                     'manufacturer': self._device.get_value('manufacturer'),
+                     'receiver_on_when_idle': receiver_on_when_idle,
+                     'generic_type': self._device.genericType,
+                     'discovery': self._device.discovery,
+                     'datecode': self._device.get_value('datecode')
+                     }
+            if not receiver_on_when_idle:
+                attrs.update({'battery_voltage': self._device.get_value('battery_voltage'),
+                              ATTR_BATTERY_LEVEL: int(self._device.battery_percent),
+                              })
+            self._static_attrs = attrs
+        return self._static_attrs
+
     @property
     def device_state_attributes(self):
         """Return the device specific state attributes."""
         attrs = {'lqi_percent': int(self._device.lqi_percent),
-                 'type': self._device.get_value('type'),
-                 'manufacturer': self._device.get_value('manufacturer'),
-                 'receiver_on_when_idle': self._device.receiver_on_when_idle(),
                  'missing': self._device.missing,
-                 'generic_type': self._device.genericType,
-                 'discovery': self._device.discovery,
-                 'groups': self._device.groups,
-                 'datecode': self._device.get_value('datecode')
                  }
-        if not self._device.receiver_on_when_idle():
-            attrs.update({'battery_voltage': self._device.get_value('battery_voltage'),
-                          ATTR_BATTERY_LEVEL: int(self._device.battery_percent),
-                          })
+        attrs.update(self._get_static_attrs())
+        attrs['groups'] = self._device.groups
         attrs.update(self._device.info)
+        if self._transactions:
+            attrs.update(self._transactions.device_stats(self._device.ieee))
         return attrs
 
+    def _get_last_seen(self):
+        '''
+        return last_seen as datetime, parsed only when it changes
+        '''
+        last_seen = self._device.info.get('last_seen')
+        if last_seen != self._last_seen[0]:
+            try:
+                self._last_seen = (last_seen, datetime.datetime.fromisoformat(last_seen))
+            except (TypeError, ValueError):
+                self._last_seen = (last_seen, None)
+        return self._last_seen[1]
+
     @property
     def icon(self):
         if self._device.missing:
             return 'mdi:emoticon-dead'
-        if self.state:
-            last_24h = datetime.datetime.now() - datetime.timedelta(hours=24)
-            last_24h = last_24h.strftime('%Y-%m-%d %H:%M:%S')
-            if not self.state or self.state < last_24h:
-                return 'mdi:help'
+        last_seen = self._get_last_seen()
+        if last_seen and datetime.datetime.now() - last_seen > datetime.timedelta(hours=24):
+            return 'mdi:help'
         return 'mdi:access-point'
 
     @property
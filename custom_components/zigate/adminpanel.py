@@ -1,6 +1,28 @@
-"""ZiGate Admin panel proxy."""
+"""ZiGate Admin panel proxy and metrics view."""
+import asyncio
+import logging
+
 import aiohttp
+from aiohttp import hdrs, web
 from homeassistant.components.http import HomeAssistantView
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+from .metrics import OPENMETRICS_CONTENT_TYPE
+
+_LOGGER = logging.getLogger(__name__)
+
+# headers which only concern a single connection
+HOP_HEADERS = {name.lower() for name in (hdrs.CONNECTION,
+                                         hdrs.CONTENT_LENGTH,
+                                         hdrs.CONTENT_ENCODING,
+                                         hdrs.TRANSFER_ENCODING,
+                                         hdrs.UPGRADE,
+                                         hdrs.SEC_WEBSOCKET_EXTENSIONS,
+                                         hdrs.SEC_WEBSOCKET_PROTOCOL,
+                                         hdrs.SEC_WEBSOCKET_VERSION,
+                                         hdrs.SEC_WEBSOCKET_KEY,
+                                         )}
+CHUNK_SIZE = 4096
 
 
 class PanelProxy(HomeAssistantView):
@@ -10,13 +32,17 @@ class PanelProxy(HomeAssistantView):
     cors_allowed = True
     name = "panelproxy"
 
-    def __init__(self, url, proxy_url):
+    def __init__(self, hass, url, proxy_url):
         """Initialize view url."""
         self.url = url + r"{requested_url:.*}"
         self.proxy_url = proxy_url
+        # one keep-alive session for all the proxied requests
+        self._session = async_create_clientsession(hass)
 
     async def get(self, request, requested_url):
         """Handle GET proxy requests."""
+        if _is_websocket(request):
+            return await self._handle_websocket(request, requested_url)
         return await self._handle_request("GET", request, requested_url)
 
     async def post(self, request, requested_url):
@@ -24,31 +50,126 @@ class PanelProxy(HomeAssistantView):
         return await self._handle_request("POST", request, requested_url)
 
     async def _handle_request(self, method, request, requested_url):
-        """Handle proxy requests."""
+        """Handle proxy requests, streaming both bodies."""
         requested_url = requested_url or "/"
-        headers = request.headers.copy()
-        headers["Host"] = request.host
-        headers["X-Real-Ip"] = request.remote
-        headers["X-Forwarded-For"] = request.remote
-        headers["X-Forwarded-Proto"] = request.scheme
-        post_data = await request.read()
-        async with aiohttp.request(
+        async with self._session.request(
             method,
             self.proxy_url + requested_url,
             params=request.query,
-            data=post_data,
-            headers=headers,
+            data=request.content if request.body_exists else None,
+            headers=_request_headers(request),
+            allow_redirects=False,
+            timeout=aiohttp.ClientTimeout(total=None),
         ) as resp:
-            content = await resp.read()
-            headers = resp.headers.copy()
-            return aiohttp.web.Response(
-                body=content, status=resp.status, headers=headers
-            )
+            headers = {name: value for name, value in resp.headers.items()
+                       if name.lower() not in HOP_HEADERS}
+            response = web.StreamResponse(status=resp.status, headers=headers)
+            try:
+                await response.prepare(request)
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    await response.write(chunk)
+            except (aiohttp.ClientError, ConnectionResetError) as err:
+                _LOGGER.debug("Admin panel stream error %s: %s", requested_url, err)
+            return response
+
+    async def _handle_websocket(self, request, requested_url):
+        """Handle websocket proxy requests."""
+        protocols = [protocol.strip() for protocol in
+                     request.headers.get(hdrs.SEC_WEBSOCKET_PROTOCOL, '').split(',')
+                     if protocol.strip()]
+        ws_server = web.WebSocketResponse(protocols=protocols, autoclose=False, autoping=False)
+        await ws_server.prepare(request)
+        try:
+            async with self._session.ws_connect(
+                self.proxy_url + (requested_url or "/"),
+                params=request.query,
+                headers=_request_headers(request),
+                protocols=protocols,
+                autoclose=False,
+                autoping=False,
+            ) as ws_client:
+                forwards = [asyncio.create_task(_websocket_forward(ws_server, ws_client)),
+                            asyncio.create_task(_websocket_forward(ws_client, ws_server))]
+                try:
+                    await asyncio.wait(forwards, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    # one side closed, stop forwarding the other one
+                    for task in forwards:
+                        task.cancel()
+                    await asyncio.gather(*forwards, return_exceptions=True)
+                    await ws_client.close()
+        except aiohttp.ClientError as err:
+            _LOGGER.debug("Admin panel websocket error %s: %s", requested_url, err)
+        finally:
+            await ws_server.close()
+        return ws_server
+
+
+class MetricsView(HomeAssistantView):
+    """OpenMetrics View, for Prometheus."""
+
+    requires_auth = True
+    url = "/api/zigate/metrics"
+    name = "api:zigate:metrics"
+
+    def __init__(self, myzigate, metrics, queue=None):
+        """Initialize metrics sources."""
+        self._zigate = myzigate
+        self._metrics = metrics
+        self._queue = queue
+
+    async def get(self, request):
+        """Handle metrics scrape."""
+        body = self._metrics.openmetrics(self._zigate, self._queue)
+        return web.Response(body=body.encode(), headers={hdrs.CONTENT_TYPE: OPENMETRICS_CONTENT_TYPE})
+
+
+def _request_headers(request):
+    """Build headers sent to the admin panel."""
+    headers = {name: value for name, value in request.headers.items()
+               if name.lower() not in HOP_HEADERS}
+    headers[hdrs.HOST] = request.host
+    headers["X-Real-Ip"] = request.remote
+    headers[hdrs.X_FORWARDED_FOR] = request.remote
+    headers[hdrs.X_FORWARDED_PROTO] = request.scheme
+    return headers
+
+
+def _is_websocket(request):
+    """Return True if request is a websocket upgrade."""
+    return ("upgrade" in request.headers.get(hdrs.CONNECTION, "").lower() and
+            request.headers.get(hdrs.UPGRADE, "").lower() == "websocket")
+
+
+async def _websocket_forward(ws_from, ws_to):
+    """Forward websocket messages until ws_from closes, then close ws_to with the same code."""
+    try:
+        async for msg in ws_from:
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                await ws_to.send_str(msg.data)
+            elif msg.type == aiohttp.WSMsgType.BINARY:
+                await ws_to.send_bytes(msg.data)
+            elif msg.type == aiohttp.WSMsgType.PING:
+                await ws_to.ping()
+            elif msg.type == aiohttp.WSMsgType.PONG:
+                await ws_to.pong()
+        # close messages end the iteration
+        code = ws_from.close_code
+        if code is None or code == aiohttp.WSCloseCode.ABNORMAL_CLOSURE:
+            code = aiohttp.WSCloseCode.OK
+        await ws_to.close(code=code)
+    except (RuntimeError, ConnectionResetError):
+        _LOGGER.debug("Admin panel websocket closed")
+
+
+def metrics_setup(hass, myzigate, metrics, queue=None):
+    """Set up the metrics view."""
+    hass.http.register_view(MetricsView(myzigate, metrics, queue))
 
 
 def adminpanel_setup(hass, url_path):
     """Set up the proxy frontend panels."""
-    hass.http.register_view(PanelProxy("/" + url_path, 'http://localhost:9998/' + url_path))
+    hass.http.register_view(PanelProxy(hass, "/" + url_path, 'http://localhost:9998/' + url_path))
     hass.components.frontend.async_register_built_in_panel(
         "iframe",
         "Zigate Admin",
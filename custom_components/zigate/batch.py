@@ -0,0 +1,117 @@
+"""
+ZiGate batched attribute requests.
+
+Read or write many attributes of a device with as few frames as
+possible and fire a single event with the results.
+"""
+import asyncio
+import logging
+import struct
+
+from zigate.const import DATA_TYPE
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_READ_RESPONSE = 'zigate.read_attributes_response'
+EVENT_WRITE_RESPONSE = 'zigate.write_attributes_response'
+
+MAX_READ_ATTRIBUTES = 10  # zigate read attribute request limit
+MAX_WRITE_SIZE = 64  # bytes of attribute records in a write attribute request
+RESPONSE_TIMEOUT = 10
+
+
+def attribute_size(attribute_type):
+    '''
+    return size of a write attribute record (id, type, value)
+    '''
+    fmt = DATA_TYPE.get(attribute_type) or 's'
+    return 3 + struct.calcsize('!' + fmt)
+
+
+def split_requests(attributes, max_count=MAX_READ_ATTRIBUTES, max_size=None):
+    '''
+    Split attributes into frames of a single endpoint and cluster
+    attributes is a list of dict with endpoint, cluster, attribute_id
+    and attribute_type if max_size is given.
+    return list of (endpoint, cluster, attributes)
+    '''
+    clusters = {}
+    for attribute in attributes:
+        clusters.setdefault((attribute['endpoint'], attribute['cluster']), []).append(attribute)
+    frames = []
+    for (endpoint, cluster), cluster_attributes in clusters.items():
+        frame = []
+        size = 0
+        for attribute in cluster_attributes:
+            attribute_size_ = attribute_size(attribute['attribute_type']) if max_size else 0
+            if frame and (len(frame) >= max_count or (max_size and size + attribute_size_ > max_size)):
+                frames.append((endpoint, cluster, frame))
+                frame = []
+                size = 0
+            frame.append(attribute)
+            size += attribute_size_
+        if frame:
+            frames.append((endpoint, cluster, frame))
+    return frames
+
+
+class AttributeCollector(object):
+    '''
+    Collect attribute updates of a device through the router
+    until all the expected attributes are received.
+    Must be used from the event loop.
+    '''
+    hass = None  # not an entity, no state to write
+
+    def __init__(self, router, ieee, attributes):
+        self._expected = {(a['endpoint'], a['cluster'], a['attribute_id']) for a in attributes}
+        self._done = asyncio.Event()
+        self.results = {}
+        self._unregister = [router.register(self, ieee, *key) for key in self._expected]
+
+    def _handle_event(self, data):
+        key = (data['endpoint'], data['cluster'], data['attribute'])
+        if key in self._expected:
+            self.results[key] = data.get('value')
+            if len(self.results) == len(self._expected):
+                self._done.set()
+
+    async def async_wait(self, timeout=RESPONSE_TIMEOUT):
+        '''
+        Wait for all the attributes, then stop collecting
+        return list of received attributes and list of missing ones
+        '''
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for unregister in self._unregister:
+                unregister()
+        received = [{'endpoint': endpoint, 'cluster': cluster, 'attribute': attribute, 'value': value}
+                    for (endpoint, cluster, attribute), value in self.results.items()]
+        missing = [{'endpoint': endpoint, 'cluster': cluster, 'attribute': attribute}
+                   for (endpoint, cluster, attribute) in sorted(self._expected - set(self.results))]
+        return received, missing
+
+
+async def async_batch_request(hass, router, event_type, device, frames, send, request_id=None):
+    '''
+    Send frames with send(endpoint, cluster, attributes) in the executor,
+    collect responses and fire event_type with the results
+    '''
+    attributes = [a for endpoint, cluster, frame in frames for a in frame]
+    collector = AttributeCollector(router, device.ieee, attributes)
+    for endpoint, cluster, frame in frames:
+        try:
+            await hass.async_add_executor_job(send, endpoint, cluster, frame)
+        except Exception:
+            _LOGGER.exception('Failed to send request to %s', device)
+    received, missing = await collector.async_wait()
+    hass.bus.async_fire(event_type, {'ieee': device.ieee,
+                                     'addr': device.addr,
+                                     'request_id': request_id,
+                                     'frames': len(frames),
+                                     'attributes': received,
+                                     'missing': missing,
+                                     })
@@ -6,105 +6,66 @@ https://home-assistant.io/components/climate.zigate/
 """
 import logging
 
-from homeassistant.exceptions import PlatformNotReady
 from homeassistant.const import ATTR_TEMPERATURE, TEMP_CELSIUS
 from homeassistant.components.climate import ClimateEntity, ENTITY_ID_FORMAT
 from homeassistant.components.climate.const import SUPPORT_TARGET_TEMPERATURE, SUPPORT_PRESET_MODE, HVAC_MODE_HEAT
-import zigate
-from . import DOMAIN as ZIGATE_DOMAIN
-from . import DATA_ZIGATE_ATTRS
+from . import DATA_ZIGATE_DISCOVERY, DATA_ZIGATE_ROUTER, DATA_ZIGATE_QUEUE
+from .metadata import ZiGateEntityMetadata
 SUPPORT_FLAGS = SUPPORT_TARGET_TEMPERATURE | SUPPORT_PRESET_MODE
+# local temperature, occupancy, occupied and unoccupied heating setpoints
+THERMOSTAT_ATTRIBUTES = (0x0000, 0x0002, 0x0012, 0x0014)
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def setup_platform(hass, config, add_entities, discovery_info=None):
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the zigate climate devices."""
     if discovery_info is None:
         return
 
-    myzigate = hass.data[ZIGATE_DOMAIN]
-
-    def sync_attributes():
-        devs = []
-        for device in myzigate.devices:
-            ieee = device.ieee or device.addr  # compatibility
-            actions = device.available_actions()
-            if not any(actions.values()):
-                continue
-            for endpoint, action_type in actions.items():
-                if [zigate.ACTIONS_THERMOSTAT] == action_type:
-                    key = '{}-{}-{}'.format(ieee,
-                                            'climate',
-                                            endpoint
-                                            )
-                    if key in hass.data[DATA_ZIGATE_ATTRS]:
-                        continue
-                    _LOGGER.debug(('Creating climate '
-                                   'for device '
-                                   '{} {}').format(device,
-                                                   endpoint))
-                    entity = ZigateClimate(hass, device, endpoint)
-                    devs.append(entity)
-                    hass.data[DATA_ZIGATE_ATTRS][key] = entity
-
-        add_entities(devs)
-    sync_attributes()
-    zigate.dispatcher.connect(sync_attributes,
-                              zigate.ZIGATE_ATTRIBUTE_ADDED, weak=False)
-
-
-class ZigateClimate(ClimateEntity):
+    hass.data[DATA_ZIGATE_DISCOVERY].register_platform('climate', ZigateClimate, async_add_entities)
+
+
+class ZigateClimate(ZiGateEntityMetadata, ClimateEntity):
     """Representation of a Zigate climate device."""
 
     def __init__(self, hass, device, endpoint):
         """Initialize the ZiGate climate."""
-        self._device = device
+        self._init_endpoint_metadata(device, 'climate', endpoint)
         self._endpoint = endpoint
+        # thermostat attributes values, refreshed by _handle_event
+        self._thermostat = {}
+        for attribute in THERMOSTAT_ATTRIBUTES:
+            a = device.get_attribute(endpoint, 0x0201, attribute)
+            if a and 'value' in a:
+                self._thermostat[attribute] = a['value']
         ieee = device.ieee or device.addr  # compatibility
         entity_id = 'zigate_{}_{}'.format(ieee,
                                           endpoint)
         self.entity_id = ENTITY_ID_FORMAT.format(entity_id)
-        hass.bus.listen('zigate.attribute_updated', self._handle_event)
+        self._unregister = hass.data[DATA_ZIGATE_ROUTER].register(self,
+                                                                  device.ieee,
+                                                                  endpoint)
 
         self._support_flags = SUPPORT_FLAGS
         self._hvac_mode = HVAC_MODE_HEAT
 
-    def _handle_event(self, call):
-        if (
-            self._device.ieee == call.data['ieee']
-            and self._endpoint == call.data['endpoint']
-        ):
-            _LOGGER.debug("Event received: %s", call.data)
-            if not self.hass:
-                raise PlatformNotReady
-            self.schedule_update_ha_state()
+    def _handle_event(self, data):
+        _LOGGER.debug("Event received: %s", data)
+        if data['cluster'] == 0x0201 and data['attribute'] in THERMOSTAT_ATTRIBUTES:
+            self._thermostat[data['attribute']] = data['value']
 
-    @property
-    def unique_id(self) -> str:
-        if self._device.ieee:
-            return '{}-{}-{}'.format(self._device.ieee,
-                                     'climate',
-                                     self._endpoint)
+    async def async_will_remove_from_hass(self):
+        self._unregister()
 
     @property
     def supported_features(self):
         """Return the list of supported features."""
         return self._support_flags
 
-    @property
-    def should_poll(self) -> bool:
-        return False
-
     def update(self):
         self._device.refresh_device()
 
-    @property
-    def name(self):
-        """Return the name of the device if any."""
-        return '{} {}'.format(self._device,
-                              self._endpoint)
-
     @property
     def temperature_unit(self):
         """Return the unit of measurement."""
@@ -113,11 +74,7 @@ class ZigateClimate(ClimateEntity):
     @property
     def current_temperature(self):
         """Return the current temperature."""
-        t = 0
-        a = self._device.get_attribute(self._endpoint, 0x0201, 0x0000)
-        if a:
-            t = a.get('value', 0)
-        return t
+        return self._thermostat.get(0x0000, 0)
 
     @property
     def target_temperature(self):
@@ -126,11 +83,7 @@ class ZigateClimate(ClimateEntity):
             attr = 0x0014
         else:
             attr = 0x0012
-        t = 0
-        a = self._device.get_attribute(self._endpoint, 0x0201, attr)
-        if a:
-            t = a.get('value', 0)
-        return t
+        return self._thermostat.get(attr, 0)
 
     @property
     def hvac_mode(self):
@@ -149,28 +102,23 @@ class ZigateClimate(ClimateEntity):
 
     @property
     def preset_mode(self):
-        t = 1
-        a = self._device.get_attribute(self._endpoint, 0x0201, 0x0002)
-        if a:
-            t = a.get('value', t)
-        if t == 0:
+        if self._thermostat.get(0x0002, 1) == 0:
             return 'away'
         return 'home'
 
-    def set_preset_mode(self, preset_mode: str):
+    async def async_set_preset_mode(self, preset_mode: str):
         """Set new preset mode."""
         if preset_mode == 'away':
-            self.hass.data[ZIGATE_DOMAIN].write_attribute_request(self._device.addr,
-                                                                  self._endpoint,
-                                                                  0x0201,
-                                                                  [(0x0002, 0x18, 0)])
+            value = 0
         else:
-            self.hass.data[ZIGATE_DOMAIN].write_attribute_request(self._device.addr,
-                                                                  self._endpoint,
-                                                                  0x0201,
-                                                                  [(0x0002, 0x18, 1)])
-
-    def set_temperature(self, **kwargs):
+            value = 1
+        self.hass.data[DATA_ZIGATE_QUEUE].async_send('preset', 'write_attribute_request',
+                                                     self._device.addr,
+                                                     self._endpoint,
+                                                     0x0201,
+                                                     [(0x0002, 0x18, value)])
+
+    async def async_set_temperature(self, **kwargs):
         """Set new target temperatures."""
         if kwargs.get(ATTR_TEMPERATURE) is not None:
             temp = int(kwargs.get(ATTR_TEMPERATURE) * 100)
@@ -178,17 +126,9 @@ class ZigateClimate(ClimateEntity):
                 attr = 0x0014
             else:
                 attr = 0x0012
-            self.hass.data[ZIGATE_DOMAIN].write_attribute_request(self._device.addr,
-                                                                  self._endpoint,
-                                                                  0x0201,
-                                                                  [(attr, 0x29, temp)])
-        self.schedule_update_ha_state()
-
-    @property
-    def device_state_attributes(self):
-        """Return the state attributes."""
-        return {
-            'addr': self._device.addr,
-            'ieee': self._device.ieee,
-            'endpoint': '0x{:02x}'.format(self._endpoint),
-        }
+            self.hass.data[DATA_ZIGATE_QUEUE].async_send('setpoint', 'write_attribute_request',
+                                                         self._device.addr,
+                                                         self._endpoint,
+                                                         0x0201,
+                                                         [(attr, 0x29, temp)])
+        self.async_write_ha_state()
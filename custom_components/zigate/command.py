@@ -0,0 +1,191 @@
+"""
+ZiGate outbound command queue.
+
+Commands sent by the entities go through this queue instead of calling
+the zigate library directly, so that a scene switching many devices
+doesn't flood the coordinator.
+"""
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from time import monotonic
+
+from .group import GROUP_METHODS, GROUP_ENDPOINT, plan_multicast
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ZiGateCommandQueue(object):
+    '''
+    Schedule commands sent to devices.
+
+    Commands are queued per destination (addr, endpoint) and sent in order,
+    a command replaces the pending one of the same kind for the same
+    destination (last write wins).
+    At most max_in_flight commands are sent to the ZiGate at the same time.
+    If multicast is enabled, identical light and switch commands sent
+    during the same loop iteration to all members of a group are replaced
+    by a single group command. The group command replaces the pending
+    commands of the same kind of its members, it is sent once the commands
+    already being sent to its members are done, and the next commands to
+    its members wait until it is sent.
+    Must be used from the event loop.
+    '''
+    def __init__(self, hass, myzigate, max_in_flight=2, multicast=True):
+        self._hass = hass
+        self._zigate = myzigate
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._multicast = multicast
+        self._batch = None
+        self._queues = {}
+        self._workers = {}
+        self._sending = {}  # destination: future done when its current command is sent
+        self._barriers = {}  # member destination: set of futures done when group commands are sent
+        self._latency = deque(maxlen=100)
+        self.in_flight = 0
+        self.sent = 0
+        self.merged = 0
+        self.failed = 0
+        self.multicast = 0
+        self.multicast_saved = 0
+
+    @property
+    def depth(self):
+        '''
+        number of pending commands
+        '''
+        depth = sum(len(queue) for queue in self._queues.values())
+        if self._batch:
+            depth += sum(len(destinations) for destinations in self._batch.values())
+        return depth
+
+    def async_send(self, kind, method, addr, endpoint, *args):
+        '''
+        Queue call of zigate method(addr, endpoint, *args)
+        kind identifies the commands which replace each other
+        '''
+        if self._multicast and method in GROUP_METHODS:
+            if self._batch is None:
+                self._batch = {}
+                self._hass.loop.call_soon(self._flush_batch)
+            self._batch.setdefault((kind, method, args), []).append((addr, endpoint))
+            return
+        self._enqueue(kind, method, addr, endpoint, args)
+
+    def _flush_batch(self):
+        batch, self._batch = self._batch, None
+        groups = None
+        for (kind, method, args), destinations in batch.items():
+            if len(destinations) > 1:
+                if groups is None:
+                    groups = dict(self._zigate.groups)
+                multicast, destinations = plan_multicast(groups, destinations)
+                for group, members in multicast:
+                    _LOGGER.debug('Send %s to group %s instead of %s', method, group, members)
+                    self.multicast += 1
+                    self.multicast_saved += len(members) - 1
+                    self._enqueue(kind, method, group, GROUP_ENDPOINT, args, members)
+            for addr, endpoint in destinations:
+                self._enqueue(kind, method, addr, endpoint, args)
+
+    def _enqueue(self, kind, method, addr, endpoint, args, members=()):
+        '''
+        Queue command, members are the destinations of a group command
+        '''
+        destination = (addr, endpoint)
+        queue = self._queues.setdefault(destination, OrderedDict())
+        sent = None
+        if kind in queue:
+            self.merged += 1
+            replaced_method, replaced_args, queued, sent, replaced_members = queue.pop(kind)
+            if sent and set(replaced_members) != set(members):
+                # group membership changed, release the replaced command members
+                self._group_sent(sent, replaced_members)
+                sent = None
+                for member in set(replaced_members) - set(members):
+                    pending = self._queues.get(member)
+                    if not pending or kind not in pending:
+                        # not covered by the new group command, send it to the member
+                        self._enqueue(kind, replaced_method, member[0], member[1], replaced_args)
+        if members:
+            if sent is None:
+                sent = self._hass.loop.create_future()
+            for member in members:
+                pending = self._queues.get(member)
+                if pending and kind in pending:
+                    # older than the group command
+                    self.merged += 1
+                    del pending[kind]
+                self._barriers.setdefault(member, set()).add(sent)
+        queue[kind] = (method, args, monotonic(), sent, members)
+        if destination not in self._workers:
+            self._workers[destination] = self._hass.async_create_task(self._async_run(destination))
+
+    async def _async_run(self, destination):
+        queue = self._queues[destination]
+        addr, endpoint = destination
+        try:
+            while queue:
+                await self._async_wait_groups(destination)
+                if not queue:
+                    break
+                kind, (method, args, queued, sent, members) = queue.popitem(last=False)
+                sending = self._sending[destination] = self._hass.loop.create_future()
+                if members:
+                    in_flight = [self._sending[member] for member in members if member in self._sending]
+                    if in_flight:
+                        await asyncio.wait(in_flight)
+                async with self._semaphore:
+                    self.in_flight += 1
+                    try:
+                        func = getattr(self._zigate, method)
+                        await self._hass.async_add_executor_job(func, addr, endpoint, *args)
+                        self.sent += 1
+                    except Exception:
+                        _LOGGER.exception('Failed to send %s to %s', method, destination)
+                        self.failed += 1
+                    finally:
+                        self.in_flight -= 1
+                        del self._sending[destination]
+                        sending.set_result(None)
+                        if sent:
+                            self._group_sent(sent, members)
+                self._latency.append(monotonic() - queued)
+        finally:
+            del self._workers[destination]
+            if not queue:
+                del self._queues[destination]
+
+    async def _async_wait_groups(self, destination):
+        '''
+        Wait until the group commands sent to destination are sent
+        '''
+        barriers = self._barriers.get(destination)
+        while barriers:
+            await asyncio.wait(list(barriers))
+            barriers = self._barriers.get(destination)
+
+    def _group_sent(self, sent, members):
+        sent.set_result(None)
+        for member in members:
+            barriers = self._barriers.get(member)
+            if barriers is not None:
+                barriers.discard(sent)
+                if not barriers:
+                    del self._barriers[member]
+
+    def stats(self):
+        '''
+        return queue metrics
+        '''
+        latency = list(self._latency)
+        return {'queue_depth': self.depth,
+                'queue_in_flight': self.in_flight,
+                'commands_sent': self.sent,
+                'commands_merged': self.merged,
+                'commands_failed': self.failed,
+                'commands_multicast': self.multicast,
+                'commands_multicast_saved': self.multicast_saved,
+                'command_latency_avg_ms': round(1000 * sum(latency) / len(latency)) if latency else 0,
+                'command_latency_max_ms': round(1000 * max(latency)) if latency else 0,
+                }
@@ -1,3 +1,5 @@
 
 DOMAIN = 'zigate'
 SCAN_INTERVAL = 120
+COALESCE_WINDOW = None  # ms, None merges the writes of the same loop iteration
+MAX_IN_FLIGHT = 2
@@ -0,0 +1,226 @@
+"""
+ZiGate entity discovery.
+
+Decide which platform entities a device should expose and create them
+incrementally, device by device, as the zigate library reports changes.
+"""
+import logging
+import sys
+
+import zigate
+
+_LOGGER = logging.getLogger(__name__)
+
+LIGHT_ACTIONS = (zigate.ACTIONS_LEVEL,
+                 zigate.ACTIONS_COLOR,
+                 zigate.ACTIONS_TEMPERATURE,
+                 zigate.ACTIONS_HUE,
+                 )
+
+# platforms created from a single action type on an endpoint
+ENDPOINT_PLATFORMS = ((zigate.ACTIONS_ONOFF, 'switch'),
+                      (zigate.ACTIONS_COVER, 'cover'),
+                      (zigate.ACTIONS_THERMOSTAT, 'climate'),
+                      (zigate.ACTIONS_LOCK, 'lock'),
+                      )
+
+
+def attribute_key(ieee, attribute):
+    '''
+    return entity key of an attribute based entity (sensor, binary_sensor),
+    interned as it is also the entity unique_id
+    '''
+    return sys.intern('{}-{}-{}-{}'.format(ieee,
+                                           attribute['endpoint'],
+                                           attribute['cluster'],
+                                           attribute['attribute'],
+                                           ))
+
+
+def endpoint_key(ieee, platform, endpoint):
+    '''
+    return entity key of an endpoint based entity (light, switch, etc),
+    interned as it is also the entity unique_id
+    '''
+    return sys.intern('{}-{}-{}'.format(ieee, platform, endpoint))
+
+
+def classify_attribute(attribute):
+    '''
+    return the platform of an attribute based entity
+    or None if the attribute should not be exposed
+    '''
+    if attribute['cluster'] < 5 or 'name' not in attribute:
+        return
+    if type(attribute.get('value')) in (bool, dict):
+        return 'binary_sensor'
+    return 'sensor'
+
+
+def classify(device, attribute=None, pending=None):
+    '''
+    Classify device into a list of (platform, key, arg)
+    where arg is the attribute or the endpoint given to the entity.
+    If attribute is given, only this attribute is evaluated
+    for sensor and binary_sensor platforms.
+    Attributes which could be exposed but have no value yet
+    are appended to pending list if given.
+    '''
+    ieee = device.ieee or device.addr  # compatibility
+    entities = []
+    actions = device.available_actions()
+    if any(actions.values()):
+        for endpoint, action_type in actions.items():
+            if any(i in action_type for i in LIGHT_ACTIONS):
+                entities.append(('light', endpoint_key(ieee, 'light', endpoint), endpoint))
+                continue
+            for action, platform in ENDPOINT_PLATFORMS:
+                if [action] == action_type:
+                    entities.append((platform, endpoint_key(ieee, platform, endpoint), endpoint))
+        return entities
+    if attribute is None:
+        attributes = device.attributes
+    else:
+        attributes = [attribute]
+    for attribute in attributes:
+        platform = classify_attribute(attribute)
+        if not platform:
+            continue
+        if attribute.get('value') is None:
+            if pending is not None:
+                pending.append(attribute)
+            continue
+        entities.append((platform, attribute_key(ieee, attribute), attribute))
+    return entities
+
+
+class ZiGateDiscovery(object):
+    '''
+    Create platform entities for a device when it changes.
+
+    Only the device carried by the signal is classified, entities are then
+    handed to the platform which registered for them, or kept until that
+    platform is set up.
+    created(platform, device, arg, entity) is called for each new entity.
+    Entities could be restored from a snapshot before the ZiGate is up,
+    they are unavailable until ready() is called.
+    Must be used from the event loop.
+    '''
+    def __init__(self, hass, entities, created=None):
+        self._hass = hass
+        self._entities = entities
+        self._created = created
+        self._platforms = {}
+        self._waiting = {}
+        self._pending = set()
+        self._origins = {}
+        self._restored = set()
+
+    def register_platform(self, platform, entity_class, add_entities):
+        '''
+        Register platform entity class and add_entities callback,
+        add the entities already discovered for it
+        '''
+        self._platforms[platform] = (entity_class, add_entities)
+        waiting = [(key, device, arg)
+                   for key, (p, device, arg) in self._waiting.items()
+                   if p == platform]
+        for key, device, arg in waiting:
+            del self._waiting[key]
+        entities = [self._create(platform, key, device, arg)
+                    for key, device, arg in waiting]
+        if entities:
+            add_entities(entities)
+
+    def discover(self, device, attribute=None):
+        '''
+        Create missing entities for device
+        '''
+        new_entities = {}
+        pending = []
+        for platform, key, arg in classify(device, attribute, pending):
+            if key in self._entities or key in self._waiting:
+                continue
+            if platform not in self._platforms:
+                self._waiting[key] = (platform, device, arg)
+                continue
+            entity = self._create(platform, key, device, arg)
+            new_entities.setdefault(platform, []).append(entity)
+        for a in pending:
+            self._pending.add(self._pending_key(device, a))
+        for platform, entities in new_entities.items():
+            self._platforms[platform][1](entities)
+
+    def snapshot(self):
+        '''
+        return list of (platform, key, ieee, arg) of created entities
+        arg is the endpoint or the [endpoint, cluster, attribute] of the entity
+        '''
+        return [[platform, key, ieee, arg] for key, (platform, ieee, arg) in self._origins.items()]
+
+    def restore(self, devices, snapshot):
+        '''
+        Create the snapshot entities of devices, unavailable until ready()
+        '''
+        devices = {device.ieee: device for device in devices}
+        new_entities = {}
+        for platform, key, ieee, arg in snapshot:
+            device = devices.get(ieee)
+            if not device or key in self._entities or key in self._waiting:
+                continue
+            if isinstance(arg, list):
+                arg = device.get_attribute(*arg, extended_info=True)
+                if not arg:
+                    continue
+            self._restored.add(key)
+            if platform not in self._platforms:
+                self._waiting[key] = (platform, device, arg)
+                continue
+            new_entities.setdefault(platform, []).append(self._create(platform, key, device, arg))
+        for platform, entities in new_entities.items():
+            self._platforms[platform][1](entities)
+        _LOGGER.debug('%s entities restored', len(self._restored))
+
+    def ready(self):
+        '''
+        ZiGate is up, make the restored entities available
+        '''
+        for key in self._restored:
+            entity = self._entities.get(key)
+            if entity is None:
+                continue
+            entity._available = True
+            if entity.hass:
+                entity.async_write_ha_state()
+        self._restored = set()
+
+    def attribute_updated(self, device, attribute):
+        '''
+        Discover entities for attribute which had no value when added
+        '''
+        if not self._pending:
+            return
+        key = self._pending_key(device, attribute)
+        if key in self._pending and attribute.get('value') is not None:
+            self._pending.discard(key)
+            self.discover(device, attribute)
+
+    def _create(self, platform, key, device, arg):
+        _LOGGER.debug('Creating %s for device %s %s', platform, device, arg)
+        entity_class = self._platforms[platform][0]
+        entity = entity_class(self._hass, device, arg)
+        self._entities[key] = entity
+        if key in self._restored:
+            entity._available = False
+        if isinstance(arg, dict):
+            origin = [arg['endpoint'], arg['cluster'], arg['attribute']]
+        else:
+            origin = arg
+        self._origins[key] = (platform, device.ieee, origin)
+        if self._created:
+            self._created(platform, device, arg, entity)
+        return entity
+
+    @staticmethod
+    def _pending_key(device, attribute):
+        return (device.ieee, attribute['endpoint'], attribute['cluster'], attribute['attribute'])
@@ -0,0 +1,40 @@
+"""
+ZiGate bus events.
+
+Build the zigate.attribute_updated event payloads.
+"""
+EVENT_ATTRIBUTE_UPDATED = 'zigate.attribute_updated'
+
+EVENTS_COMPACT = 'compact'
+EVENTS_FULL = 'full'
+EVENTS_DISABLED = 'disabled'
+EVENTS_MODES = (EVENTS_COMPACT, EVENTS_FULL, EVENTS_DISABLED)
+
+# keys of the compact payload, kept in this order
+COMPACT_KEYS = ('endpoint', 'cluster', 'attribute', 'name', 'value')
+
+
+def compact_event(device, attribute):
+    '''
+    return compact event data, the attribute identity and its value
+    '''
+    event_data = {'ieee': device.ieee}
+    for key in COMPACT_KEYS:
+        if key in attribute:
+            event_data[key] = attribute[key]
+    return event_data
+
+
+def full_event(device, attribute, entity=None):
+    '''
+    return full event data, the whole attribute with device details
+    '''
+    event_data = attribute.copy()
+    if type(event_data.get('type')) == type:
+        event_data['type'] = event_data['type'].__name__
+    event_data['ieee'] = device.ieee
+    event_data['addr'] = device.addr
+    event_data['device_type'] = device.get_property_value('type')
+    if entity:
+        event_data['entity_id'] = entity.entity_id
+    return event_data
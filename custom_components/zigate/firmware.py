@@ -0,0 +1,240 @@
+"""
+ZiGate firmware upgrade.
+
+Backup, verify and write the ZiGate firmware in a worker thread,
+reporting the current phase and progress.
+"""
+import datetime
+import glob
+import hashlib
+import logging
+import os
+import threading
+
+from zigate import flasher
+
+_LOGGER = logging.getLogger(__name__)
+
+PHASE_IDLE = 'idle'
+PHASE_DOWNLOAD = 'download'
+PHASE_BACKUP = 'backup'
+PHASE_VERIFY = 'verify'
+PHASE_WRITE = 'write'
+PHASE_DONE = 'done'
+PHASE_FAILED = 'failed'
+
+BLOCK_SIZE = 128
+
+
+class FirmwareError(Exception):
+    pass
+
+
+def open_serial(port):
+    '''
+    open ZiGate serial port in bootloader mode
+    '''
+    import serial
+    return serial.Serial(flasher.discover_port(port), 38400, timeout=5)
+
+
+def latest_cached_firmware(cache_dir):
+    '''
+    return the most recent firmware file in cache_dir or None
+    '''
+    files = glob.glob(os.path.join(cache_dir, '*.bin'))
+    if files:
+        return max(files, key=os.path.getmtime)
+
+
+class ZiGateFirmwareUpgrade(object):
+    '''
+    Firmware upgrade job.
+
+    Phases are download (if no firmware given), backup, verify and write,
+    progress is the percentage of the current phase.
+    serial_factory(port) must return a serial like object,
+    a simulated device could be used for tests.
+    '''
+    def __init__(self, port, backup_dir, cache_dir, serial_factory=open_serial, on_progress=None):
+        self._port = port
+        self._backup_dir = backup_dir
+        self._cache_dir = cache_dir
+        self._serial_factory = serial_factory
+        self._on_progress = on_progress
+        self._thread = None
+        self.phase = PHASE_IDLE
+        self.progress = 0
+        self.backup = None
+        self.firmware = None
+        self.error = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def state(self):
+        '''
+        return job state
+        '''
+        return {'firmware_upgrade_phase': self.phase,
+                'firmware_upgrade_progress': self.progress,
+                }
+
+    def start(self, firmware=None, cached=False, on_done=None):
+        '''
+        Start upgrade in a worker thread
+        on_done(success) is called from the worker thread at the end
+        '''
+        if self.running:
+            raise FirmwareError('Firmware upgrade already running')
+
+        def target():
+            success = self.run(firmware, cached)
+            if on_done:
+                on_done(success)
+        self._thread = threading.Thread(target=target, name='ZiGate-firmware', daemon=True)
+        self._thread.start()
+
+    def run(self, firmware=None, cached=False):
+        '''
+        Run the upgrade, blocking
+        return True on success
+        '''
+        self.backup = self.firmware = self.error = None
+        try:
+            self.firmware = self._get_firmware(firmware, cached)
+            self._check_image(self.firmware)
+            ser = self._serial_factory(self._port)
+            try:
+                self._prepare(ser)
+                self.backup, checksum = self._backup(ser)
+                self._verify(ser, self.backup, checksum)
+                self._write(ser, self.firmware)
+                flasher.change_baudrate(ser, 38400)
+            finally:
+                ser.close()
+        except (Exception, SystemExit) as e:
+            # flasher raises SystemExit on failure
+            _LOGGER.exception('Firmware upgrade failed during %s', self.phase)
+            self.error = str(e) or type(e).__name__
+            self._set_phase(PHASE_FAILED)
+            return False
+        self._set_phase(PHASE_DONE, 100)
+        return True
+
+    def _set_phase(self, phase, progress=0):
+        self.phase = phase
+        self.progress = progress
+        if self._on_progress:
+            self._on_progress()
+
+    def _set_progress(self, progress):
+        if progress != self.progress:
+            self.progress = progress
+            if self._on_progress:
+                self._on_progress()
+
+    def _get_firmware(self, firmware, cached):
+        if firmware:
+            return firmware
+        if cached:
+            firmware = latest_cached_firmware(self._cache_dir)
+            if not firmware:
+                raise FirmwareError('No cached firmware in {}'.format(self._cache_dir))
+            return firmware
+        self._set_phase(PHASE_DOWNLOAD)
+        from zigate.firmware import download_latest
+        os.makedirs(self._cache_dir, exist_ok=True)
+        firmware = download_latest(self._cache_dir)
+        if not firmware:
+            raise FirmwareError('Failed to download firmware')
+        return firmware
+
+    @staticmethod
+    def _check_image(filename):
+        # checked before erasing the flash
+        with open(filename, 'rb') as fp:
+            if fp.read(4) != flasher.ZIGATE_BINARY_VERSION:
+                raise FirmwareError('Not a valid image for ZiGate {}'.format(filename))
+
+    @staticmethod
+    def _prepare(ser):
+        flasher.change_baudrate(ser, 115200)
+        flasher.check_chip_id(ser)
+        flash_type = flasher.get_flash_type(ser)
+        _LOGGER.info('Found MAC-address: %s', flasher.get_mac(ser))
+        flasher.select_flash(ser, flash_type)
+
+    def _read_flash(self, ser):
+        '''
+        yield the flash blocks up to the image size given in its header
+        '''
+        cur = flasher.ZIGATE_FLASH_START
+        flash_end = flasher.ZIGATE_FLASH_END
+        while cur < flash_end:
+            size = min(BLOCK_SIZE, flash_end - cur)
+            ser.write(flasher.req_flash_read(cur, size))
+            res = flasher.read_response(ser)
+            if not res or not res.ok or len(res.data) != size:
+                raise FirmwareError('Reading flash failed at 0x{:08x}'.format(cur))
+            if cur == 0:
+                # image size is in the header
+                flash_end = int.from_bytes(res.data[0x20:0x24], 'big')
+                if not 0x24 <= flash_end <= flasher.ZIGATE_FLASH_END:
+                    raise FirmwareError('Invalid image size in flash header 0x{:08x}'.format(flash_end))
+            yield res.data
+            cur += size
+            self._set_progress(min(100, 100 * cur // flash_end))
+
+    def _backup(self, ser):
+        self._set_phase(PHASE_BACKUP)
+        filename = 'zigate_backup_{:%Y%m%d%H%M%S}.bin'.format(datetime.datetime.now())
+        filename = os.path.join(self._backup_dir, filename)
+        checksum = hashlib.sha256(flasher.ZIGATE_BINARY_VERSION)
+        with open(filename, 'wb') as fp:
+            fp.write(flasher.ZIGATE_BINARY_VERSION)
+            for data in self._read_flash(ser):
+                fp.write(data)
+                checksum.update(data)
+        _LOGGER.info('ZiGate backup created %s', filename)
+        return filename, checksum.hexdigest()
+
+    def _verify(self, ser, filename, checksum):
+        # the flash is read a second time, a bad read must not be
+        # the only copy left once the flash is erased
+        self._set_phase(PHASE_VERIFY)
+        flash_checksum = hashlib.sha256(flasher.ZIGATE_BINARY_VERSION)
+        for data in self._read_flash(ser):
+            flash_checksum.update(data)
+        if flash_checksum.hexdigest() != checksum:
+            raise FirmwareError('Flash content changed between two reads')
+        file_checksum = hashlib.sha256()
+        with open(filename, 'rb') as fp:
+            for block in iter(lambda: fp.read(65536), b''):
+                file_checksum.update(block)
+        if file_checksum.hexdigest() != checksum:
+            raise FirmwareError('Backup checksum mismatch {}'.format(filename))
+        self._set_progress(100)
+
+    def _write(self, ser, filename):
+        self._set_phase(PHASE_WRITE)
+        size = os.path.getsize(filename) - 4
+        with open(filename, 'rb') as fp:
+            fp.read(4)
+            ser.write(flasher.req_flash_erase())
+            res = flasher.read_response(ser)
+            if not res or not res.ok:
+                raise FirmwareError('Erasing flash failed')
+            cur = flasher.ZIGATE_FLASH_START
+            while cur < flasher.ZIGATE_FLASH_END:
+                data = fp.read(BLOCK_SIZE)
+                if not data:
+                    break
+                ser.write(flasher.req_flash_write(cur, data))
+                res = flasher.read_response(ser)
+                if not res or not res.ok:
+                    raise FirmwareError('Writing flash failed at 0x{:08x}'.format(cur))
+                cur += len(data)
+                self._set_progress(min(100, 100 * cur // size))
+        _LOGGER.info('ZiGate flashed with %s', filename)
@@ -0,0 +1,40 @@
+"""
+ZiGate group multicast.
+
+Replace identical commands sent to every member of a zigbee group
+by a single group command.
+"""
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# commands which could be sent to a group instead of each member
+GROUP_METHODS = ('action_onoff',
+                 'action_move_level_onoff',
+                 'action_move_colour',
+                 'action_move_hue_saturation',
+                 'action_move_temperature',
+                 )
+
+# destination endpoint is ignored when using group addressing
+GROUP_ENDPOINT = 0xff
+
+
+def plan_multicast(groups, destinations):
+    '''
+    Choose groups to cover destinations, a set of (addr, endpoint)
+    groups is a dict group_addr: set of (addr, endpoint) like zigate.groups
+    a group is only used if all its members are in destinations
+    so that no other device receives the command.
+    return list of (group_addr, members) and the remaining destinations
+    '''
+    remaining = set(destinations)
+    multicast = []
+    candidates = sorted(((group, frozenset(members)) for group, members in groups.items()),
+                        key=lambda item: len(item[1]), reverse=True)
+    for group, members in candidates:
+        if len(members) < 2 or not members.issubset(remaining):
+            continue
+        multicast.append((group, members))
+        remaining -= members
+    return multicast, remaining
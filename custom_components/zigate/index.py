@@ -0,0 +1,116 @@
+"""
+ZiGate device index.
+
+Resolve the device targeted by a service call from its ieee, short
+address or the entity_id of any zigate entity without scanning the
+devices or the entities.
+"""
+import logging
+
+from homeassistant.helpers import entity_registry
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ZIGATE_INDEX = 'zigate_index'
+
+
+def get_entity_registry(hass):
+    '''
+    return the entity registry, or None if it is not loaded
+    entity_registry.async_get only exists in recent Home Assistant,
+    older ones keep the loaded registry in hass.data
+    '''
+    if hasattr(entity_registry, 'async_get'):
+        return entity_registry.async_get(hass)
+    registry = hass.data.get(entity_registry.DATA_REGISTRY)
+    if isinstance(registry, entity_registry.EntityRegistry):
+        return registry
+
+
+class ZiGateDeviceIndex(object):
+    '''
+    Index devices by ieee and addr, and entities by entity_id and unique_id,
+    an entity is indexed as (device, endpoint).
+
+    Kept up to date from the device added, removed and address changed
+    signals and from the discovery created callback.
+    Must be used from the event loop.
+    '''
+    def __init__(self):
+        self._ieees = {}
+        self._addrs = {}
+        self._entity_ids = {}
+        self._unique_ids = {}
+        self._device_entities = {}  # ieee: set of (entity_id, unique_id)
+
+    def add_device(self, device, entity_id=None):
+        '''
+        Index device, and its device entity_id if given
+        '''
+        if device.ieee:
+            self._ieees[device.ieee] = device
+        self._addrs[device.addr] = device
+        if entity_id:
+            self.add_entity(device, None, entity_id, device.ieee)
+
+    def remove_device(self, device):
+        '''
+        Remove device and its entities
+        '''
+        self._ieees.pop(device.ieee, None)
+        if self._addrs.get(device.addr) is device:
+            del self._addrs[device.addr]
+        for entity_id, unique_id in self._device_entities.pop(device.ieee, ()):
+            self._entity_ids.pop(entity_id, None)
+            self._unique_ids.pop(unique_id, None)
+
+    def address_changed(self, device, old_addr):
+        '''
+        Index device under its new address
+        '''
+        if self._addrs.get(old_addr) is device:
+            del self._addrs[old_addr]
+        self._addrs[device.addr] = device
+
+    def add_entity(self, device, endpoint, entity_id, unique_id=None):
+        '''
+        Index entity of device, endpoint is None for the device entity
+        '''
+        self._entity_ids[entity_id] = (device, endpoint)
+        if unique_id:
+            self._unique_ids[unique_id] = (device, endpoint)
+        self._device_entities.setdefault(device.ieee, set()).add((entity_id, unique_id))
+
+    def get_device(self, ieee=None, addr=None):
+        '''
+        return device from ieee or addr, or None
+        '''
+        if ieee:
+            return self._ieees.get(ieee)
+        if addr:
+            return self._addrs.get(addr)
+
+    def get_entity(self, entity_id=None, unique_id=None):
+        '''
+        return (device, endpoint) of entity, or (None, None)
+        '''
+        if entity_id in self._entity_ids:
+            return self._entity_ids[entity_id]
+        return self._unique_ids.get(unique_id, (None, None))
+
+    def resolve(self, registry, entity_id=None, ieee=None):
+        '''
+        return (device, endpoint) of entity_id, or of ieee, or (None, None)
+        endpoint is only known from a platform entity_id,
+        registry is the entity registry, to resolve renamed entity_ids, or None
+        '''
+        if entity_id:
+            device, endpoint = self.get_entity(entity_id)
+            if device is None and registry is not None:
+                entry = registry.async_get(entity_id)
+                if entry and entry.platform == DOMAIN:
+                    device, endpoint = self.get_entity(unique_id=entry.unique_id)
+            return device, endpoint
+        return self.get_device(ieee=ieee), None
@@ -8,16 +8,14 @@ import logging
 from functools import reduce
 from operator import ior
 
-from homeassistant.exceptions import PlatformNotReady
 import homeassistant.util.color as color_util
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS, ATTR_TRANSITION, ATTR_HS_COLOR,
     SUPPORT_BRIGHTNESS, SUPPORT_COLOR_TEMP,
     SUPPORT_TRANSITION, ATTR_COLOR_TEMP,
     SUPPORT_COLOR, LightEntity, ENTITY_ID_FORMAT)
-import zigate
-from . import DOMAIN as ZIGATE_DOMAIN
-from . import DATA_ZIGATE_ATTRS
+from . import DATA_ZIGATE_DISCOVERY, DATA_ZIGATE_ROUTER, DATA_ZIGATE_QUEUE
+from .metadata import ZiGateEntityMetadata
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -25,59 +23,36 @@ _LOGGER = logging.getLogger(__name__)
 SUPPORT_HUE_COLOR = 64
 
 
-def setup_platform(hass, config, add_devices, discovery_info=None):
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the ZiGate sensors."""
     if discovery_info is None:
         return
 
-    myzigate = hass.data[ZIGATE_DOMAIN]
-    LIGHT_ACTIONS = [zigate.ACTIONS_LEVEL,
-                     zigate.ACTIONS_COLOR,
-                     zigate.ACTIONS_TEMPERATURE,
-                     zigate.ACTIONS_HUE,
-                     ]
-
-    def sync_attributes():
-        devs = []
-        for device in myzigate.devices:
-            ieee = device.ieee or device.addr  # compatibility
-            actions = device.available_actions()
-            if not any(actions.values()):
-                continue
-            for endpoint, action_type in actions.items():
-                if any(i in action_type for i in LIGHT_ACTIONS):
-                    key = '{}-{}-{}'.format(ieee,
-                                            'light',
-                                            endpoint
-                                            )
-                    if key in hass.data[DATA_ZIGATE_ATTRS]:
-                        continue
-                    _LOGGER.debug(('Creating light '
-                                   'for device '
-                                   '{} {}').format(device,
-                                                   endpoint))
-                    entity = ZiGateLight(hass, device, endpoint)
-                    devs.append(entity)
-                    hass.data[DATA_ZIGATE_ATTRS][key] = entity
-
-        add_devices(devs)
-    sync_attributes()
-    zigate.dispatcher.connect(sync_attributes,
-                              zigate.ZIGATE_ATTRIBUTE_ADDED, weak=False)
-
-
-class ZiGateLight(LightEntity):
+    hass.data[DATA_ZIGATE_DISCOVERY].register_platform('light', ZiGateLight, async_add_entities)
+
+
+class ZiGateLight(ZiGateEntityMetadata, LightEntity):
     """Representation of a ZiGate light."""
 
     def __init__(self, hass, device, endpoint):
         """Initialize the light."""
-        self._device = device
+        self._init_endpoint_metadata(device, 'light', endpoint)
         self._endpoint = endpoint
         self._is_on = False
         self._brightness = 0
         a = self._device.get_attribute(endpoint, 6, 0)
         if a:
             self._is_on = a.get('value', False)
+        # color values are cached, refreshed by _handle_event
+        self._hs = [0, 0]
+        for attribute in (0x0000, 0x0001):
+            a = self._device.get_attribute(endpoint, 0x0300, attribute)
+            if a:
+                self._hs[attribute] = a.get('value', 0)
+        self._color_temp = None
+        a = self._device.get_attribute(endpoint, 0x0300, 0x0007)
+        if a:
+            self._color_temp = a.get('value')
         ieee = device.ieee or device.addr  # compatibility
         entity_id = 'zigate_{}_{}'.format(ieee,
                                           endpoint)
@@ -96,43 +71,28 @@ class ZiGateLight(LightEntity):
             elif action_type == zigate.ACTIONS_HUE:
                 supported_features.add(SUPPORT_HUE_COLOR)
         self._supported_features = reduce(ior, supported_features)
-        hass.bus.listen('zigate.attribute_updated', self._handle_event)
-
-    def _handle_event(self, call):
-        if (
-            self._device.ieee == call.data['ieee']
-            and self._endpoint == call.data['endpoint']
-        ):
-            _LOGGER.debug("Event received: %s", call.data)
-            if call.data['cluster'] == 6 and call.data['attribute'] == 0:
-                self._is_on = call.data['value']
-            if call.data['cluster'] == 8 and call.data['attribute'] in (0, 17):
-                self._brightness = int(call.data['value'] * 255 / 100)
-            if not self.hass:
-                raise PlatformNotReady
-            self.schedule_update_ha_state()
-
-    @property
-    def should_poll(self) -> bool:
-        return False
+        self._unregister = hass.data[DATA_ZIGATE_ROUTER].register(self,
+                                                                  device.ieee,
+                                                                  endpoint)
+
+    def _handle_event(self, data):
+        _LOGGER.debug("Event received: %s", data)
+        if data['cluster'] == 6 and data['attribute'] == 0:
+            self._is_on = data['value']
+        if data['cluster'] == 8 and data['attribute'] in (0, 17):
+            self._brightness = int(data['value'] * 255 / 100)
+        if data['cluster'] == 0x0300:
+            if data['attribute'] in (0x0000, 0x0001):
+                self._hs[data['attribute']] = data['value']
+            elif data['attribute'] == 0x0007:
+                self._color_temp = data['value']
+
+    async def async_will_remove_from_hass(self):
+        self._unregister()
 
     def update(self):
         self._device.refresh_device()
 
-    @property
-    def name(self) -> str:
-        """Return the name of the light if any."""
-        return '{} {}'.format(self._device,
-                              self._endpoint)
-
-    @property
-    def unique_id(self):
-        """Return unique ID for light."""
-        if self._device.ieee:
-            return '{}-{}-{}'.format(self._device.ieee,
-                                     'light',
-                                     self._endpoint)
-
     @property
     def brightness(self) -> int:
         """Return the brightness of this light between 0..255."""
@@ -141,22 +101,12 @@ class ZiGateLight(LightEntity):
     @property
     def hs_color(self) -> tuple:
         """Return the hs color value."""
-        h = 0
-        a = self._device.get_attribute(self._endpoint, 0x0300, 0x0000)
-        if a:
-            h = a.get('value', 0)
-        s = 0
-        a = self._device.get_attribute(self._endpoint, 0x0300, 0x0001)
-        if a:
-            s = a.get('value', 0)
-        return (h, s)
+        return tuple(self._hs)
 
     @property
     def color_temp(self) -> int:
         """Return the CT color temperature."""
-        a = self._device.get_attribute(self._endpoint, 0x0300, 0x0007)
-        if a:
-            return a.get('value')
+        return self._color_temp
 
     @property
     def is_on(self) -> bool:
@@ -168,10 +118,11 @@ class ZiGateLight(LightEntity):
         """Flag supported features."""
         return self._supported_features
 
-    def turn_on(self, **kwargs):
-        """Turn the switch on."""
+    async def async_turn_on(self, **kwargs):
+        """Turn the light on."""
         self._is_on = True
-        self.schedule_update_ha_state()
+        self.async_write_ha_state()
+        queue = self.hass.data[DATA_ZIGATE_QUEUE]
         transition = 1
         if ATTR_TRANSITION in kwargs:
             transition = int(kwargs[ATTR_TRANSITION])
@@ -179,59 +130,59 @@ class ZiGateLight(LightEntity):
             brightness = kwargs[ATTR_BRIGHTNESS]
             self._brightness = brightness
             brightness = round((brightness / 255) * 100) or 1
-            self.hass.data[ZIGATE_DOMAIN].action_move_level_onoff(self._device.addr,
-                                                                  self._endpoint,
-                                                                  1,
-                                                                  brightness,
-                                                                  transition
-                                                                  )
+            queue.async_send('state', 'action_move_level_onoff',
+                             self._device.addr,
+                             self._endpoint,
+                             1,
+                             brightness,
+                             transition
+                             )
         else:
-            self.hass.data[ZIGATE_DOMAIN].action_onoff(self._device.addr,
-                                                       self._endpoint,
-                                                       1)
+            queue.async_send('state', 'action_onoff',
+                             self._device.addr,
+                             self._endpoint,
+                             1)
         if ATTR_HS_COLOR in kwargs:
             h, s = kwargs[ATTR_HS_COLOR]
             if self.supported_features & SUPPORT_COLOR:
                 x, y = color_util.color_hs_to_xy(h, s)
-                self.hass.data[ZIGATE_DOMAIN].action_move_colour(self._device.addr,
-                                                                 self._endpoint,
-                                                                 x,
-                                                                 y,
-                                                                 transition)
+                queue.async_send('color', 'action_move_colour',
+                                 self._device.addr,
+                                 self._endpoint,
+                                 x,
+                                 y,
+                                 transition)
             elif self.supported_features & SUPPORT_HUE_COLOR:
-                self.hass.data[ZIGATE_DOMAIN].action_move_hue_saturation(self._device.addr,
-                                                                         self._endpoint,
-                                                                         int(h),
-                                                                         int(s),
-                                                                         transition)
+                queue.async_send('color', 'action_move_hue_saturation',
+                                 self._device.addr,
+                                 self._endpoint,
+                                 int(h),
+                                 int(s),
+                                 transition)
         elif ATTR_COLOR_TEMP in kwargs:
             temp = kwargs[ATTR_COLOR_TEMP]
-            self.hass.data[ZIGATE_DOMAIN].action_move_temperature(self._device.addr,
-                                                                  self._endpoint,
-                                                                  int(temp),
-                                                                  transition)
-
-    def turn_off(self, **kwargs):
-        """Turn the device off."""
+            queue.async_send('color', 'action_move_temperature',
+                             self._device.addr,
+                             self._endpoint,
+                             int(temp),
+                             transition)
+
+    async def async_turn_off(self, **kwargs):
+        """Turn the light off."""
         self._is_on = False
-        self.schedule_update_ha_state()
-        self.hass.data[ZIGATE_DOMAIN].action_onoff(self._device.addr,
-                                                   self._endpoint,
-                                                   0)
-
-    def toggle(self, **kwargs):
-        """Toggle the device"""
+        self.async_write_ha_state()
+        self.hass.data[DATA_ZIGATE_QUEUE].async_send('state', 'action_onoff',
+                                                     self._device.addr,
+                                                     self._endpoint,
+                                                     0)
+
+    async def async_toggle(self, **kwargs):
+        """Toggle the light"""
+        # send the resulting state rather than a toggle command
+        # so that queued commands can replace each other
         self._is_on = not self._is_on
-        self.schedule_update_ha_state()
-        self.hass.data[ZIGATE_DOMAIN].action_onoff(self._device.addr,
-                                                   self._endpoint,
-                                                   2)
-
-    @property
-    def device_state_attributes(self):
-        """Return the state attributes."""
-        return {
-            'addr': self._device.addr,
-            'ieee': self._device.ieee,
-            'endpoint': '0x{:02x}'.format(self._endpoint),
-        }
+        self.async_write_ha_state()
+        self.hass.data[DATA_ZIGATE_QUEUE].async_send('state', 'action_onoff',
+                                                     self._device.addr,
+                                                     self._endpoint,
+                                                     int(self._is_on))
@@ -0,0 +1,131 @@
+"""
+ZiGate entity metadata.
+
+Attribute based entities (sensor, binary_sensor) of the same kind share
+a single immutable AttributeKind instead of keeping their own copy of
+the attribute dict, so that large networks keep a small footprint.
+Entity identifiers and static state attributes are computed once at
+entity creation by the ZiGateEntityMetadata mixin.
+"""
+import sys
+from collections import namedtuple
+from types import MappingProxyType
+
+from .discovery import attribute_key, endpoint_key
+
+AttributeKind = namedtuple('AttributeKind', ('endpoint', 'cluster', 'attribute', 'name', 'unit', 'attributes'))
+AttributeKind.__doc__ = '''
+Immutable metadata of an attribute kind,
+attributes are the hex formatted endpoint, cluster and attribute
+'''
+
+_KINDS = {}
+_ENDPOINTS = {}
+
+
+def attribute_kind(attribute):
+    '''
+    return the shared AttributeKind of attribute
+    '''
+    key = (attribute['endpoint'], attribute['cluster'], attribute['attribute'],
+           attribute.get('name'), attribute.get('unit'))
+    kind = _KINDS.get(key)
+    if kind is None:
+        endpoint, cluster, attribute_id, name, unit = key
+        attributes = MappingProxyType({'endpoint': '0x{:02x}'.format(endpoint),
+                                       'cluster': '0x{:04x}'.format(cluster),
+                                       'attribute': '0x{:04x}'.format(attribute_id),
+                                       })
+        kind = _KINDS[key] = AttributeKind(endpoint, cluster, attribute_id,
+                                           sys.intern(name) if name else name,
+                                           unit, attributes)
+    return kind
+
+
+def endpoint_attributes(endpoint):
+    '''
+    return the shared hex formatted endpoint attributes
+    '''
+    attributes = _ENDPOINTS.get(endpoint)
+    if attributes is None:
+        attributes = _ENDPOINTS[endpoint] = MappingProxyType({'endpoint': '0x{:02x}'.format(endpoint)})
+    return attributes
+
+
+class ZiGateEntityMetadata(object):
+    '''
+    Entity metadata computed once at creation.
+
+    unique_id, name and the static state attributes never change.
+    The state attributes are cached, they are only rebuilt after
+    _invalidate(), called from _handle_event when the update router
+    delivers a value shown in the attributes, or if the device
+    address changed. Dynamic values are added by _dynamic_attributes().
+    Availability is kept in _available, cleared by the discovery
+    for restored entities until the ZiGate is up.
+    Must be listed before the Home Assistant entity class.
+    '''
+    __slots__ = ('_device', '_unique_id', '_name', '_static_attributes', '_attributes', '_available')
+
+    def _init_metadata(self, device, unique_id, name, static_attributes):
+        self._device = device
+        self._unique_id = unique_id if device.ieee else None
+        self._name = name
+        self._static_attributes = static_attributes
+        self._attributes = None
+        self._available = True
+
+    def _init_endpoint_metadata(self, device, platform, endpoint):
+        '''
+        Init metadata of an endpoint based entity (light, switch, etc)
+        '''
+        self._init_metadata(device, endpoint_key(device.ieee, platform, endpoint),
+                            '{} {}'.format(device, endpoint), endpoint_attributes(endpoint))
+
+    def _init_attribute_metadata(self, device, kind, attribute):
+        '''
+        Init metadata of an attribute based entity (sensor, binary_sensor)
+        '''
+        self._init_metadata(device, attribute_key(device.ieee, attribute),
+                            '{} {}'.format(kind.name, device), kind.attributes)
+
+    def _dynamic_attributes(self):
+        '''
+        return dynamic state attributes, or None
+        '''
+        return None
+
+    def _invalidate(self):
+        self._attributes = None
+
+    @property
+    def unique_id(self) -> str:
+        return self._unique_id
+
+    @property
+    def name(self):
+        """Return the name of the entity."""
+        return self._name
+
+    @property
+    def should_poll(self):
+        """No polling needed, updates come from the router."""
+        return False
+
+    @property
+    def available(self):
+        """Return True if entity is available."""
+        return self._available
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        attrs = self._attributes
+        if attrs is None or attrs['addr'] != self._device.addr:
+            attrs = {'addr': self._device.addr,
+                     'ieee': self._device.ieee,
+                     }
+            attrs.update(self._static_attributes)
+            attrs.update(self._dynamic_attributes() or ())
+            self._attributes = attrs
+        return attrs
@@ -0,0 +1,249 @@
+"""
+ZiGate hot path metrics.
+
+Time each stage of an attribute report, from the zigate library signal
+to the entity state write, and count the reports per device and cluster.
+The metrics are exposed by the zigate sensors, the zigate/metrics
+websocket command, the zigate.dump_metrics service and in the
+OpenMetrics text format for Prometheus.
+"""
+import datetime
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+from time import monotonic
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ZIGATE_METRICS = 'zigate_metrics'
+
+# stages of an attribute report, in the order they run
+STAGE_QUEUE = 'queue'  # library signal to the handler running on the event loop
+STAGE_HANDLER = 'handler'  # attribute_updated handler, the stages below included
+STAGE_ENTITY = 'entity'  # entity _handle_event
+STAGE_EVENT = 'event'  # zigate.attribute_updated bus event
+STAGE_STATE_WRITE = 'state_write'  # entity state write
+STAGE_TOTAL = 'total'  # library signal to the end of the handler
+STAGES = (STAGE_QUEUE, STAGE_HANDLER, STAGE_ENTITY, STAGE_EVENT, STAGE_STATE_WRITE, STAGE_TOTAL)
+
+SAMPLES = 1000  # last samples kept per stage
+PERCENTILES = (50, 95, 99)
+TOP_DEVICES = 10  # devices listed in the sensor attributes
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _family(lines, name, metric_type, description, samples):
+    '''
+    Append an OpenMetrics family to lines
+    samples is a list of (suffix, labels, value)
+    '''
+    lines.append('# TYPE {} {}'.format(name, metric_type))
+    lines.append('# HELP {} {}'.format(name, description))
+    for suffix, labels, value in samples:
+        if labels:
+            labels = '{{{}}}'.format(','.join('{}="{}"'.format(k, _escape(v)) for k, v in labels.items()))
+        lines.append('{}{}{} {}'.format(name, suffix, labels or '', value))
+
+
+class StageTimer(object):
+    '''
+    Rolling percentiles of the last SAMPLES durations of a stage.
+    '''
+    def __init__(self, samples=SAMPLES):
+        self._samples = deque(maxlen=samples)
+        self.count = 0
+        self.total = 0
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentiles(self):
+        '''
+        return dict p50, p95, p99 in ms of the last samples
+        '''
+        samples = sorted(self._samples)
+        if not samples:
+            return {'p{}'.format(p): 0 for p in PERCENTILES}
+        return {'p{}'.format(p): round(1000 * samples[min(len(samples) - 1, len(samples) * p // 100)], 3)
+                for p in PERCENTILES}
+
+    def as_dict(self):
+        data = self.percentiles()
+        data['count'] = self.count
+        return data
+
+
+class ZiGateMetrics(object):
+    '''
+    Per stage timers and report counters.
+
+    start() is called when the library signal is sent, from the
+    library thread, the other methods from the event loop.
+    The frames are counted from the library threads.
+    '''
+    def __init__(self):
+        self.stages = {stage: StageTimer() for stage in STAGES}
+        self.reports = 0
+        self.reports_by_device = Counter()
+        self.reports_by_cluster = Counter()
+        self.started = monotonic()
+        self.frames_in = 0
+        self.frames_out = 0
+        self._frames_lock = threading.Lock()
+        self._last_seen = {}  # ieee: (last_seen, timestamp)
+
+    def attach(self, myzigate):
+        '''
+        Count the frames sent by myzigate
+        '''
+        send_data = myzigate.send_data
+
+        def counted_send_data(*args, **kwargs):
+            with self._frames_lock:
+                self.frames_out += 1
+            return send_data(*args, **kwargs)
+        myzigate.send_data = counted_send_data
+
+    def packet_received(self, **kwargs):
+        '''
+        Count a received frame, ZIGATE_PACKET_RECEIVED signal handler
+        sent from the library receive thread
+        '''
+        self.frames_in += 1
+
+    @staticmethod
+    def start():
+        '''
+        return start time of a report
+        '''
+        return monotonic()
+
+    def add(self, stage, start):
+        '''
+        Record stage started at start (monotonic), return the current time
+        '''
+        now = monotonic()
+        self.stages[stage].add(now - start)
+        return now
+
+    def report(self, ieee, cluster):
+        self.reports += 1
+        self.reports_by_device[ieee] += 1
+        self.reports_by_cluster['0x{:04x}'.format(cluster)] += 1
+
+    def stats(self):
+        return {'reports': self.reports,
+                'report_rate': round(self.reports / max(1, monotonic() - self.started), 2),
+                'latency_p95_ms': self.stages[STAGE_TOTAL].percentiles()['p95'],
+                }
+
+    def diagnostics(self):
+        '''
+        return all the metrics, json serializable
+        '''
+        return {'uptime': round(monotonic() - self.started),
+                'reports': self.reports,
+                'stages': {stage: timer.as_dict() for stage, timer in self.stages.items()},
+                'reports_by_device': dict(self.reports_by_device.most_common()),
+                'reports_by_cluster': dict(self.reports_by_cluster.most_common()),
+                }
+
+    def _last_seen_timestamp(self, device):
+        '''
+        return device last_seen as timestamp, parsed only when it changes
+        '''
+        last_seen = device.info.get('last_seen')
+        cached = self._last_seen.get(device.ieee)
+        if not cached or cached[0] != last_seen:
+            try:
+                cached = (last_seen, datetime.datetime.fromisoformat(last_seen).timestamp())
+            except (TypeError, ValueError):
+                cached = (last_seen, None)
+            self._last_seen[device.ieee] = cached
+        return cached[1]
+
+    def openmetrics(self, myzigate, queue=None):
+        '''
+        return the metrics in the OpenMetrics text format
+        '''
+        connected = bool(myzigate.connection and myzigate.connection.is_connected())
+        lines = []
+        _family(lines, 'zigate_connected', 'gauge', 'ZiGate connected.', [('', None, int(connected))])
+        _family(lines, 'zigate_frames_received', 'counter', 'Frames received from the ZiGate.',
+                [('_total', None, self.frames_in)])
+        _family(lines, 'zigate_frames_sent', 'counter', 'Frames sent to the ZiGate.',
+                [('_total', None, self.frames_out)])
+        if queue:
+            stats = queue.stats()
+            _family(lines, 'zigate_command_queue_depth', 'gauge', 'Commands waiting to be sent.',
+                    [('', None, stats['queue_depth'])])
+            _family(lines, 'zigate_command_queue_in_flight', 'gauge', 'Commands being sent.',
+                    [('', None, stats['queue_in_flight'])])
+            _family(lines, 'zigate_commands_failed', 'counter', 'Commands failed.',
+                    [('_total', None, stats['commands_failed'])])
+        now = time.time()
+        lqi = []
+        last_seen = []
+        battery = []
+        for device in list(myzigate._devices.values()):
+            labels = {'ieee': device.ieee or '', 'addr': device.addr}
+            lqi.append(('', labels, device.lqi))
+            timestamp = self._last_seen_timestamp(device)
+            if timestamp is not None:
+                last_seen.append(('', labels, round(max(0, now - timestamp))))
+            if not device.receiver_on_when_idle():
+                battery.append(('', labels, int(device.battery_percent)))
+        _family(lines, 'zigate_device_lqi', 'gauge', 'Device link quality (0-255).', lqi)
+        _family(lines, 'zigate_device_last_seen_age_seconds', 'gauge', 'Seconds since the device was last seen.',
+                last_seen)
+        _family(lines, 'zigate_device_battery_percent', 'gauge', 'Battery level of battery powered devices.',
+                battery)
+        _family(lines, 'zigate_device_reports', 'counter', 'Attribute reports received per device.',
+                [('_total', {'ieee': ieee}, count) for ieee, count in self.reports_by_device.items()])
+        _family(lines, 'zigate_cluster_reports', 'counter', 'Attribute reports received per cluster.',
+                [('_total', {'cluster': cluster}, count) for cluster, count in self.reports_by_cluster.items()])
+        samples = []
+        for stage, timer in self.stages.items():
+            for p, ms in timer.percentiles().items():
+                samples.append(('', {'stage': stage, 'quantile': int(p[1:]) / 100}, round(ms / 1000, 6)))
+            samples.append(('_sum', {'stage': stage}, timer.total))
+            samples.append(('_count', {'stage': stage}, timer.count))
+        _family(lines, 'zigate_report_latency_seconds', 'summary',
+                'Attribute report handling time per stage, quantiles of the last reports.', samples)
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path):
+        '''
+        Write diagnostics to path, blocking
+        '''
+        with open(path, 'w') as fp:
+            json.dump(self.diagnostics(), fp, indent=2)
+        _LOGGER.debug('Metrics saved to %s', path)
+
+
+def async_register_websocket(hass):
+    websocket_api.async_register_command(hass, websocket_metrics)
+
+
+@websocket_api.websocket_command({
+    vol.Required('type'): 'zigate/metrics',
+})
+@websocket_api.async_response
+async def websocket_metrics(hass, connection, msg):
+    '''
+    Return the hot path metrics
+    '''
+    connection.send_result(msg['id'], hass.data[DATA_ZIGATE_METRICS].diagnostics())
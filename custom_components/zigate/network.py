@@ -0,0 +1,83 @@
+"""
+ZiGate network topology.
+
+The neighbours table and the groups are only built and sent on demand
+through the zigate/network_table websocket command, the zigate.zigate
+entity only exposes summary counters.
+"""
+import logging
+import time
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import callback
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ZIGATE_NETWORK = 'zigate_network'
+
+
+class ZiGateNetwork(object):
+    '''
+    Keep track of the neighbours table scans
+    '''
+    def __init__(self, myzigate):
+        self._zigate = myzigate
+        self.scanned = None
+
+    def scan(self, force=False):
+        '''
+        Build neighbours table, blocking
+        '''
+        table = self._zigate.build_neighbours_table(force)
+        self.scanned = time.time()
+        _LOGGER.debug('Neighbours table %s', table)
+        return table
+
+    def summary(self):
+        '''
+        return network counters
+        '''
+        routers = 0
+        devices = list(self._zigate.devices)
+        for device in devices:
+            if device.info.get('bit_field', '')[-2:] == '01':
+                routers += 1
+        scan_age = None
+        if self.scanned:
+            scan_age = int(time.time() - self.scanned)
+        return {'node_count': len(devices),
+                'router_count': routers,
+                'network_scan_age': scan_age,
+                }
+
+    def table(self):
+        '''
+        return neighbours table and groups
+        '''
+        return {'neighbours': [list(n) for n in self._zigate._neighbours_table_cache],
+                'groups': {group: sorted(list(member) for member in members)
+                           for group, members in dict(self._zigate.groups).items()},
+                'scanned': self.scanned,
+                }
+
+
+@callback
+def async_register_websocket(hass):
+    websocket_api.async_register_command(hass, websocket_network_table)
+
+
+@websocket_api.websocket_command({
+    vol.Required('type'): 'zigate/network_table',
+    vol.Optional('scan', default=False): bool,
+    vol.Optional('force', default=False): bool,
+})
+@websocket_api.async_response
+async def websocket_network_table(hass, connection, msg):
+    '''
+    Return neighbours table and groups, scan the network first if asked
+    '''
+    network = hass.data[DATA_ZIGATE_NETWORK]
+    if msg['scan']:
+        await hass.async_add_executor_job(network.scan, msg['force'])
+    connection.send_result(msg['id'], network.table())
@@ -0,0 +1,242 @@
+"""
+ZiGate device refresh scheduling.
+
+Refresh the whole network a few devices at a time, sleepy end devices
+are refreshed when they next check in.
+Poll the mains powered devices which have stopped reporting.
+"""
+import asyncio
+import heapq
+import logging
+import zlib
+from time import monotonic
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_REFRESH_PROGRESS = 'zigate.refresh_progress'
+EVENT_REFRESH_COMPLETED = 'zigate.refresh_completed'
+
+REFRESH_CONCURRENCY = 2
+REFRESH_DELAY = 0.2  # seconds between two device refresh starts
+
+POLL_INTERVAL = 3600  # poll devices quiet for an hour
+POLL_MIN_GAP = 0.5  # seconds between two polls
+POLL_MAX_GAP = 30
+POLL_LATENCY_FACTOR = 4  # gap between polls relative to the poll latency
+
+
+class ZiGateRefresher(object):
+    '''
+    Refresh devices concurrently, at most concurrency at the same time
+    and starting at most one refresh every delay seconds.
+    Devices not receiving when idle are deferred until they send something.
+    Must be used from the event loop.
+    '''
+    def __init__(self, hass, concurrency=REFRESH_CONCURRENCY, delay=REFRESH_DELAY):
+        self._hass = hass
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._delay = delay
+        self._deferred = {}
+        self.running = False
+
+    @property
+    def deferred(self):
+        '''
+        number of sleepy devices waiting for their next check in
+        '''
+        return len(self._deferred)
+
+    async def async_refresh_all(self, devices, full=False):
+        '''
+        Refresh devices, fire progress events and a completion event
+        '''
+        if self.running:
+            _LOGGER.warning('Devices refresh already running')
+            return
+        self.running = True
+        start = monotonic()
+        try:
+            awake = []
+            for device in devices:
+                if device.receiver_on_when_idle():
+                    awake.append(device)
+                else:
+                    self._deferred[device.ieee] = full
+            total = len(awake)
+            progress = {'done': 0, 'failed': 0}
+
+            async def refresh(device):
+                if not await self._async_refresh(device, full):
+                    progress['failed'] += 1
+                progress['done'] += 1
+                self._hass.bus.async_fire(EVENT_REFRESH_PROGRESS,
+                                          {'ieee': device.ieee,
+                                           'done': progress['done'],
+                                           'total': total})
+            tasks = []
+            for device in awake:
+                tasks.append(self._hass.async_create_task(refresh(device)))
+                if self._delay:
+                    await asyncio.sleep(self._delay)
+            if tasks:
+                await asyncio.wait(tasks)
+            self._hass.bus.async_fire(EVENT_REFRESH_COMPLETED,
+                                      {'total': total,
+                                       'failed': progress['failed'],
+                                       'deferred': len(self._deferred),
+                                       'duration': round(monotonic() - start, 1)})
+        finally:
+            self.running = False
+
+    def device_seen(self, device):
+        '''
+        Refresh deferred device, it has just checked in
+        '''
+        if not self._deferred or device.ieee not in self._deferred:
+            return
+        full = self._deferred.pop(device.ieee)
+        _LOGGER.debug('Refresh deferred device %s', device)
+        # force it, the device has just been seen
+        self._hass.async_create_task(self._async_refresh(device, full, True))
+
+    async def _async_refresh(self, device, full, force=False):
+        async with self._semaphore:
+            try:
+                await self._hass.async_add_executor_job(device.refresh_device, full, force)
+            except Exception:
+                _LOGGER.exception('Failed to refresh device %s', device)
+                return False
+        return True
+
+
+class ZiGatePoller(object):
+    '''
+    Poll devices which didn't report for interval seconds.
+
+    Devices are polled one at a time, first polls are spread over the
+    interval according to the device ieee. The gap between two polls
+    follows the observed poll latency, so a busy coordinator is polled
+    less often.
+    Must be used from the event loop.
+    '''
+    def __init__(self, hass, interval):
+        self._hass = hass
+        self._interval = interval
+        self._devices = {}
+        self._last_seen = {}
+        self._due = {}
+        self._schedule = []
+        self._timer = None
+        self._polling = False
+        self._running = False
+        self.latency = None
+        self.polls = 0
+        self.polls_skipped = 0
+        self.polls_failed = 0
+
+    @property
+    def gap(self):
+        '''
+        current delay between two polls
+        '''
+        if self.latency is None:
+            return POLL_MIN_GAP
+        return min(POLL_MAX_GAP, max(POLL_MIN_GAP, self.latency * POLL_LATENCY_FACTOR))
+
+    def add(self, device):
+        '''
+        Start polling device
+        '''
+        ieee = device.ieee
+        if ieee in self._devices:
+            return
+        self._devices[ieee] = device
+        # stagger first polls over the interval
+        now = monotonic()
+        offset = zlib.crc32(ieee.encode()) % max(1, int(self._interval))
+        self._last_seen[ieee] = now + offset - self._interval
+        self._plan(ieee, now + offset)
+        self._wakeup()
+
+    def remove(self, ieee):
+        '''
+        Stop polling device
+        '''
+        self._devices.pop(ieee, None)
+        self._last_seen.pop(ieee, None)
+        self._due.pop(ieee, None)
+
+    def reported(self, device):
+        '''
+        Device sent something, postpone its next poll
+        '''
+        if device.ieee in self._last_seen:
+            self._last_seen[device.ieee] = monotonic()
+
+    def start(self):
+        self._running = True
+        self._wakeup()
+
+    def stop(self):
+        self._running = False
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self):
+        return {'polls': self.polls,
+                'polls_skipped': self.polls_skipped,
+                'polls_failed': self.polls_failed,
+                'poll_latency_ms': round(1000 * self.latency) if self.latency is not None else 0,
+                }
+
+    def _plan(self, ieee, due):
+        self._due[ieee] = due
+        heapq.heappush(self._schedule, (due, ieee))
+
+    def _wakeup(self, min_delay=0):
+        if not self._running or self._polling or not self._schedule:
+            return
+        delay = max(min_delay, self._schedule[0][0] - monotonic())
+        if self._timer:
+            self._timer.cancel()
+        self._timer = self._hass.loop.call_later(delay, self._run)
+
+    def _run(self):
+        self._timer = None
+        now = monotonic()
+        while self._schedule and self._schedule[0][0] <= now:
+            due, ieee = heapq.heappop(self._schedule)
+            if self._due.get(ieee) != due:
+                continue  # removed or rescheduled
+            next_poll = self._last_seen[ieee] + self._interval
+            if next_poll > now:
+                # reported since scheduled
+                self.polls_skipped += 1
+                self._plan(ieee, next_poll)
+                continue
+            self._plan(ieee, now + self._interval)
+            device = self._devices[ieee]
+            if not device.receiver_on_when_idle():
+                continue
+            self._polling = True
+            self._hass.async_create_task(self._async_poll(device))
+            return
+        self._wakeup()
+
+    async def _async_poll(self, device):
+        start = monotonic()
+        try:
+            await self._hass.async_add_executor_job(device.refresh_device, False, True)
+            self.polls += 1
+        except Exception:
+            _LOGGER.exception('Failed to poll device %s', device)
+            self.polls_failed += 1
+        latency = monotonic() - start
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = 0.8 * self.latency + 0.2 * latency
+        self.reported(device)
+        self._polling = False
+        self._wakeup(self.gap)
@@ -0,0 +1,36 @@
+"""
+ZiGate startup profile.
+
+Record how long each startup phase takes.
+"""
+import contextlib
+import logging
+from time import monotonic
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StartupProfile(object):
+    '''
+    Duration of the startup phases in ms, in the order they ran.
+    '''
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def record(self, name, start):
+        '''
+        Record phase name started at start (monotonic)
+        '''
+        self.phases[name] = round(1000 * (monotonic() - start))
+        _LOGGER.debug('Startup phase %s : %sms', name, self.phases[name])
+
+    def stats(self):
+        return {'startup_profile_ms': dict(self.phases)}
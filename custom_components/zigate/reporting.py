@@ -0,0 +1,91 @@
+"""
+ZiGate attribute reporting configuration.
+
+Configure devices to push their state changes instead of being polled.
+"""
+import logging
+import struct
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_ATTRIBUTES = 10  # attributes per configure reporting request
+
+# default reporting per platform
+# (cluster, attribute_id, attribute_type, min_interval, max_interval, change)
+# max_interval is below the default poll_interval so reporting devices are never polled
+REPORTING_PROFILES = {
+    'light': ((0x0006, 0x0000, 0x10, 0, 900, 0),
+              (0x0008, 0x0000, 0x20, 1, 900, 1),
+              (0x0300, 0x0007, 0x21, 1, 900, 1),
+              ),
+    'switch': ((0x0006, 0x0000, 0x10, 0, 900, 0),
+               ),
+    'cover': ((0x0102, 0x0008, 0x20, 1, 900, 1),
+              ),
+}
+
+
+def configure_reporting(myzigate, addr, endpoint, cluster, attributes, manufacturer_code=0):
+    '''
+    Send configure reporting requests, blocking
+    attributes is a list of (attribute_id, attribute_type, min_interval, max_interval, change)
+    change is the reportable change (0 to 255)
+    return list of responses
+    '''
+    addr = myzigate._translate_addr(addr)
+    addr_mode, addr_fmt = myzigate._choose_addr_mode(addr)
+    manufacturer_specific = manufacturer_code != 0
+    responses = []
+    for i in range(0, len(attributes), MAX_ATTRIBUTES):
+        chunk = attributes[i:i + MAX_ATTRIBUTES]
+        attributes_data = []
+        for attribute_id, attribute_type, min_interval, max_interval, change in chunk:
+            # direction, type, id, min, max, timeout, change
+            attributes_data += [0, attribute_type, attribute_id, min_interval, max_interval, 0, change]
+        data = struct.pack('!B' + addr_fmt + 'BBHBBHB' + 'BBHHHHB' * len(chunk),
+                           addr_mode, int(addr, 16), 1, endpoint, cluster,
+                           0, manufacturer_specific, manufacturer_code, len(chunk),
+                           *attributes_data)
+        r = myzigate.send_data(0x0120, data, 0x8120)
+        # reporting not supported on cluster 6, like zigate.reporting_request
+        if r and r.status == 0x8c and r.cluster == 6:
+            device = myzigate.get_device_from_addr(addr)
+            if device:
+                device.set_assumed_state()
+        responses.append(r)
+    return responses
+
+
+def apply_profile(myzigate, device, platform, endpoint):
+    '''
+    Bind and configure default reporting of platform on device endpoint, blocking
+    '''
+    in_clusters = device.endpoints.get(endpoint, {}).get('in_clusters', [])
+    clusters = {}
+    for cluster, attribute_id, attribute_type, min_interval, max_interval, change in REPORTING_PROFILES[platform]:
+        if cluster in in_clusters:
+            clusters.setdefault(cluster, []).append((attribute_id, attribute_type,
+                                                     min_interval, max_interval, change))
+    for cluster, attributes in clusters.items():
+        _LOGGER.debug('Configure reporting of cluster 0x%04x for %s endpoint %s', cluster, device, endpoint)
+        myzigate.bind_addr(device.addr, endpoint, cluster)
+        configure_reporting(myzigate, device.addr, endpoint, cluster, attributes)
+
+
+class ZiGateReporting(object):
+    '''
+    Apply default reporting profiles to devices joining the network
+    once their light, switch or cover entities are discovered.
+    Must be used from the event loop.
+    '''
+    def __init__(self, hass, myzigate):
+        self._hass = hass
+        self._zigate = myzigate
+        self._joined = set()
+
+    def device_joined(self, device):
+        self._joined.add(device.ieee)
+
+    def entity_created(self, platform, device, arg):
+        if platform in REPORTING_PROFILES and device.ieee in self._joined:
+            self._hass.async_add_executor_job(apply_profile, self._zigate, device, platform, arg)
@@ -6,7 +6,6 @@ https://home-assistant.io/components/sensor.zigate/
 """
 import logging
 
-from homeassistant.exceptions import PlatformNotReady
 from homeassistant.components.sensor import ENTITY_ID_FORMAT
 from homeassistant.const import (DEVICE_CLASS_HUMIDITY,
                                  DEVICE_CLASS_TEMPERATURE,
@@ -14,67 +13,38 @@ from homeassistant.const import (DEVICE_CLASS_HUMIDITY,
                                  DEVICE_CLASS_PRESSURE,
                                  STATE_UNAVAILABLE)
 from homeassistant.helpers.entity import Entity
-import zigate
-from . import DOMAIN as ZIGATE_DOMAIN
-from . import DATA_ZIGATE_ATTRS
+from . import DATA_ZIGATE_DISCOVERY, DATA_ZIGATE_ROUTER
+from .metadata import ZiGateEntityMetadata, attribute_kind
+from .metrics import DATA_ZIGATE_METRICS, STAGES, TOP_DEVICES
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def setup_platform(hass, config, add_devices, discovery_info=None):
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the ZiGate sensors."""
     if discovery_info is None:
         return
 
-    myzigate = hass.data[ZIGATE_DOMAIN]
-
-    def sync_attributes(**kwargs):
-        devs = []
-        for device in myzigate.devices:
-            ieee = device.ieee or device.addr  # compatibility
-            actions = device.available_actions()
-            if any(actions.values()):
-                continue
-            for attribute in device.attributes:
-                if attribute['cluster'] < 5:
-                    continue
-                if 'name' in attribute:
-                    key = '{}-{}-{}-{}'.format(ieee,
-                                               attribute['endpoint'],
-                                               attribute['cluster'],
-                                               attribute['attribute'],
-                                               )
-                    value = attribute.get('value')
-                    if value is None:
-                        continue
-                    if key in hass.data[DATA_ZIGATE_ATTRS]:
-                        continue
-                    if type(value) not in (bool, dict):
-                        _LOGGER.debug(('Creating sensor '
-                                       'for device '
-                                       '{} {}').format(device,
-                                                       attribute))
-                        entity = ZiGateSensor(hass, device, attribute)
-                        devs.append(entity)
-                        hass.data[DATA_ZIGATE_ATTRS][key] = entity
-
-        add_devices(devs)
-
-    sync_attributes()
-    zigate.dispatcher.connect(sync_attributes,
-                              zigate.ZIGATE_ATTRIBUTE_ADDED, weak=False)
-
-
-class ZiGateSensor(Entity):
+    hass.data[DATA_ZIGATE_DISCOVERY].register_platform('sensor', ZiGateSensor, async_add_entities)
+    metrics = hass.data.get(DATA_ZIGATE_METRICS)
+    if metrics:
+        entities = [ZiGateLatencySensor(metrics, stage) for stage in STAGES]
+        entities.append(ZiGateReportsSensor(metrics))
+        async_add_entities(entities)
+
+
+class ZiGateSensor(ZiGateEntityMetadata, Entity):
     """Representation of a ZiGate sensor."""
 
+    __slots__ = ('entity_id', '_kind', '_state', '_device_class', '_unregister')
+
     def __init__(self, hass, device, attribute):
         """Initialize the sensor."""
-        self._device = device
-        self._attribute = attribute
+        self._kind = kind = attribute_kind(attribute)
+        self._init_attribute_metadata(device, kind, attribute)
         self._device_class = None
         self._state = attribute.get('value', STATE_UNAVAILABLE)
-        name = attribute.get('name')
+        name = kind.name
         ieee = device.ieee or device.addr  # compatibility
         entity_id = 'zigate_{}_{}'.format(ieee,
                                           name)
@@ -88,67 +58,106 @@ class ZiGateSensor(Entity):
             self._device_class = DEVICE_CLASS_ILLUMINANCE
         elif 'pressure' in name:
             self._device_class = DEVICE_CLASS_PRESSURE
-        hass.bus.listen('zigate.attribute_updated', self._handle_event)
-
-    def _handle_event(self, call):
-        if (
-            self._device.ieee == call.data['ieee']
-            and self._attribute['endpoint'] == call.data['endpoint']
-            and self._attribute['cluster'] == call.data['cluster']
-            and self._attribute['attribute'] == call.data['attribute']
-        ):
-            _LOGGER.debug("Event received: %s", call.data)
-            self._state = call.data['value']
-            if not self.hass:
-                raise PlatformNotReady
-            self.schedule_update_ha_state()
+        self._unregister = hass.data[DATA_ZIGATE_ROUTER].register(self,
+                                                                  device.ieee,
+                                                                  kind.endpoint,
+                                                                  kind.cluster,
+                                                                  kind.attribute)
 
-    @property
-    def unique_id(self) -> str:
-        if self._device.ieee:
-            return '{}-{}-{}-{}'.format(self._device.ieee,
-                                        self._attribute['endpoint'],
-                                        self._attribute['cluster'],
-                                        self._attribute['attribute'],
-                                        )
+    def _handle_event(self, data):
+        _LOGGER.debug("Event received: %s", data)
+        self._state = data['value']
+        if isinstance(self._state, dict):
+            self._invalidate()
 
-    @property
-    def should_poll(self):
-        """No polling needed for a ZiGate sensor."""
-        return False
+    async def async_will_remove_from_hass(self):
+        self._unregister()
+
+    def _dynamic_attributes(self):
+        if isinstance(self._state, dict):
+            return self._state
 
     @property
     def device_class(self):
         """Return the device class of the sensor."""
         return self._device_class
 
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return self._state
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit this state is expressed in."""
+        return self._kind.unit
+
+
+class ZiGateLatencySensor(Entity):
+    """Latency of an attribute report stage, p95 of the last reports."""
+
+    def __init__(self, metrics, stage):
+        self._metrics = metrics
+        self._stage = stage
+        self.entity_id = ENTITY_ID_FORMAT.format('zigate_latency_{}'.format(stage))
+
+    @property
+    def unique_id(self) -> str:
+        return 'zigate-latency-{}'.format(self._stage)
+
     @property
     def name(self):
         """Return the name of the sensor."""
-        return '{} {}'.format(self._attribute.get('name'),
-                              self._device)
+        return 'ZiGate latency {}'.format(self._stage)
 
     @property
     def state(self):
         """Return the state of the sensor."""
-        return self._state
+        return self._metrics.stages[self._stage].percentiles()['p95']
 
     @property
     def unit_of_measurement(self):
-        """Return the unit this state is expressed in."""
-        return self._attribute.get('unit')
+        return 'ms'
+
+    @property
+    def icon(self):
+        return 'mdi:timer-outline'
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes."""
+        return self._metrics.stages[self._stage].as_dict()
+
+
+class ZiGateReportsSensor(Entity):
+    """Number of attribute reports received."""
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+        self.entity_id = ENTITY_ID_FORMAT.format('zigate_reports')
+
+    @property
+    def unique_id(self) -> str:
+        return 'zigate-reports'
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return 'ZiGate reports'
+
+    @property
+    def state(self):
+        """Return the state of the sensor."""
+        return self._metrics.reports
+
+    @property
+    def icon(self):
+        return 'mdi:counter'
 
     @property
     def device_state_attributes(self):
         """Return the state attributes."""
-        attrs = {
-            'addr': self._device.addr,
-            'ieee': self._device.ieee,
-            'endpoint': '0x{:02x}'.format(self._attribute['endpoint']),
-            'cluster': '0x{:04x}'.format(self._attribute['cluster']),
-            'attribute': '0x{:04x}'.format(self._attribute['attribute'])
-        }
-        state = self.state
-        if isinstance(self.state, dict):
-            attrs.update(state)
-        return attrs
+        return {'report_rate': self._metrics.stats()['report_rate'],
+                'top_devices': dict(self._metrics.reports_by_device.most_common(TOP_DEVICES)),
+                'clusters': dict(self._metrics.reports_by_cluster.most_common()),
+                }
@@ -0,0 +1,46 @@
+"""
+ZiGate entities snapshot.
+
+Save the discovered entities at shutdown so that they could be created
+on next start before the ZiGate is up.
+"""
+import json
+import logging
+import os
+
+_LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(path, entities):
+    '''
+    Write entities snapshot, blocking
+    entities is a list of (platform, key, ieee, arg)
+    '''
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as fp:
+            json.dump({'version': SNAPSHOT_VERSION, 'entities': entities}, fp)
+        # atomic, a crash keeps the previous snapshot
+        os.replace(tmp_path, path)
+    except OSError:
+        _LOGGER.exception('Failed to save entities snapshot %s', path)
+
+
+def load_snapshot(path):
+    '''
+    Read entities snapshot, blocking
+    return list of (platform, key, ieee, arg), empty if missing or outdated
+    '''
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path) as fp:
+            data = json.load(fp)
+    except (OSError, ValueError):
+        _LOGGER.exception('Failed to load entities snapshot %s', path)
+        return []
+    if data.get('version') != SNAPSHOT_VERSION:
+        return []
+    return data.get('entities', [])
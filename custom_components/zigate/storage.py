@@ -0,0 +1,197 @@
+"""
+ZiGate persistent storage.
+
+Store the ZiGate state (devices, groups, scenes, etc) in a SQLite file,
+one row per device, so that only the changed devices are written
+instead of rewriting the whole zigate.json.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from zigate.core import Device, DeviceEncoder
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_SQLITE = 'sqlite'
+STORAGE_JSON = 'json'
+STORAGE_MODES = (STORAGE_SQLITE, STORAGE_JSON)
+
+COMPACT_WRITES = 5000  # vacuum the file after this number of row writes
+
+
+def _dumps(obj):
+    return json.dumps(obj, cls=DeviceEncoder, sort_keys=True, separators=(',', ':'))
+
+
+class ZiGateStore(object):
+    '''
+    SQLite storage of the ZiGate state.
+
+    save(myzigate) writes the devices marked as changed (all of them
+    if full is set) and the other state if it changed, in a single
+    transaction. A device row is only written if its content changed.
+    load(myzigate) loads the state, migrating zigate.json on first run.
+    Could be used from any thread, mark() never waits for a save.
+    '''
+    def __init__(self, path, json_path=None):
+        self._path = path
+        self._json_path = json_path
+        self._lock = threading.Lock()
+        self._db = None
+        self._rows = {}  # key: data written
+        self._meta = {}
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()  # only guards _dirty, held briefly
+        self._full = True
+        self.writes = 0
+        self.rows_written = 0
+        self._since_compact = 0
+
+    def attach(self, myzigate):
+        '''
+        Use the store for myzigate load_state and save_state
+        (called on startup, by the auto save timer and on stop)
+        '''
+        myzigate.load_state = lambda path=None: self.load(myzigate)
+        myzigate.save_state = lambda path=None: self.save(myzigate)
+
+    def mark(self, key):
+        '''
+        Mark device as changed, key is the device ieee or addr
+        '''
+        with self._dirty_lock:
+            self._dirty.add(key)
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self._path, check_same_thread=False)
+            # write ahead log, a crash never leaves a half written file
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS devices (key TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    @staticmethod
+    def _key(device):
+        return device.ieee or device.addr
+
+    def load(self, myzigate):
+        '''
+        Load state into myzigate, migrate zigate.json if the store is empty
+        return True if loaded
+        '''
+        with self._lock:
+            db = self._connect()
+            rows = db.execute('SELECT key, data FROM devices').fetchall()
+            meta = dict(db.execute('SELECT key, data FROM meta').fetchall())
+        if not rows and not meta:
+            return self._migrate(myzigate)
+        self._rows = dict(rows)
+        self._meta = meta
+        groups = json.loads(meta.get('groups', '{}'))
+        myzigate._groups = {k: set(tuple(r) for r in v) for k, v in groups.items()}
+        myzigate._scenes = json.loads(meta.get('scenes', '{}'))
+        myzigate._neighbours_table_cache = json.loads(meta.get('neighbours_table', '[]'))
+        myzigate._led = json.loads(meta.get('led', 'true'))
+        for key, data in rows:
+            try:
+                device = Device.from_json(json.loads(data), myzigate)
+                myzigate._devices[device.addr] = device
+                device._create_actions()
+            except Exception:
+                _LOGGER.exception('Error loading device %s', key)
+        self._full = False
+        _LOGGER.debug('Loaded %s devices from %s', len(rows), self._path)
+        return True
+
+    def _migrate(self, myzigate):
+        if not self._json_path or not os.path.exists(self._json_path):
+            return False
+        _LOGGER.info('Migrate %s to %s', self._json_path, self._path)
+        # load with the library json loader
+        if not type(myzigate).load_state(myzigate, self._json_path):
+            return False
+        self.save(myzigate, True)
+        # only renamed once saved, an interrupted migration restarts
+        os.replace(self._json_path, self._json_path + '.migrated')
+        return True
+
+    def save(self, myzigate, full=False):
+        '''
+        Write changed devices and state, blocking
+        if full is set, all devices are checked for changes
+        '''
+        with self._lock:
+            with self._dirty_lock:
+                dirty, self._dirty = self._dirty, set()
+            full = full or self._full
+            self._full = False
+            devices = {self._key(device): device for device in list(myzigate._devices.values())}
+            updates = []
+            for key, device in devices.items():
+                if not full and key not in dirty:
+                    continue
+                try:
+                    data = _dumps(device)
+                except Exception:
+                    _LOGGER.exception('Failed to serialize device %s', key)
+                    self.mark(key)  # retry next time
+                    continue
+                if self._rows.get(key) != data:
+                    updates.append((key, data))
+            removed = [key for key in self._rows if key not in devices]
+            meta = {'groups': _dumps(myzigate._groups),
+                    'scenes': _dumps(myzigate._scenes),
+                    'neighbours_table': _dumps(myzigate._neighbours_table_cache),
+                    'led': _dumps(myzigate._led),
+                    }
+            meta_updates = [(k, v) for k, v in meta.items() if self._meta.get(k) != v]
+            if not updates and not removed and not meta_updates:
+                return
+            db = self._connect()
+            try:
+                with db:  # single transaction
+                    db.executemany('INSERT OR REPLACE INTO devices (key, data) VALUES (?, ?)', updates)
+                    db.executemany('DELETE FROM devices WHERE key = ?', [(key,) for key in removed])
+                    db.executemany('INSERT OR REPLACE INTO meta (key, data) VALUES (?, ?)', meta_updates)
+            except sqlite3.Error:
+                _LOGGER.exception('Failed to save %s', self._path)
+                # retry them next time
+                with self._dirty_lock:
+                    self._dirty.update(dirty)
+                self._full = full
+                return
+            self._rows.update(updates)
+            for key in removed:
+                del self._rows[key]
+            self._meta.update(meta_updates)
+            self.writes += 1
+            self.rows_written += len(updates) + len(removed) + len(meta_updates)
+            self._since_compact += len(updates) + len(removed)
+            if self._since_compact >= COMPACT_WRITES:
+                self._compact(db)
+        _LOGGER.debug('Saved %s devices, removed %s', len(updates), len(removed))
+
+    def _compact(self, db):
+        _LOGGER.debug('Compact %s', self._path)
+        try:
+            db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            db.execute('VACUUM')
+        except sqlite3.Error:
+            _LOGGER.exception('Failed to compact %s', self._path)
+        self._since_compact = 0
+
+    def stats(self):
+        return {'storage_writes': self.writes,
+                'storage_rows_written': self.rows_written,
+                }
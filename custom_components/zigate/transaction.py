@@ -0,0 +1,188 @@
+"""
+ZiGate request/response correlation.
+
+Send ZCL requests and wait for their responses, matched on the ZCL
+sequence number returned in the ZiGate status and the device address.
+"""
+import asyncio
+import logging
+import struct
+from collections import OrderedDict
+from time import monotonic
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_READ_ATTRIBUTE_RESPONSE = 'zigate.read_attribute_response'
+
+REQUEST_TIMEOUT = 5
+LATENCY_BUCKETS = (25, 50, 100, 250, 500, 1000, 2500, 5000)  # ms
+MAX_EARLY_RESPONSES = 32  # responses received before their request status
+
+RESPONSE_TYPES = (0x8100, 0x8110)  # read and write attribute responses
+
+
+class ZiGateRequestError(Exception):
+    pass
+
+
+class LatencyHistogram(object):
+    '''
+    Response time histogram, counts per LATENCY_BUCKETS upper bound
+    plus an overflow bucket.
+    '''
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ms):
+        i = 0
+        while i < len(LATENCY_BUCKETS) and ms > LATENCY_BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        '''
+        return upper bound of the bucket holding the p percentile
+        '''
+        if not self.count:
+            return 0
+        rank = p * self.count / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        if i < len(LATENCY_BUCKETS):
+            return LATENCY_BUCKETS[i]
+        return round(self.max)
+
+    def as_dict(self):
+        buckets = ['<={}'.format(b) for b in LATENCY_BUCKETS] + ['>{}'.format(LATENCY_BUCKETS[-1])]
+        return dict(zip(buckets, self.counts))
+
+
+class _Transaction(object):
+    def __init__(self, cluster, attributes, future):
+        self.cluster = cluster
+        self.attributes = set(attributes)
+        self.future = future
+        self.results = {}
+
+    def add(self, response):
+        attribute = response['attribute']
+        if response['cluster'] != self.cluster or attribute not in self.attributes:
+            return
+        self.results[attribute] = response
+        if len(self.results) == len(self.attributes) and not self.future.done():
+            self.future.set_result(self.results)
+
+
+class ZiGateTransactions(object):
+    '''
+    Correlate read and write attribute requests with their responses.
+
+    The ZiGate status of a request holds the ZCL sequence number,
+    responses carrying the same sequence from the requested device
+    and cluster complete the request, the 8 bits sequence alone is
+    shared by all the devices.
+    A response could be received before the status, so the last
+    unmatched responses are kept for a while.
+    Must be used from the event loop.
+    '''
+    def __init__(self, hass, myzigate):
+        self._hass = hass
+        self._zigate = myzigate
+        self._pending = {}
+        self._early = OrderedDict()
+        self.histograms = {}
+        self.requests = 0
+        self.requests_failed = 0
+        self.requests_timeout = 0
+
+    def response_received(self, response):
+        '''
+        Handle a ZiGate response, call it for every response received
+        '''
+        if response.msg not in RESPONSE_TYPES:
+            return
+        key = (response['sequence'], response['addr'])
+        transaction = self._pending.get(key)
+        if transaction:
+            transaction.add(response)
+            return
+        self._early.setdefault(key, []).append(response)
+        while len(self._early) > MAX_EARLY_RESPONSES:
+            self._early.popitem(last=False)
+
+    def stats(self):
+        histogram = LatencyHistogram()
+        for device_histogram in self.histograms.values():
+            histogram.merge(device_histogram)
+        return {'requests': self.requests,
+                'requests_failed': self.requests_failed,
+                'requests_timeout': self.requests_timeout,
+                'response_time_p50_ms': histogram.percentile(50),
+                'response_time_p95_ms': histogram.percentile(95),
+                }
+
+    def device_stats(self, ieee):
+        histogram = self.histograms.get(ieee)
+        if not histogram:
+            return {}
+        return {'response_time_p50_ms': histogram.percentile(50),
+                'response_time_p95_ms': histogram.percentile(95),
+                'response_time_avg_ms': round(histogram.total / histogram.count),
+                }
+
+    async def async_read_attributes(self, addr, endpoint, cluster, attributes,
+                                    manufacturer_code=0, timeout=REQUEST_TIMEOUT):
+        '''
+        Read attributes (at most 10) and wait for the responses
+        return dict attribute_id: response
+        raise ZiGateRequestError on failure and asyncio.TimeoutError
+        '''
+        addr = self._zigate._translate_addr(addr)
+        addr_mode, addr_fmt = self._zigate._choose_addr_mode(addr)
+        data = struct.pack('!B' + addr_fmt + 'BBHBBHB{}H'.format(len(attributes)),
+                           addr_mode, int(addr, 16), 1, endpoint, cluster,
+                           0, manufacturer_code != 0, manufacturer_code,
+                           len(attributes), *attributes)
+        return await self._async_request(addr, 0x0100, data, cluster, attributes, timeout)
+
+    async def _async_request(self, addr, cmd, data, cluster, attributes, timeout):
+        device = self._zigate.get_device_from_addr(addr)
+        ieee = device.ieee if device else addr
+        self.requests += 1
+        start = monotonic()
+        status = await self._hass.async_add_executor_job(self._zigate.send_data, cmd, data)
+        if not status or status['status'] != 0:
+            self.requests_failed += 1
+            raise ZiGateRequestError('Request 0x{:04x} to {} failed'.format(cmd, addr))
+        # responses addr is formatted lower case
+        key = (status['sequence'], addr.lower())
+        transaction = _Transaction(cluster, attributes, self._hass.loop.create_future())
+        self._pending[key] = transaction
+        for response in self._early.pop(key, ()):
+            transaction.add(response)
+        try:
+            results = await asyncio.wait_for(transaction.future, timeout)
+        except asyncio.TimeoutError:
+            self.requests_timeout += 1
+            raise
+        finally:
+            if self._pending.get(key) is transaction:
+                del self._pending[key]
+        latency = 1000 * (monotonic() - start)
+        self.histograms.setdefault(ieee, LatencyHistogram()).add(latency)
+        return results
@@ -0,0 +1,135 @@
+"""Test zigate admin panel proxy."""
+import asyncio
+import unittest
+from unittest import mock
+
+
+def _upstream_app(closed):
+    from aiohttp import web
+
+    async def stream(request):
+        response = web.StreamResponse()
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for i in range(3):
+            await response.write('chunk{}\n'.format(i).encode())
+        await response.write_eof()
+        return response
+
+    async def echo(request):
+        body = await request.read()
+        return web.Response(body=request.query.get('prefix', '').encode() + body)
+
+    async def websocket(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.data == 'bye':
+                await ws.close(code=4000)
+            elif msg.type == web.WSMsgType.BINARY:
+                await ws.send_bytes(msg.data)
+            else:
+                await ws.send_str(msg.data)
+        closed.set()
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/zigate/stream', stream)
+    app.router.add_post('/zigate/echo', echo)
+    app.router.add_get('/zigate/ws', websocket)
+    return app
+
+
+def _proxy_app(proxy):
+    from aiohttp import web
+
+    async def handler(request):
+        requested_url = request.match_info['requested_url']
+        if request.method == 'POST':
+            return await proxy.post(request, requested_url)
+        return await proxy.get(request, requested_url)
+
+    app = web.Application()
+    app.router.add_route('*', '/zigate{requested_url:.*}', handler)
+    return app
+
+
+class TestPanelProxy(unittest.TestCase):
+    def _run(self, test):
+        import aiohttp
+        from aiohttp.test_utils import TestClient, TestServer
+        from custom_components.zigate import adminpanel
+
+        async def run():
+            closed = asyncio.Event()
+            upstream = TestServer(_upstream_app(closed))
+            await upstream.start_server()
+            session = aiohttp.ClientSession()
+            with mock.patch.object(adminpanel, 'async_create_clientsession', return_value=session):
+                proxy = adminpanel.PanelProxy(None, '/zigate', str(upstream.make_url('/zigate')))
+            client = TestClient(TestServer(_proxy_app(proxy)))
+            await client.start_server()
+            try:
+                await test(client, closed)
+            finally:
+                await client.close()
+                await session.close()
+                await upstream.close()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+    def test_stream(self):
+        async def test(client, closed):
+            resp = await client.get('/zigate/stream')
+            self.assertEqual(resp.status, 200)
+            self.assertEqual(await resp.text(), 'chunk0\nchunk1\nchunk2\n')
+
+            async def body():
+                for i in range(3):
+                    yield 'part{}'.format(i).encode()
+            # chunked request body
+            resp = await client.post('/zigate/echo', params={'prefix': '>'}, data=body())
+            self.assertEqual(resp.status, 200)
+            self.assertEqual(await resp.text(), '>part0part1part2')
+        self._run(test)
+
+    def test_websocket(self):
+        from aiohttp import WSMsgType
+        from custom_components.zigate.adminpanel import _websocket_forward
+
+        def forwards():
+            return [task for task in asyncio.all_tasks()
+                    if task.get_coro().cr_code is _websocket_forward.__code__]
+
+        async def test(client, closed):
+            # closed by the admin panel
+            ws = await client.ws_connect('/zigate/ws')
+            await ws.send_str('hello')
+            self.assertEqual((await ws.receive()).data, 'hello')
+            await ws.send_bytes(b'\x01\x02')
+            self.assertEqual((await ws.receive()).data, b'\x01\x02')
+            await ws.send_str('bye')
+            msg = await ws.receive()
+            self.assertEqual(msg.type, WSMsgType.CLOSE)
+            self.assertEqual(ws.close_code, 4000)
+            await asyncio.wait_for(closed.wait(), 1)
+            await asyncio.sleep(0.05)
+            self.assertEqual(forwards(), [])
+            # closed by the browser
+            closed.clear()
+            ws = await client.ws_connect('/zigate/ws')
+            await ws.send_str('hello')
+            self.assertEqual((await ws.receive()).data, 'hello')
+            await ws.close()
+            await asyncio.wait_for(closed.wait(), 1)
+            await asyncio.sleep(0.05)
+            self.assertEqual(forwards(), [])
+        self._run(test)
+
+
+if __name__ == '__main__':
+    unittest.main()
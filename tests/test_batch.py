@@ -0,0 +1,97 @@
+"""Test zigate batched attribute requests."""
+import asyncio
+import unittest
+
+
+class FakeDevice(object):
+    ieee = '0123456789abcdef'
+    addr = 'abcd'
+
+
+class FakeCoalescer(object):
+    def schedule(self, entity):
+        pass
+
+
+class FakeBus(object):
+    def __init__(self):
+        self.events = []
+
+    def async_fire(self, event_type, event_data):
+        self.events.append((event_type, event_data))
+
+
+class FakeHass(object):
+    def __init__(self):
+        self.bus = FakeBus()
+
+    async def async_add_executor_job(self, func, *args):
+        return func(*args)
+
+
+class TestBatch(unittest.TestCase):
+    def test_split_requests(self):
+        from custom_components.zigate.batch import split_requests
+        attributes = [{'endpoint': 1, 'cluster': 0, 'attribute_id': i} for i in range(12)]
+        attributes.insert(3, {'endpoint': 1, 'cluster': 6, 'attribute_id': 0})
+        frames = split_requests(attributes, 10)
+        self.assertEqual([(e, c, len(f)) for e, c, f in frames],
+                         [(1, 0, 10), (1, 0, 2), (1, 6, 1)])
+        self.assertEqual([a['attribute_id'] for a in frames[1][2]], [10, 11])
+
+    def test_split_requests_size(self):
+        from custom_components.zigate.batch import split_requests, attribute_size
+        self.assertEqual(attribute_size(0x20), 4)
+        self.assertEqual(attribute_size(0x23), 7)
+        # 64 bytes, 9 uint32 records of 7 bytes per frame
+        attributes = [{'endpoint': 1, 'cluster': 0x0201, 'attribute_id': i, 'attribute_type': 0x23}
+                      for i in range(12)]
+        frames = split_requests(attributes, 100, 64)
+        self.assertEqual([len(f) for e, c, f in frames], [9, 3])
+
+    def test_batch_request(self):
+        from custom_components.zigate import ZiGateRouter
+        from custom_components.zigate.batch import async_batch_request, split_requests
+        hass = FakeHass()
+        router = ZiGateRouter(FakeCoalescer())
+        device = FakeDevice()
+        attributes = [{'endpoint': 1, 'cluster': 0, 'attribute_id': 4},
+                      {'endpoint': 1, 'cluster': 0, 'attribute_id': 5},
+                      {'endpoint': 1, 'cluster': 6, 'attribute_id': 0}]
+        frames = split_requests(attributes)
+        sent = []
+
+        def send(endpoint, cluster, attributes):
+            sent.append((endpoint, cluster, [a['attribute_id'] for a in attributes]))
+            for a in attributes:
+                router.dispatch(device.ieee, {'endpoint': endpoint, 'cluster': cluster,
+                                              'attribute': a['attribute_id'], 'value': 'v{}'.format(a['attribute_id'])})
+        asyncio.run(async_batch_request(hass, router, 'test_response', device, frames, send, 'req'))
+        self.assertEqual(sent, [(1, 0, [4, 5]), (1, 6, [0])])
+        self.assertEqual(len(hass.bus.events), 1)
+        event_type, data = hass.bus.events[0]
+        self.assertEqual(event_type, 'test_response')
+        self.assertEqual(data['request_id'], 'req')
+        self.assertEqual(data['frames'], 2)
+        self.assertEqual(len(data['attributes']), 3)
+        self.assertEqual(data['missing'], [])
+        # collector unregistered
+        self.assertEqual(router._routes, {})
+
+    def test_batch_request_missing(self):
+        from custom_components.zigate import ZiGateRouter
+        from custom_components.zigate.batch import AttributeCollector
+        router = ZiGateRouter(FakeCoalescer())
+
+        async def run():
+            collector = AttributeCollector(router, 'ieee', [{'endpoint': 1, 'cluster': 0, 'attribute_id': 4},
+                                                            {'endpoint': 1, 'cluster': 0, 'attribute_id': 5}])
+            router.dispatch('ieee', {'endpoint': 1, 'cluster': 0, 'attribute': 4, 'value': 1})
+            return await collector.async_wait(0.01)
+        received, missing = asyncio.run(run())
+        self.assertEqual(received, [{'endpoint': 1, 'cluster': 0, 'attribute': 4, 'value': 1}])
+        self.assertEqual(missing, [{'endpoint': 1, 'cluster': 0, 'attribute': 5}])
+
+
+if __name__ == '__main__':
+    unittest.main()
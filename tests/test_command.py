@@ -0,0 +1,154 @@
+"""Test zigate command queue."""
+import asyncio
+import unittest
+
+
+class FakeZiGate(object):
+    def __init__(self):
+        self.calls = []
+        self.groups = {'0001': {('abcd', 1), ('ef01', 1)}}
+
+    def action_onoff(self, addr, endpoint, onoff):
+        self.calls.append(('action_onoff', addr, endpoint, onoff))
+
+    def action_move_colour(self, addr, endpoint, x, y, transition):
+        self.calls.append(('action_move_colour', addr, endpoint, x, y))
+
+    def action_lock(self, addr, endpoint, lock):
+        raise Exception('no response')
+
+
+class FakeHass(object):
+    def __init__(self, loop, delays=None):
+        self.loop = loop
+        self.delays = delays or {}
+
+    def async_create_task(self, coro):
+        return self.loop.create_task(coro)
+
+    async def async_add_executor_job(self, func, addr, *args):
+        # slow destinations are sent concurrently with the others
+        if addr in self.delays:
+            await asyncio.sleep(self.delays[addr])
+        return func(addr, *args)
+
+
+class TestCommandQueue(unittest.TestCase):
+    def _run(self, test, multicast=True, max_in_flight=1, delays=None):
+        from custom_components.zigate.command import ZiGateCommandQueue
+        loop = asyncio.new_event_loop()
+        try:
+            myzigate = FakeZiGate()
+            queue = ZiGateCommandQueue(FakeHass(loop, delays), myzigate, max_in_flight, multicast)
+
+            async def run():
+                if asyncio.iscoroutinefunction(test):
+                    await test(queue)
+                else:
+                    test(queue)
+                while queue.depth or queue.in_flight:
+                    await asyncio.sleep(0)
+                await asyncio.sleep(0)
+            loop.run_until_complete(asyncio.wait_for(run(), 5))
+            return queue, myzigate
+        finally:
+            loop.close()
+
+    def test_merge(self):
+        def test(queue):
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 1)
+            queue.async_send('color', 'action_move_colour', 'abcd', 1, 0.1, 0.2, 1)
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 0)
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 1)
+            queue.async_send('state', 'action_onoff', 'ef01', 1, 0)
+        queue, myzigate = self._run(test, False)
+        self.assertEqual(queue.merged, 2)
+        self.assertEqual(queue.sent, 3)
+        self.assertEqual([c for c in myzigate.calls if c[1] == 'abcd'],
+                         [('action_move_colour', 'abcd', 1, 0.1, 0.2),
+                          ('action_onoff', 'abcd', 1, 1)])
+        self.assertIn(('action_onoff', 'ef01', 1, 0), myzigate.calls)
+
+    def test_multicast(self):
+        def test(queue):
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 1)
+            queue.async_send('state', 'action_onoff', 'ef01', 1, 1)
+            queue.async_send('state', 'action_onoff', '1234', 1, 1)
+            queue.async_send('color', 'action_move_colour', 'abcd', 1, 0.1, 0.2, 1)
+        queue, myzigate = self._run(test)
+        self.assertEqual(sorted(myzigate.calls),
+                         [('action_move_colour', 'abcd', 1, 0.1, 0.2),
+                          ('action_onoff', '0001', 0xff, 1),
+                          ('action_onoff', '1234', 1, 1)])
+        self.assertEqual(queue.multicast, 1)
+        self.assertEqual(queue.multicast_saved, 1)
+
+    def test_multicast_ordering(self):
+        async def test(queue):
+            # group on, then member off on the next loop iteration
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 1)
+            queue.async_send('state', 'action_onoff', 'ef01', 1, 1)
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 0)
+        # the group command is slower than the member one
+        queue, myzigate = self._run(test, max_in_flight=2, delays={'0001': 0.01})
+        self.assertEqual(myzigate.calls, [('action_onoff', '0001', 0xff, 1),
+                                          ('action_onoff', 'abcd', 1, 0)])
+
+    def test_multicast_replaces_pending(self):
+        async def test(queue):
+            # member off waits behind the member color command
+            queue.async_send('color', 'action_move_colour', 'abcd', 1, 0.1, 0.2, 1)
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 0)
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 1)
+            queue.async_send('state', 'action_onoff', 'ef01', 1, 1)
+        queue, myzigate = self._run(test, delays={'abcd': 0.01})
+        self.assertEqual([c for c in myzigate.calls if c[0] == 'action_onoff'],
+                         [('action_onoff', '0001', 0xff, 1)])
+        self.assertEqual(queue.merged, 1)
+
+    def test_multicast_membership_changed(self):
+        async def test(queue):
+            # the group worker is busy, the group state command stays queued
+            queue.async_send('color', 'action_move_colour', 'abcd', 1, 0.1, 0.2, 1)
+            queue.async_send('color', 'action_move_colour', 'ef01', 1, 0.1, 0.2, 1)
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 1)
+            queue.async_send('state', 'action_onoff', 'ef01', 1, 1)
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            # ef01 leaves the group, 1234 joins it
+            queue._zigate.groups['0001'] = {('abcd', 1), ('1234', 1)}
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 0)
+            queue.async_send('state', 'action_onoff', '1234', 1, 0)
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            queue.async_send('color', 'action_move_colour', 'ef01', 1, 0.3, 0.4, 1)
+        queue, myzigate = self._run(test, delays={'0001': 0.01})
+        self.assertEqual([c for c in myzigate.calls if c[1] != '0001'],
+                         [('action_onoff', 'ef01', 1, 1),
+                          ('action_move_colour', 'ef01', 1, 0.3, 0.4)])
+        self.assertEqual([c for c in myzigate.calls if c[1] == '0001'],
+                         [('action_move_colour', '0001', 0xff, 0.1, 0.2),
+                          ('action_onoff', '0001', 0xff, 0)])
+        self.assertEqual(queue._barriers, {})
+
+    def test_stats(self):
+        def test(queue):
+            queue.async_send('state', 'action_onoff', 'abcd', 1, 1)
+            queue.async_send('state', 'action_lock', 'ef01', 1, 0)
+            self.assertEqual(queue.stats()['queue_depth'], 2)
+        queue, myzigate = self._run(test)
+        stats = queue.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['queue_in_flight'], 0)
+        self.assertEqual(stats['commands_sent'], 1)
+        self.assertEqual(stats['commands_failed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
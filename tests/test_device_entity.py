@@ -0,0 +1,72 @@
+"""Test zigate device entity."""
+import datetime
+import unittest
+
+
+class FakeRouter(object):
+    def register(self, entity, ieee, endpoint=None, cluster=None, attribute=None):
+        return lambda: None
+
+
+class FakeHass(object):
+    def __init__(self):
+        from custom_components.zigate import DATA_ZIGATE_ROUTER
+        self.data = {DATA_ZIGATE_ROUTER: FakeRouter()}
+
+
+class FakeDevice(object):
+    ieee = '0123456789abcdef'
+    addr = 'abcd'
+    lqi_percent = 50
+    battery_percent = 80
+    missing = False
+    genericType = ''
+    discovery = 'templated'
+    groups = {}
+
+    def __init__(self):
+        self.info = {'last_seen': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        self.lookups = 0
+
+    def get_value(self, name):
+        self.lookups += 1
+        return name
+
+    def receiver_on_when_idle(self):
+        return False
+
+
+class TestDeviceEntity(unittest.TestCase):
+    def test_device_state_attributes(self):
+        from custom_components.zigate import ZiGateDeviceEntity
+        device = FakeDevice()
+        entity = ZiGateDeviceEntity(FakeHass(), device)
+        attrs = entity.device_state_attributes
+        self.assertEqual(attrs['battery_level'], 80)
+        self.assertEqual(attrs['lqi_percent'], 50)
+        lookups = device.lookups
+        device.lqi_percent = 20
+        entity._handle_event({'cluster': 0x0402, 'attribute': 0, 'value': 20})
+        attrs = entity.device_state_attributes
+        self.assertEqual(attrs['lqi_percent'], 20)
+        self.assertEqual(device.lookups, lookups)
+        device.battery_percent = 70
+        entity._handle_event({'cluster': 0x0001, 'attribute': 0x0020, 'value': 2.9})
+        self.assertEqual(entity.device_state_attributes['battery_level'], 70)
+        # group services change the membership without any report
+        device.groups = {'0001': {1}}
+        self.assertEqual(entity.device_state_attributes['groups'], {'0001': {1}})
+
+    def test_icon(self):
+        from custom_components.zigate import ZiGateDeviceEntity
+        device = FakeDevice()
+        entity = ZiGateDeviceEntity(FakeHass(), device)
+        self.assertEqual(entity.icon, 'mdi:access-point')
+        device.info['last_seen'] = '2019-01-01 10:00:00'
+        self.assertEqual(entity.icon, 'mdi:help')
+        device.missing = True
+        self.assertEqual(entity.icon, 'mdi:emoticon-dead')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Test zigate entity discovery."""
+import unittest
+
+
+class FakeDevice(object):
+    def __init__(self, actions, attributes):
+        self.ieee = '0123456789abcdef'
+        self.addr = '1234'
+        self._actions = actions
+        self.attributes = attributes
+
+    def available_actions(self):
+        return self._actions
+
+    def get_attribute(self, endpoint, cluster, attribute, extended_info=False):
+        for a in self.attributes:
+            if (a['endpoint'], a['cluster'], a['attribute']) == (endpoint, cluster, attribute):
+                return a
+
+
+class FakeEntity(object):
+    hass = None
+
+    def __init__(self, hass, device, arg):
+        self.arg = arg
+        self._available = True
+
+
+class TestDiscovery(unittest.TestCase):
+    def test_classify_actions(self):
+        from custom_components.zigate.discovery import classify
+        device = FakeDevice({1: ['onoff', 'level'], 2: ['onoff'], 3: ['cover'], 4: []}, [])
+        self.assertEqual(classify(device),
+                         [('light', '0123456789abcdef-light-1', 1),
+                          ('switch', '0123456789abcdef-switch-2', 2),
+                          ('cover', '0123456789abcdef-cover-3', 3)])
+
+    def test_classify_attributes(self):
+        from custom_components.zigate.discovery import classify
+        temperature = {'endpoint': 1, 'cluster': 0x0402, 'attribute': 0, 'name': 'temperature', 'value': 21.5}
+        presence = {'endpoint': 1, 'cluster': 0x0406, 'attribute': 0, 'name': 'presence', 'value': True}
+        basic = {'endpoint': 1, 'cluster': 0, 'attribute': 5, 'name': 'type', 'value': 'lumi.sensor'}
+        empty = {'endpoint': 1, 'cluster': 0x0405, 'attribute': 0, 'name': 'humidity'}
+        device = FakeDevice({1: []}, [temperature, presence, basic, empty])
+        pending = []
+        self.assertEqual(classify(device, pending=pending),
+                         [('sensor', '0123456789abcdef-1-1026-0', temperature),
+                          ('binary_sensor', '0123456789abcdef-1-1030-0', presence)])
+        self.assertEqual(pending, [empty])
+        self.assertEqual(classify(device, presence),
+                         [('binary_sensor', '0123456789abcdef-1-1030-0', presence)])
+
+    def test_discover(self):
+        from custom_components.zigate.discovery import ZiGateDiscovery
+        entities = {}
+        added = []
+        discovery = ZiGateDiscovery(None, entities)
+        humidity = {'endpoint': 1, 'cluster': 0x0405, 'attribute': 0, 'name': 'humidity'}
+        device = FakeDevice({1: ['onoff']}, [])
+        discovery.discover(device)
+        # platform not registered yet, entity is created on registration
+        self.assertEqual(entities, {})
+        discovery.register_platform('switch', FakeEntity, added.extend)
+        self.assertEqual(len(added), 1)
+        discovery.discover(device)
+        self.assertEqual(len(added), 1)
+        discovery.register_platform('sensor', FakeEntity, added.extend)
+        device = FakeDevice({}, [humidity])
+        discovery.discover(device, humidity)
+        self.assertEqual(len(added), 1)
+        humidity['value'] = 55
+        discovery.attribute_updated(device, humidity)
+        self.assertEqual(len(added), 2)
+        self.assertIn('0123456789abcdef-1-1029-0', entities)
+
+    def test_restore(self):
+        from custom_components.zigate.discovery import ZiGateDiscovery
+        temperature = {'endpoint': 1, 'cluster': 0x0402, 'attribute': 0, 'name': 'temperature', 'value': 21.5}
+        device = FakeDevice({}, [temperature])
+        discovery = ZiGateDiscovery(None, {})
+        discovery.register_platform('sensor', FakeEntity, lambda entities: None)
+        discovery.discover(device)
+        snapshot = discovery.snapshot()
+        self.assertEqual(snapshot, [['sensor', '0123456789abcdef-1-1026-0', '0123456789abcdef', [1, 0x0402, 0]]])
+
+        # next start
+        entities = {}
+        added = []
+        discovery = ZiGateDiscovery(None, entities)
+        snapshot.append(['switch', 'fedcba9876543210-switch-1', 'fedcba9876543210', 1])  # device gone
+        discovery.restore([device], snapshot)
+        discovery.register_platform('sensor', FakeEntity, added.extend)
+        self.assertEqual(len(added), 1)
+        self.assertIs(added[0].arg, temperature)
+        self.assertFalse(added[0]._available)
+        # reconcile once the ZiGate is up
+        discovery.discover(device)
+        self.assertEqual(len(added), 1)
+        discovery.ready()
+        self.assertTrue(added[0]._available)
+
+
+if __name__ == '__main__':
+    unittest.main()
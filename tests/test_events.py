@@ -0,0 +1,33 @@
+"""Test zigate event payloads."""
+import unittest
+
+
+class FakeDevice(object):
+    ieee = '0123456789abcdef'
+    addr = 'abcd'
+
+    def get_property_value(self, name):
+        return 'lumi.weather'
+
+
+class TestEvents(unittest.TestCase):
+    attribute = {'endpoint': 1, 'cluster': 0x0402, 'addr': 'abcd', 'attribute': 0,
+                 'data': 2345, 'name': 'temperature', 'value': 23.45, 'unit': '°C', 'type': float}
+
+    def test_compact_event(self):
+        from custom_components.zigate.events import compact_event
+        self.assertEqual(compact_event(FakeDevice(), self.attribute),
+                         {'ieee': '0123456789abcdef', 'endpoint': 1, 'cluster': 0x0402,
+                          'attribute': 0, 'name': 'temperature', 'value': 23.45})
+
+    def test_full_event(self):
+        from custom_components.zigate.events import full_event
+        event_data = full_event(FakeDevice(), self.attribute)
+        self.assertEqual(event_data['type'], 'float')
+        self.assertEqual(event_data['device_type'], 'lumi.weather')
+        self.assertEqual(event_data['unit'], '°C')
+        self.assertIs(self.attribute['type'], float)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""Test zigate firmware upgrade with a simulated serial device."""
+import os
+import struct
+import tempfile
+import unittest
+
+
+def make_image(size, fill):
+    image = bytearray([fill] * size)
+    image[0x20:0x24] = struct.pack('>L', size)
+    return bytes(image)
+
+
+class FakeSerial(object):
+    '''ZiGate bootloader'''
+    def __init__(self, flash, corrupt_read=None):
+        self.flash = bytearray(flash)
+        self.baudrate = 38400
+        self.closed = False
+        self.reads = 0
+        self._corrupt_read = corrupt_read
+        self._buffer = b''
+
+    def write(self, msg):
+        from zigate import flasher
+        type_, data = msg[1], msg[2:-1]
+        status = b'\x00'
+        if type_ == 0x32:
+            payload = struct.pack('!L', flasher.ZIGATE_CHIP_ID)
+        elif type_ == 0x25:
+            payload = b'\xcc\xee'
+        elif type_ == 0x1f:
+            payload = bytes(range(8))
+        elif type_ == 0x0b:
+            addr, length = struct.unpack('<LH', data)
+            payload = bytes(self.flash[addr:addr + length])
+            self.reads += 1
+            if self.reads == self._corrupt_read:
+                payload = bytes(b ^ 0xff for b in payload)
+        elif type_ == 0x07:
+            self.flash = bytearray()
+            payload = b''
+        elif type_ == 0x09:
+            addr, = struct.unpack('<L', data[:4])
+            self.flash[addr:addr + len(data) - 4] = data[4:]
+            payload = b''
+        else:
+            payload = b''
+        self._buffer += flasher.prepare(type_ + 1, status + payload)
+
+    def read(self, size=1):
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        self.closed = True
+
+
+class TestFirmwareUpgrade(unittest.TestCase):
+    def test_upgrade(self):
+        from zigate import flasher
+        from custom_components.zigate.firmware import ZiGateFirmwareUpgrade
+        old_image = make_image(512, 0x11)
+        new_image = make_image(300, 0x22)
+        device = FakeSerial(old_image)
+        phases = []
+        with tempfile.TemporaryDirectory() as tmp:
+            firmware = os.path.join(tmp, 'ZiGate.bin')
+            with open(firmware, 'wb') as fp:
+                fp.write(flasher.ZIGATE_BINARY_VERSION + new_image)
+            job = ZiGateFirmwareUpgrade('fake', tmp, tmp, lambda port: device,
+                                        lambda: phases.append((job.phase, job.progress)))
+            self.assertTrue(job.run(cached=True))
+            with open(job.backup, 'rb') as fp:
+                self.assertEqual(fp.read(), flasher.ZIGATE_BINARY_VERSION + old_image)
+        self.assertEqual(bytes(device.flash), new_image)
+        self.assertTrue(device.closed)
+        self.assertEqual([p for p in phases if p[1] in (0, 100)],
+                         [('backup', 0), ('backup', 100), ('verify', 0), ('verify', 100),
+                          ('write', 0), ('write', 100), ('done', 100)])
+
+    def test_bad_flash_read(self):
+        from zigate import flasher
+        from custom_components.zigate.firmware import ZiGateFirmwareUpgrade
+        old_image = make_image(512, 0x11)
+        # a block read differently during the backup and the verification
+        for corrupt_read in (2, 6):
+            device = FakeSerial(old_image, corrupt_read)
+            with tempfile.TemporaryDirectory() as tmp:
+                firmware = os.path.join(tmp, 'ZiGate.bin')
+                with open(firmware, 'wb') as fp:
+                    fp.write(flasher.ZIGATE_BINARY_VERSION + make_image(300, 0x22))
+                job = ZiGateFirmwareUpgrade('fake', tmp, tmp, lambda port: device)
+                self.assertFalse(job.run(firmware))
+            self.assertEqual(job.error, 'Flash content changed between two reads')
+            self.assertEqual(bytes(device.flash), old_image)
+
+    def test_invalid_flash_header(self):
+        from zigate import flasher
+        from custom_components.zigate.firmware import ZiGateFirmwareUpgrade
+        old_image = bytearray(make_image(512, 0x11))
+        old_image[0x20:0x24] = b'\xff\xff\xff\xff'
+        device = FakeSerial(old_image)
+        with tempfile.TemporaryDirectory() as tmp:
+            firmware = os.path.join(tmp, 'ZiGate.bin')
+            with open(firmware, 'wb') as fp:
+                fp.write(flasher.ZIGATE_BINARY_VERSION + make_image(300, 0x22))
+            job = ZiGateFirmwareUpgrade('fake', tmp, tmp, lambda port: device)
+            self.assertFalse(job.run(firmware))
+        self.assertEqual(job.phase, 'failed')
+        self.assertEqual(bytes(device.flash), old_image)
+
+    def test_invalid_image(self):
+        from custom_components.zigate.firmware import ZiGateFirmwareUpgrade
+        device = FakeSerial(make_image(512, 0x11))
+        with tempfile.TemporaryDirectory() as tmp:
+            firmware = os.path.join(tmp, 'ZiGate.bin')
+            with open(firmware, 'wb') as fp:
+                fp.write(b'\x00' * 100)
+            job = ZiGateFirmwareUpgrade('fake', tmp, tmp, lambda port: device)
+            self.assertFalse(job.run(firmware))
+        self.assertEqual(job.phase, 'failed')
+        self.assertEqual(bytes(device.flash), make_image(512, 0x11))
+
+
+if __name__ == '__main__':
+    unittest.main()
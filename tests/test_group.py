@@ -0,0 +1,25 @@
+"""Test zigate group multicast."""
+import unittest
+
+
+class TestGroup(unittest.TestCase):
+    def test_plan_multicast(self):
+        from custom_components.zigate.group import plan_multicast
+        groups = {'0001': {('abcd', 1), ('ef01', 1)},
+                  '0002': {('abcd', 1), ('ef01', 1), ('1234', 1)},
+                  '0003': {('5678', 1)},
+                  }
+        multicast, remaining = plan_multicast(groups, [('abcd', 1), ('ef01', 1), ('1234', 1), ('5678', 1)])
+        self.assertEqual(multicast, [('0002', frozenset([('abcd', 1), ('ef01', 1), ('1234', 1)]))])
+        self.assertEqual(remaining, {('5678', 1)})
+
+    def test_plan_multicast_partial_group(self):
+        from custom_components.zigate.group import plan_multicast
+        groups = {'0001': {('abcd', 1), ('ef01', 1), ('1234', 1)}}
+        multicast, remaining = plan_multicast(groups, [('abcd', 1), ('ef01', 1)])
+        self.assertEqual(multicast, [])
+        self.assertEqual(remaining, {('abcd', 1), ('ef01', 1)})
+
+
+if __name__ == '__main__':
+    unittest.main()
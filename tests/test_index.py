@@ -0,0 +1,96 @@
+"""Test zigate device index."""
+import unittest
+
+
+class FakeDevice(object):
+    def __init__(self, ieee, addr):
+        self.ieee = ieee
+        self.addr = addr
+
+
+class FakeRegistry(object):
+    def __init__(self, entries):
+        self.entries = entries
+
+    def async_get(self, entity_id):
+        return self.entries.get(entity_id)
+
+
+class TestIndex(unittest.TestCase):
+    def test_index(self):
+        from custom_components.zigate.index import ZiGateDeviceIndex
+        index = ZiGateDeviceIndex()
+        device = FakeDevice('0123456789abcdef', 'abcd')
+        index.add_device(device)
+        index.add_entity(device, None, 'zigate.0123456789abcdef', device.ieee)
+        index.add_entity(device, 1, 'light.zigate_0123456789abcdef_1', '0123456789abcdef-light-1')
+        index.add_entity(device, 2, 'sensor.zigate_0123456789abcdef_temperature', '0123456789abcdef-2-1026-0')
+        self.assertIs(index.get_device(ieee='0123456789abcdef'), device)
+        self.assertIs(index.get_device(addr='abcd'), device)
+        self.assertIsNone(index.get_device(ieee='fedcba9876543210'))
+        self.assertEqual(index.get_entity('zigate.0123456789abcdef'), (device, None))
+        self.assertEqual(index.get_entity('light.zigate_0123456789abcdef_1'), (device, 1))
+        self.assertEqual(index.get_entity('sensor.zigate_0123456789abcdef_temperature'), (device, 2))
+        # renamed entity
+        self.assertEqual(index.get_entity('light.kitchen', '0123456789abcdef-light-1'), (device, 1))
+        self.assertEqual(index.get_entity('light.unknown'), (None, None))
+
+        device.addr = '1234'
+        index.address_changed(device, 'abcd')
+        self.assertIsNone(index.get_device(addr='abcd'))
+        self.assertIs(index.get_device(addr='1234'), device)
+        # a new device took the old address
+        other = FakeDevice('fedcba9876543210', 'abcd')
+        index.add_device(other)
+        index.address_changed(device, 'abcd')
+        self.assertIs(index.get_device(addr='abcd'), other)
+
+        index.remove_device(device)
+        self.assertIsNone(index.get_device(ieee='0123456789abcdef'))
+        self.assertIsNone(index.get_device(addr='1234'))
+        self.assertEqual(index.get_entity('light.zigate_0123456789abcdef_1'), (None, None))
+        self.assertEqual(index.get_entity(unique_id='0123456789abcdef-light-1'), (None, None))
+        self.assertIs(index.get_device(addr='abcd'), other)
+
+    def test_resolve(self):
+        from types import SimpleNamespace
+        from custom_components.zigate.index import ZiGateDeviceIndex
+        index = ZiGateDeviceIndex()
+        device = FakeDevice('0123456789abcdef', 'abcd')
+        index.add_device(device)
+        index.add_entity(device, 1, 'light.zigate_0123456789abcdef_1', '0123456789abcdef-light-1')
+        registry = FakeRegistry({
+            # renamed in the entity registry
+            'light.kitchen': SimpleNamespace(platform='zigate', unique_id='0123456789abcdef-light-1'),
+            'light.other': SimpleNamespace(platform='hue', unique_id='0123456789abcdef-light-1'),
+        })
+        self.assertEqual(index.resolve(registry, 'light.zigate_0123456789abcdef_1'), (device, 1))
+        self.assertEqual(index.resolve(registry, 'light.kitchen'), (device, 1))
+        self.assertEqual(index.resolve(registry, 'light.other'), (None, None))
+        self.assertEqual(index.resolve(registry, 'light.unknown'), (None, None))
+        self.assertEqual(index.resolve(registry, ieee='0123456789abcdef'), (device, None))
+        # entity_id first
+        self.assertEqual(index.resolve(registry, 'light.unknown', '0123456789abcdef'), (None, None))
+        self.assertEqual(index.resolve(registry), (None, None))
+        # entity registry not loaded
+        self.assertEqual(index.resolve(None, 'light.kitchen'), (None, None))
+        self.assertEqual(index.resolve(None, 'light.zigate_0123456789abcdef_1'), (device, 1))
+
+    def test_get_entity_registry(self):
+        from types import SimpleNamespace
+        from unittest import mock
+        from homeassistant.helpers import entity_registry
+        from custom_components.zigate.index import get_entity_registry
+        registry = entity_registry.EntityRegistry.__new__(entity_registry.EntityRegistry)
+        hass = SimpleNamespace(data={entity_registry.DATA_REGISTRY: registry})
+        self.assertIs(get_entity_registry(hass), registry)
+        # older Home Assistant without entity_registry.async_get
+        with mock.patch.object(entity_registry, 'async_get'):
+            del entity_registry.async_get
+            self.assertIs(get_entity_registry(hass), registry)
+            self.assertIsNone(get_entity_registry(SimpleNamespace(data={})))
+        self.assertTrue(hasattr(entity_registry, 'async_get'))
+
+
+if __name__ == '__main__':
+    unittest.main()
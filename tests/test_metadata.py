@@ -0,0 +1,106 @@
+"""Test zigate entity metadata."""
+import unittest
+
+
+class FakeDevice(object):
+    ieee = '0123456789abcdef'
+    addr = 'abcd'
+
+    def __str__(self):
+        return 'lumi.weather (abcd)'
+
+    def get_value(self, name, default=None):
+        return default
+
+    def get_attribute(self, endpoint, cluster, attribute):
+        if (endpoint, cluster, attribute) == (1, 6, 0):
+            return {'attribute': 0, 'value': True}
+
+
+class FakeRouter(object):
+    def register(self, entity, ieee, endpoint=None, cluster=None, attribute=None):
+        return lambda: None
+
+
+class FakeHass(object):
+    def __init__(self):
+        from custom_components.zigate import DATA_ZIGATE_ROUTER
+        self.data = {DATA_ZIGATE_ROUTER: FakeRouter()}
+
+
+class TestMetadata(unittest.TestCase):
+    def test_attribute_kind(self):
+        from custom_components.zigate.metadata import attribute_kind
+        temperature = {'endpoint': 1, 'cluster': 0x0402, 'attribute': 0, 'name': 'temperature',
+                       'value': 21.5, 'unit': '°C'}
+        kind = attribute_kind(temperature)
+        self.assertIs(attribute_kind(dict(temperature, value=22)), kind)
+        self.assertIsNot(attribute_kind(dict(temperature, endpoint=2)), kind)
+        self.assertEqual(dict(kind.attributes), {'endpoint': '0x01', 'cluster': '0x0402', 'attribute': '0x0000'})
+        with self.assertRaises(TypeError):
+            kind.attributes['endpoint'] = '0x02'
+
+    def test_sensor(self):
+        from custom_components.zigate.discovery import attribute_key
+        from custom_components.zigate.sensor import ZiGateSensor
+        temperature = {'endpoint': 1, 'cluster': 0x0402, 'attribute': 0, 'name': 'temperature',
+                       'value': 21.5, 'unit': '°C'}
+        key = attribute_key('0123456789abcdef', temperature)
+        sensor = ZiGateSensor(FakeHass(), FakeDevice(), dict(temperature))
+        # the attribute is not kept, its identifiers are shared
+        self.assertIs(sensor.unique_id, key)
+        self.assertEqual(sensor.entity_id, 'sensor.zigate_0123456789abcdef_temperature')
+        self.assertEqual(sensor.name, 'temperature lumi.weather (abcd)')
+        self.assertEqual(sensor.unit_of_measurement, '°C')
+        self.assertEqual(sensor.device_state_attributes,
+                         {'addr': 'abcd', 'ieee': '0123456789abcdef',
+                          'endpoint': '0x01', 'cluster': '0x0402', 'attribute': '0x0000'})
+        sensor._handle_event({'value': 22})
+        self.assertEqual(sensor.state, 22)
+
+    def test_binary_sensor(self):
+        from custom_components.zigate.binary_sensor import ZiGateBinarySensor
+        zone_status = {'endpoint': 1, 'cluster': 0x0500, 'attribute': 2, 'name': 'zone_status',
+                       'value': {'alarm1': False, 'tamper': False}}
+        sensor = ZiGateBinarySensor(FakeHass(), FakeDevice(), zone_status)
+        self.assertFalse(sensor.is_on)
+        self.assertEqual(sensor.device_class, 'safety')
+        sensor._handle_event({'value': {'alarm1': True, 'tamper': True}})
+        self.assertTrue(sensor.is_on)
+        self.assertTrue(sensor.device_state_attributes['tamper'])
+
+    def test_cached_attributes(self):
+        from custom_components.zigate.sensor import ZiGateSensor
+        device = FakeDevice()
+        temperature = {'endpoint': 1, 'cluster': 0x0402, 'attribute': 0, 'name': 'temperature',
+                       'value': 21.5}
+        sensor = ZiGateSensor(FakeHass(), device, temperature)
+        attrs = sensor.device_state_attributes
+        sensor._handle_event({'value': 22})
+        self.assertIs(sensor.device_state_attributes, attrs)
+        # dict values are part of the attributes
+        sensor._handle_event({'value': {'alarm1': True}})
+        self.assertTrue(sensor.device_state_attributes['alarm1'])
+        # rebuilt when the device address changes
+        device.addr = '1234'
+        self.assertEqual(sensor.device_state_attributes['addr'], '1234')
+
+    def test_endpoint_entity(self):
+        from custom_components.zigate.discovery import endpoint_key
+        from custom_components.zigate.switch import ZiGateSwitch
+        switch = ZiGateSwitch(FakeHass(), FakeDevice(), 1)
+        self.assertIs(switch.unique_id, endpoint_key('0123456789abcdef', 'switch', 1))
+        self.assertEqual(switch.unique_id, '0123456789abcdef-switch-1')
+        self.assertEqual(switch.name, 'lumi.weather (abcd) 1')
+        self.assertFalse(switch.should_poll)
+        self.assertTrue(switch.available)
+        # restored from a snapshot before the ZiGate is up
+        switch._available = False
+        self.assertFalse(switch.available)
+        self.assertTrue(switch.is_on)
+        self.assertEqual(switch.device_state_attributes,
+                         {'addr': 'abcd', 'ieee': '0123456789abcdef', 'endpoint': '0x01'})
+
+
+if __name__ == '__main__':
+    unittest.main()
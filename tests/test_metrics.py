@@ -0,0 +1,108 @@
+"""Test zigate hot path metrics."""
+import unittest
+
+
+class FakeEntity(object):
+    def __init__(self):
+        self.hass = 'hass'
+        self.writes = 0
+
+    def _handle_event(self, data):
+        pass
+
+    def async_write_ha_state(self):
+        self.writes += 1
+
+
+class FakeConnection(object):
+    def is_connected(self):
+        return True
+
+
+class FakeDevice(object):
+    def __init__(self, ieee, addr, lqi, last_seen, battery=None):
+        self.ieee = ieee
+        self.addr = addr
+        self.lqi = lqi
+        self.info = {'last_seen': last_seen}
+        self.battery_percent = battery
+
+    def receiver_on_when_idle(self):
+        return self.battery_percent is None
+
+
+class FakeZiGate(object):
+    def __init__(self, devices):
+        self.connection = FakeConnection()
+        self._devices = {device.addr: device for device in devices}
+        self.sent = []
+
+    def send_data(self, cmd, data=''):
+        self.sent.append(cmd)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_stage_timer(self):
+        from custom_components.zigate.metrics import StageTimer
+        timer = StageTimer(samples=100)
+        self.assertEqual(timer.percentiles(), {'p50': 0, 'p95': 0, 'p99': 0})
+        for i in range(200):
+            timer.add(i / 1000)
+        # only the last 100 samples are kept
+        self.assertEqual(timer.as_dict(), {'p50': 150, 'p95': 195, 'p99': 199, 'count': 200})
+
+    def test_report(self):
+        from custom_components.zigate.metrics import ZiGateMetrics
+        metrics = ZiGateMetrics()
+        metrics.report('0123456789abcdef', 0x0402)
+        metrics.report('0123456789abcdef', 0x0405)
+        metrics.report('fedcba9876543210', 0x0402)
+        diagnostics = metrics.diagnostics()
+        self.assertEqual(diagnostics['reports'], 3)
+        self.assertEqual(diagnostics['reports_by_device'], {'0123456789abcdef': 2, 'fedcba9876543210': 1})
+        self.assertEqual(diagnostics['reports_by_cluster'], {'0x0402': 2, '0x0405': 1})
+        self.assertEqual(diagnostics['stages']['total']['count'], 0)
+
+    def test_router_stages(self):
+        from custom_components.zigate import ZiGateCoalescer, ZiGateRouter
+        from custom_components.zigate.metrics import ZiGateMetrics
+        metrics = ZiGateMetrics()
+        router = ZiGateRouter(ZiGateCoalescer(None, 0, metrics), metrics)
+        entity = FakeEntity()
+        router.register(entity, 'ieee', 1, 6, 0)
+        router.dispatch('ieee', {'endpoint': 1, 'cluster': 6, 'attribute': 0})
+        self.assertEqual(entity.writes, 1)
+        self.assertEqual(metrics.stages['entity'].count, 1)
+        self.assertEqual(metrics.stages['state_write'].count, 1)
+        self.assertEqual(metrics.stages['handler'].count, 0)
+
+    def test_openmetrics(self):
+        import datetime
+        from custom_components.zigate.metrics import ZiGateMetrics
+        last_seen = (datetime.datetime.now() - datetime.timedelta(seconds=60)).strftime('%Y-%m-%d %H:%M:%S')
+        myzigate = FakeZiGate([FakeDevice('0123456789abcdef', 'abcd', 170, last_seen, 85.5),
+                               FakeDevice('fedcba9876543210', '1234', 255, None)])
+        metrics = ZiGateMetrics()
+        metrics.attach(myzigate)
+        myzigate.send_data(0x0100)
+        self.assertEqual(myzigate.sent, [0x0100])
+        metrics.packet_received(packet=b'')
+        metrics.report('0123456789abcdef', 0x0402)
+        metrics.add('total', metrics.start())
+        lines = metrics.openmetrics(myzigate).splitlines()
+        self.assertEqual(lines[-1], '# EOF')
+        self.assertIn('zigate_connected 1', lines)
+        self.assertIn('zigate_frames_received_total 1', lines)
+        self.assertIn('zigate_frames_sent_total 1', lines)
+        self.assertIn('zigate_device_lqi{ieee="0123456789abcdef",addr="abcd"} 170', lines)
+        self.assertIn('zigate_device_battery_percent{ieee="0123456789abcdef",addr="abcd"} 85', lines)
+        self.assertNotIn('zigate_device_battery_percent{ieee="fedcba9876543210",addr="1234"}', '\n'.join(lines))
+        self.assertTrue(any(line.startswith('zigate_device_last_seen_age_seconds{ieee="0123456789abcdef",addr="abcd"} 6')
+                            for line in lines))
+        self.assertIn('zigate_device_reports_total{ieee="0123456789abcdef"} 1', lines)
+        self.assertIn('zigate_cluster_reports_total{cluster="0x0402"} 1', lines)
+        self.assertIn('zigate_report_latency_seconds_count{stage="total"} 1', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Test zigate network summary."""
+import unittest
+
+
+class FakeDevice(object):
+    def __init__(self, bit_field):
+        self.info = {'bit_field': bit_field}
+
+
+class FakeZiGate(object):
+    def __init__(self):
+        self.devices = [FakeDevice('0000000000000001'),
+                        FakeDevice('0000000000000010'),
+                        FakeDevice('0000000000000001')]
+        self.groups = {'0001': {('abcd', 1)}}
+        self._neighbours_table_cache = []
+
+    def build_neighbours_table(self, force=False):
+        self._neighbours_table_cache = [('0000', 'abcd', 255)]
+        return self._neighbours_table_cache
+
+
+class TestNetwork(unittest.TestCase):
+    def test_summary(self):
+        from custom_components.zigate.network import ZiGateNetwork
+        network = ZiGateNetwork(FakeZiGate())
+        self.assertEqual(network.summary(),
+                         {'node_count': 3, 'router_count': 2, 'network_scan_age': None})
+        network.scan()
+        self.assertEqual(network.summary()['network_scan_age'], 0)
+
+    def test_table(self):
+        from custom_components.zigate.network import ZiGateNetwork
+        network = ZiGateNetwork(FakeZiGate())
+        network.scan()
+        table = network.table()
+        self.assertEqual(table['neighbours'], [['0000', 'abcd', 255]])
+        self.assertEqual(table['groups'], {'0001': [['abcd', 1]]})
+
+
+if __name__ == '__main__':
+    unittest.main()
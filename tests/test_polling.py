@@ -0,0 +1,122 @@
+"""Test zigate refresh scheduling."""
+import asyncio
+import unittest
+
+
+class FakeDevice(object):
+    def __init__(self, ieee, sleepy=False, fail=False):
+        self.ieee = ieee
+        self.refreshed = []
+        self._sleepy = sleepy
+        self._fail = fail
+
+    def receiver_on_when_idle(self):
+        return not self._sleepy
+
+    def refresh_device(self, full=False, force=False):
+        if self._fail:
+            raise Exception('timeout')
+        self.refreshed.append((full, force))
+
+
+class FakeBus(object):
+    def __init__(self):
+        self.events = []
+
+    def async_fire(self, event_type, event_data):
+        self.events.append((event_type, event_data))
+
+
+class FakeHass(object):
+    def __init__(self, loop):
+        self.loop = loop
+        self.bus = FakeBus()
+        self.running = 0
+        self.max_running = 0
+
+    def async_create_task(self, coro):
+        return self.loop.create_task(coro)
+
+    async def async_add_executor_job(self, func, *args):
+        self.running += 1
+        self.max_running = max(self.running, self.max_running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return func(*args)
+
+
+class TestRefresher(unittest.TestCase):
+    def test_refresh_all(self):
+        from custom_components.zigate.polling import ZiGateRefresher
+        loop = asyncio.new_event_loop()
+        hass = FakeHass(loop)
+        refresher = ZiGateRefresher(hass, 2, 0)
+        devices = [FakeDevice(str(i)) for i in range(5)]
+        sleepy = FakeDevice('sleepy', sleepy=True)
+        failing = FakeDevice('failing', fail=True)
+        try:
+            loop.run_until_complete(refresher.async_refresh_all(devices + [sleepy, failing], True))
+            self.assertEqual(hass.max_running, 2)
+            self.assertTrue(all(d.refreshed == [(True, False)] for d in devices))
+            self.assertEqual(sleepy.refreshed, [])
+            self.assertEqual(refresher.deferred, 1)
+            progress = [e for e in hass.bus.events if e[0] == 'zigate.refresh_progress']
+            self.assertEqual(len(progress), 6)
+            event_type, event_data = hass.bus.events[-1]
+            self.assertEqual(event_type, 'zigate.refresh_completed')
+            event_data.pop('duration')
+            self.assertEqual(event_data, {'total': 6, 'failed': 1, 'deferred': 1})
+
+            async def check_in():
+                refresher.device_seen(sleepy)
+                refresher.device_seen(sleepy)
+                await asyncio.sleep(0.05)
+            loop.run_until_complete(check_in())
+            self.assertEqual(sleepy.refreshed, [(True, True)])
+            self.assertEqual(refresher.deferred, 0)
+        finally:
+            loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestPoller(unittest.TestCase):
+    def setUp(self):
+        from custom_components.zigate import polling
+        self._min_gap = polling.POLL_MIN_GAP
+        polling.POLL_MIN_GAP = 0.01
+
+    def tearDown(self):
+        from custom_components.zigate import polling
+        polling.POLL_MIN_GAP = self._min_gap
+
+    def test_poll_quiet_devices(self):
+        from custom_components.zigate.polling import ZiGatePoller
+        loop = asyncio.new_event_loop()
+        hass = FakeHass(loop)
+        poller = ZiGatePoller(hass, 0.1)
+        quiet = [FakeDevice('quiet1'), FakeDevice('quiet2')]
+        reporting = FakeDevice('reporting')
+        sleepy = FakeDevice('sleepy', sleepy=True)
+
+        async def run():
+            for device in quiet + [reporting, sleepy]:
+                poller.add(device)
+            poller.start()
+            for i in range(15):
+                poller.reported(reporting)
+                await asyncio.sleep(0.01)
+            poller.stop()
+            await asyncio.sleep(0.02)
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+        self.assertEqual(hass.max_running, 1)
+        self.assertTrue(all(d.refreshed and d.refreshed[0] == (False, True) for d in quiet))
+        self.assertEqual(reporting.refreshed, [])
+        self.assertEqual(sleepy.refreshed, [])
+        self.assertGreater(poller.polls_skipped, 0)
+        self.assertIsNotNone(poller.latency)
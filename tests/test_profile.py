@@ -0,0 +1,19 @@
+"""Test zigate startup profile."""
+import unittest
+
+
+class TestStartupProfile(unittest.TestCase):
+    def test_phases(self):
+        from custom_components.zigate.profile import StartupProfile
+        profile = StartupProfile()
+        with profile.phase('connect'):
+            pass
+        with self.assertRaises(ValueError):
+            with profile.phase('start'):
+                raise ValueError()
+        self.assertEqual(list(profile.phases), ['connect', 'start'])
+        self.assertEqual(profile.stats(), {'startup_profile_ms': {'connect': 0, 'start': 0}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Test zigate reporting configuration."""
+import struct
+import unittest
+
+
+class FakeDevice(object):
+    addr = 'abcd'
+    ieee = '0123456789abcdef'
+    endpoints = {1: {'in_clusters': [0x0000, 0x0006, 0x0008]}}
+
+
+class FakeZiGate(object):
+    def __init__(self):
+        self.sent = []
+        self.bound = []
+
+    def _translate_addr(self, addr):
+        return addr
+
+    def _choose_addr_mode(self, addr):
+        return 2, 'H'
+
+    def send_data(self, cmd, data, wait_response=None):
+        self.sent.append((cmd, data))
+
+    def bind_addr(self, addr, endpoint, cluster):
+        self.bound.append((addr, endpoint, cluster))
+
+
+class TestReporting(unittest.TestCase):
+    def test_configure_reporting(self):
+        from custom_components.zigate.reporting import configure_reporting
+        myzigate = FakeZiGate()
+        attributes = [(i, 0x21, 1, 900, 5) for i in range(12)]
+        configure_reporting(myzigate, 'abcd', 1, 0x0201, attributes)
+        self.assertEqual(len(myzigate.sent), 2)
+        cmd, data = myzigate.sent[0]
+        self.assertEqual(cmd, 0x0120)
+        header = struct.unpack('!BHBBHBBHB', data[:12])
+        self.assertEqual(header, (2, 0xabcd, 1, 1, 0x0201, 0, 0, 0, 10))
+        self.assertEqual(struct.unpack('!BBHHHHB', data[12:23]), (0, 0x21, 0, 1, 900, 0, 5))
+        self.assertEqual(myzigate.sent[1][1][11], 2)
+
+    def test_apply_profile(self):
+        from custom_components.zigate.reporting import apply_profile
+        myzigate = FakeZiGate()
+        apply_profile(myzigate, FakeDevice(), 'light', 1)
+        self.assertEqual(myzigate.bound, [('abcd', 1, 0x0006), ('abcd', 1, 0x0008)])
+        self.assertEqual(len(myzigate.sent), 2)
+
+    def test_attribute_schema(self):
+        import voluptuous as vol
+        from custom_components.zigate import REPORTING_ATTRIBUTE_SCHEMA
+        attribute = {'attribute_id': '0', 'attribute_type': '0x20'}
+        # string values from yaml or the UI
+        self.assertEqual(REPORTING_ATTRIBUTE_SCHEMA(dict(attribute, change='1'))['change'], 1)
+        self.assertEqual(REPORTING_ATTRIBUTE_SCHEMA(attribute)['change'], 0)
+        with self.assertRaises(vol.Invalid):
+            REPORTING_ATTRIBUTE_SCHEMA(dict(attribute, change=256))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+"""Test zigate attribute update router."""
+import unittest
+
+
+class FakeEntity(object):
+    def __init__(self, name, received):
+        self.name = name
+        self.hass = None
+        self._received = received
+
+    def _handle_event(self, data):
+        self._received.append(self.name)
+
+
+class FakeCoalescer(object):
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, entity):
+        self.scheduled.append(entity)
+
+
+class FakeLoop(object):
+    def __init__(self):
+        self.calls = []
+
+    def call_soon_threadsafe(self, func, *args):
+        func(*args)
+
+    def call_soon(self, func, *args):
+        self.calls.append((func, args))
+
+    def call_later(self, delay, func, *args):
+        self.calls.append((func, args))
+
+
+class FakeHass(object):
+    def __init__(self):
+        self.loop = FakeLoop()
+
+
+class FakeStateEntity(object):
+    def __init__(self, hass):
+        self.hass = hass
+        self.writes = 0
+
+    def schedule_update_ha_state(self):
+        self.writes += 1
+
+    def async_write_ha_state(self):
+        self.writes += 1
+
+
+class TestRouter(unittest.TestCase):
+    def test_dispatch(self):
+        from custom_components.zigate import ZiGateRouter
+        coalescer = FakeCoalescer()
+        router = ZiGateRouter(coalescer)
+        received = []
+        router.register(FakeEntity('attribute', received), 'ieee', 1, 6, 0)
+        router.register(FakeEntity('endpoint', received), 'ieee', 1)
+        router.register(FakeEntity('device', received), 'ieee')
+        router.register(FakeEntity('other', received), 'other', 1, 6, 0)
+        router.dispatch('ieee', {'endpoint': 1, 'cluster': 6, 'attribute': 0, 'value': True})
+        self.assertEqual(received, ['attribute', 'endpoint', 'device'])
+        received.clear()
+        router.dispatch('ieee', {'endpoint': 2, 'cluster': 6, 'attribute': 0, 'value': True})
+        self.assertEqual(received, ['device'])
+        received.clear()
+        router.dispatch_device('ieee', {})
+        self.assertEqual(received, ['device'])
+        # entities not added to hass yet don't write state
+        self.assertEqual(coalescer.scheduled, [])
+
+    def test_unregister(self):
+        from custom_components.zigate import ZiGateRouter
+        router = ZiGateRouter(FakeCoalescer())
+        received = []
+        unregister = router.register(FakeEntity('endpoint', received), 'ieee', 1)
+        unregister()
+        router.dispatch('ieee', {'endpoint': 1, 'cluster': 6, 'attribute': 0, 'value': True})
+        self.assertEqual(received, [])
+
+
+class TestCoalescer(unittest.TestCase):
+    def test_no_window(self):
+        from custom_components.zigate import ZiGateCoalescer
+        coalescer = ZiGateCoalescer(FakeHass(), 0)
+        entity = FakeStateEntity(True)
+        coalescer.schedule(entity)
+        coalescer.schedule(entity)
+        self.assertEqual(entity.writes, 2)
+        self.assertEqual(coalescer.saved, 0)
+
+    def test_loop_iteration(self):
+        from custom_components.zigate import ZiGateCoalescer
+        hass = FakeHass()
+        coalescer = ZiGateCoalescer(hass, None)
+        entity = FakeStateEntity(hass)
+        coalescer.schedule(entity)
+        coalescer.schedule(entity)
+        self.assertEqual(entity.writes, 0)
+        func, args = hass.loop.calls.pop()
+        func(*args)
+        self.assertEqual(entity.writes, 1)
+        # next frame, written on its own
+        coalescer.schedule(entity)
+        self.assertEqual(len(hass.loop.calls), 1)
+        func, args = hass.loop.calls.pop()
+        func(*args)
+        self.assertEqual(entity.writes, 2)
+        self.assertEqual(coalescer.saved, 1)
+
+    def test_loop_iteration_real_loop(self):
+        import asyncio
+        from types import SimpleNamespace
+        from custom_components.zigate import ZiGateCoalescer
+        states = []
+
+        class StateEntity(FakeStateEntity):
+            value = None
+
+            def async_write_ha_state(self):
+                states.append(self.value)
+
+        async def run():
+            hass = SimpleNamespace(loop=asyncio.get_running_loop())
+            coalescer = ZiGateCoalescer(hass, None)
+            entity = StateEntity(hass)
+            # on then off, in two frames a few ms apart
+            entity.value = True
+            coalescer.schedule(entity)
+            await asyncio.sleep(0.005)
+            entity.value = False
+            coalescer.schedule(entity)
+            await asyncio.sleep(0)
+            self.assertEqual(states, [True, False])
+
+        asyncio.run(run())
+
+    def test_window(self):
+        from custom_components.zigate import ZiGateCoalescer
+        hass = FakeHass()
+        coalescer = ZiGateCoalescer(hass, 0.1)
+        entity = FakeStateEntity(hass)
+        for i in range(3):
+            coalescer.schedule(entity)
+        self.assertEqual(entity.writes, 0)
+        self.assertEqual(len(hass.loop.calls), 1)
+        func, args = hass.loop.calls.pop()
+        func(*args)
+        self.assertEqual(entity.writes, 1)
+        self.assertEqual(coalescer.requested, 3)
+        self.assertEqual(coalescer.written, 1)
+        self.assertEqual(coalescer.saved, 2)
+
+    def test_window_removed(self):
+        from custom_components.zigate import ZiGateCoalescer
+        hass = FakeHass()
+        coalescer = ZiGateCoalescer(hass, 0.1)
+        entity = FakeStateEntity(hass)
+        coalescer.schedule(entity)
+        coalescer.schedule(entity)
+        # removed during the window
+        entity.hass = None
+        func, args = hass.loop.calls.pop()
+        func(*args)
+        self.assertEqual(entity.writes, 0)
+        self.assertEqual(coalescer.written, 0)
+        self.assertEqual(coalescer.saved, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+"""Test zigate persistent storage."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class FakeZiGate(object):
+    def __init__(self):
+        self._devices = {}
+        self._groups = {}
+        self._scenes = {}
+        self._neighbours_table_cache = []
+        self._led = True
+
+    def load_state(self, path=None):
+        with open(path) as fp:
+            data = json.load(fp)
+        from zigate.core import Device
+        for d in data['devices']:
+            device = Device.from_json(d, self)
+            self._devices[device.addr] = device
+        self._groups = {k: set(tuple(r) for r in v) for k, v in data['groups'].items()}
+        return True
+
+    def add_device(self, addr, ieee):
+        from zigate.core import Device
+        device = Device({'addr': addr, 'ieee': ieee}, self)
+        device.set_attribute(1, 0x0006, {'attribute': 0, 'data': True})
+        self._devices[addr] = device
+        return device
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'zigate.db')
+        self.json_path = os.path.join(self.tmpdir, 'zigate.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_load(self):
+        from custom_components.zigate.storage import ZiGateStore
+        myzigate = FakeZiGate()
+        myzigate.add_device('abcd', '0123456789abcdef')
+        myzigate.add_device('1234', '0123456789abcde0')
+        myzigate._groups = {'0001': {('abcd', 1)}}
+        store = ZiGateStore(self.db_path)
+        store.save(myzigate)
+        self.assertEqual(store.rows_written, 2 + 4)
+        store.close()
+
+        myzigate2 = FakeZiGate()
+        store = ZiGateStore(self.db_path)
+        self.assertTrue(store.load(myzigate2))
+        self.assertEqual(sorted(myzigate2._devices), ['1234', 'abcd'])
+        self.assertEqual(myzigate2._groups, {'0001': {('abcd', 1)}})
+        self.assertEqual(myzigate2._devices['abcd'].get_attribute(1, 6, 0)['value'], True)
+        store.close()
+
+    def test_incremental(self):
+        from custom_components.zigate.storage import ZiGateStore
+        myzigate = FakeZiGate()
+        device = myzigate.add_device('abcd', '0123456789abcdef')
+        myzigate.add_device('1234', '0123456789abcde0')
+        store = ZiGateStore(self.db_path)
+        store.save(myzigate)
+        rows_written = store.rows_written
+        # nothing changed
+        store.mark(device.ieee)
+        store.save(myzigate)
+        self.assertEqual(store.rows_written, rows_written)
+        # only the changed device is written
+        device.set_attribute(1, 0x0006, {'attribute': 0, 'data': False})
+        store.mark(device.ieee)
+        store.save(myzigate)
+        self.assertEqual(store.rows_written, rows_written + 1)
+        # removed device
+        del myzigate._devices['1234']
+        store.save(myzigate)
+        self.assertEqual(store.rows_written, rows_written + 2)
+        store.close()
+        myzigate2 = FakeZiGate()
+        store = ZiGateStore(self.db_path)
+        store.load(myzigate2)
+        self.assertEqual(list(myzigate2._devices), ['abcd'])
+        self.assertEqual(myzigate2._devices['abcd'].get_attribute(1, 6, 0)['value'], False)
+        store.close()
+
+    def test_concurrent_mark(self):
+        import threading
+        from custom_components.zigate.storage import ZiGateStore
+        myzigate = FakeZiGate()
+        devices = [myzigate.add_device('{:04x}'.format(i), '00158d00{:08x}'.format(i)) for i in range(20)]
+        store = ZiGateStore(self.db_path)
+        store.save(myzigate)
+        done = threading.Event()
+        errors = []
+
+        def auto_save():
+            # like the library auto save thread
+            try:
+                while not done.is_set():
+                    store.save(myzigate)
+            except Exception as e:
+                errors.append(e)
+        thread = threading.Thread(target=auto_save)
+        thread.start()
+        try:
+            for i in range(2000):
+                device = devices[i % len(devices)]
+                device.set_attribute(1, 0x0008, {'attribute': 0, 'data': i})
+                store.mark(device.ieee)
+        finally:
+            done.set()
+            thread.join()
+        store.save(myzigate)
+        store.close()
+        self.assertEqual(errors, [])
+        # every change is saved, no mark was lost
+        myzigate2 = FakeZiGate()
+        store = ZiGateStore(self.db_path)
+        store.load(myzigate2)
+        for device in devices:
+            self.assertEqual(myzigate2._devices[device.addr].get_attribute(1, 8, 0)['value'],
+                             device.get_attribute(1, 8, 0)['value'])
+        store.close()
+
+    def test_migrate(self):
+        from zigate.core import DeviceEncoder
+        from custom_components.zigate.storage import ZiGateStore
+        myzigate = FakeZiGate()
+        myzigate.add_device('abcd', '0123456789abcdef')
+        with open(self.json_path, 'w') as fp:
+            json.dump({'devices': list(myzigate._devices.values()), 'groups': {'0001': [['abcd', 1]]}},
+                      fp, cls=DeviceEncoder)
+        myzigate2 = FakeZiGate()
+        store = ZiGateStore(self.db_path, self.json_path)
+        self.assertTrue(store.load(myzigate2))
+        self.assertEqual(list(myzigate2._devices), ['abcd'])
+        self.assertFalse(os.path.exists(self.json_path))
+        self.assertTrue(os.path.exists(self.json_path + '.migrated'))
+        store.close()
+        # loaded from the store next time
+        myzigate3 = FakeZiGate()
+        store = ZiGateStore(self.db_path, self.json_path)
+        self.assertTrue(store.load(myzigate3))
+        self.assertEqual(myzigate3._groups, {'0001': {('abcd', 1)}})
+        store.close()
+
+    def test_skip_next_load_state(self):
+        from custom_components.zigate import skip_next_load_state
+        from custom_components.zigate.storage import ZiGateStore
+        myzigate = FakeZiGate()
+        myzigate.add_device('abcd', '0123456789abcdef')
+        store = ZiGateStore(self.db_path)
+        store.save(myzigate)
+        store.attach(myzigate)
+        store_load = myzigate.load_state
+        self.assertTrue(myzigate.load_state())
+        skip_next_load_state(myzigate, True)
+        myzigate._devices = {}
+        # startup, autoStart does not reload the state
+        self.assertTrue(myzigate.load_state())
+        self.assertEqual(myzigate._devices, {})
+        # restart, loaded from the store again
+        self.assertIs(myzigate.load_state, store_load)
+        self.assertTrue(myzigate.load_state())
+        self.assertEqual(list(myzigate._devices), ['abcd'])
+        store.close()
+        # without store, the library loader is restored
+        myzigate = FakeZiGate()
+        skip_next_load_state(myzigate, False)
+        self.assertFalse(myzigate.load_state())
+        self.assertNotIn('load_state', vars(myzigate))
+
+
+if __name__ == '__main__':
+    unittest.main()
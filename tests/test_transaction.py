@@ -0,0 +1,108 @@
+"""Test zigate request/response correlation."""
+import asyncio
+import unittest
+
+
+class FakeResponse(dict):
+    def __init__(self, msg, **kwargs):
+        dict.__init__(self, kwargs)
+        self.msg = msg
+
+
+class FakeDevice(object):
+    ieee = '0123456789abcdef'
+    addr = 'abcd'
+
+
+class FakeZiGate(object):
+    def __init__(self, status=0, early=False, others=()):
+        self.sent = []
+        self.sequence = 0
+        self._status = status
+        self._early = early
+        self._others = others
+        self.transactions = None
+        self.loop = None
+
+    def _translate_addr(self, addr):
+        return addr
+
+    def _choose_addr_mode(self, addr):
+        return 2, 'H'
+
+    def get_device_from_addr(self, addr):
+        return FakeDevice()
+
+    def send_data(self, cmd, data, wait_response=None):
+        self.sent.append((cmd, data))
+        self.sequence += 1
+        # responses of other requests with the same sequence first
+        responses = [FakeResponse(0x8100, sequence=self.sequence, addr=addr, cluster=cluster, attribute=5, status=1)
+                     for addr, cluster in self._others]
+        responses.append(FakeResponse(0x8100, sequence=self.sequence, addr='abcd', cluster=0, attribute=5, status=0))
+        for response in responses:
+            if self._early:
+                self.transactions.response_received(response)
+            else:
+                self.loop.call_soon(self.transactions.response_received, response)
+        return FakeResponse(0x8000, status=self._status, sequence=self.sequence)
+
+
+class FakeHass(object):
+    def __init__(self, loop):
+        self.loop = loop
+
+    async def async_add_executor_job(self, func, *args):
+        return func(*args)
+
+
+class TestTransactions(unittest.TestCase):
+    def _read(self, myzigate, timeout=1):
+        from custom_components.zigate.transaction import ZiGateTransactions
+
+        async def run():
+            myzigate.loop = asyncio.get_running_loop()
+            transactions = myzigate.transactions = ZiGateTransactions(FakeHass(myzigate.loop), myzigate)
+            responses = await transactions.async_read_attributes('abcd', 1, 0, [5], timeout=timeout)
+            return transactions, responses
+        return asyncio.run(run())
+
+    def test_read_attributes(self):
+        myzigate = FakeZiGate()
+        transactions, responses = self._read(myzigate)
+        self.assertEqual(responses[5]['sequence'], 1)
+        self.assertEqual(myzigate.sent[0][0], 0x0100)
+        self.assertEqual(transactions.requests, 1)
+        self.assertEqual(transactions.histograms[FakeDevice.ieee].count, 1)
+        self.assertEqual(transactions._pending, {})
+
+    def test_response_before_status(self):
+        transactions, responses = self._read(FakeZiGate(early=True))
+        self.assertEqual(responses[5]['attribute'], 5)
+        self.assertEqual(len(transactions._early), 0)
+
+    def test_same_sequence(self):
+        # from another device and from another cluster of the device
+        for early in (True, False):
+            transactions, responses = self._read(FakeZiGate(early=early, others=[('1234', 0), ('abcd', 6)]))
+            self.assertEqual(responses[5]['status'], 0)
+            self.assertEqual(list(transactions._early), [(1, '1234')])
+
+    def test_failed_status(self):
+        from custom_components.zigate.transaction import ZiGateRequestError
+        with self.assertRaises(ZiGateRequestError):
+            self._read(FakeZiGate(status=1))
+
+    def test_histogram(self):
+        from custom_components.zigate.transaction import LatencyHistogram
+        histogram = LatencyHistogram()
+        for ms in (10, 20, 30, 40, 80, 90, 120, 600, 700, 6000):
+            histogram.add(ms)
+        self.assertEqual(histogram.percentile(50), 100)
+        self.assertEqual(histogram.percentile(80), 1000)
+        self.assertEqual(histogram.percentile(100), 6000)
+        self.assertEqual(histogram.as_dict()['<=25'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()